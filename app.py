@@ -7,23 +7,80 @@
 import os
 import json
 import time
+import atexit
+import itertools
+import sqlite3
+import socket
 import hashlib
 import hmac
+import heapq
+import random
 import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
 from datetime import datetime, timedelta
+from collections import OrderedDict, deque
 from functools import wraps
-from typing import Dict, Optional, List, Tuple
+from typing import Callable, Dict, Optional, List, Tuple
 
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import (
+    Flask, Response, before_render_template, g, render_template, request, jsonify, session, redirect,
+    stream_with_context, template_rendered, url_for,
+)
 from flask_cors import CORS
 import requests
+from requests.adapters import HTTPAdapter
+import numpy as np
+
+from klines import INTERVAL_MS, KlineStore, HIGH, LOW, CLOSE, VOLUME
+from indicators import IndicatorEngine, entry_size
+from streams import StreamClient
+from exchange_info import ExchangeInfoCache, OrderRejected, PreparedOrder, prepare_order
+from trade_archive import TradeArchive
+from portfolio import Portfolio, QUOTE_ASSET
+from paper import LatencyModel, PaperExchange, PaperRejected
+from events import EventBus, format_sse
+from profiler import Profiler
+import metrics
+from metrics import Counter, Gauge, Histogram
 
 # ==================== CONFIGURATION ====================
 SECRET_PASSWORD = "2026y"  # ⚠️ لاحقًا انقلها لـ ENV
-SESSION_SECRET = os.urandom(24).hex()
+SESSION_SECRET_PATH = os.environ.get("SESSION_SECRET_PATH", ".session_secret")
 
-BINANCE_TESTNET_SPOT = "https://testnet.binance.vision"
-BINANCE_MAINNET_SPOT = "https://api.binance.com"
+# inline: البوتات داخل عملية الويب (run.py) | remote: عمّال gunicorn يرسلون الأوامر لـ bot_runner.py
+# | runner: عملية bot_runner.py نفسها
+BOT_RUNNER_MODE = os.environ.get("BOT_RUNNER_MODE", "inline")
+BOT_RUNNER_ADDRESS = os.environ.get("BOT_RUNNER_ADDRESS", "bot_runner.sock")  # مسار Unix socket أو host:port
+
+
+def load_session_secret(path: str = SESSION_SECRET_PATH) -> str:
+    """
+    سر مشترك لكل العمّال: SESSION_SECRET من ENV، وإلا ملف يُنشأ مرة واحدة.
+    O_EXCL يضمن أن أول عامل فقط يكتبه والباقي يقرؤونه (نفس الـ cookies في كل العمّال).
+    """
+    secret = os.environ.get("SESSION_SECRET")
+    if secret:
+        return secret
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(os.urandom(24).hex())
+    except FileExistsError:
+        pass
+    for _ in range(50):
+        with open(path) as f:
+            secret = f.read().strip()
+        if secret:
+            return secret
+        time.sleep(0.01)  # عامل آخر أنشأ الملف ولم يكتب بعد
+    raise RuntimeError(f"empty session secret file: {path}")
+
+
+SESSION_SECRET = load_session_secret()
+
+# قابلة للتغيير لتشغيل التطبيق على mock_binance.py محليًا
+BINANCE_TESTNET_SPOT = os.environ.get("BINANCE_TESTNET_SPOT", "https://testnet.binance.vision")
+BINANCE_MAINNET_SPOT = os.environ.get("BINANCE_MAINNET_SPOT", "https://api.binance.com")
 
 # ==================== FLASK APP ====================
 app = Flask(__name__, template_folder="templates", static_folder="static")
@@ -31,75 +88,1118 @@ app.config["SECRET_KEY"] = SESSION_SECRET
 app.config["PERMANENT_SESSION_LIFETIME"] = timedelta(hours=24)
 CORS(app)
 
+# ==================== METRICS ====================
+# المسار الساخن: counters لكل thread بدون قفل؛ القيم المشتقة (gauges) تُحسب وقت /metrics فقط
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "Flask route latency", ("method", "route"))
+HTTP_REQUESTS = Counter("http_requests_total", "Flask responses by status", ("method", "route", "status"))
+BINANCE_LATENCY = Histogram("binance_request_duration_seconds", "Binance REST latency per path", ("method", "path"))
+BINANCE_REQUESTS = Counter(
+    "binance_requests_total", "Binance REST calls by outcome (HTTP status, error, circuit_open, rate_limited)", ("method", "path", "outcome")
+)
+CLOCK_OFFSET_CHANGE = Histogram(
+    "binance_clock_offset_change_ms", "Offset change between consecutive time syncs (drift)",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000),
+)
+DB_FLUSH_LATENCY = Histogram("db_flush_duration_seconds", "SQLite batch commit latency")
+DB_FLUSH_ROWS = Histogram("db_flush_rows", "Rows per SQLite batch commit", buckets=(1, 5, 10, 50, 100, 500, 1000, 5000))
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by result (hit, stale, miss)", ("cache", "result"))
+BOT_TICK_LAG = Histogram(
+    "bot_tick_lag_seconds", "Delay between a bot's deadline and its tick starting",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+BOT_TICK_DURATION = Histogram("bot_tick_duration_seconds", "Bot tick runtime")
+PAPER_ORDERS = Counter("paper_orders_total", "Paper-trading orders by final status (FILLED, EXPIRED, NEW, REJECTED ...)", ("status",))
+ERRORS = Counter("app_errors_total", "Errors previously only printed, by component", ("component",))
+
+# ==================== EVENTS ====================
+# أحداث لحظية للداشبورد (/api/stream): البوت والكاش والـ DB ينشرون، كل اتصال SSE يستلم أحداث مستخدمه فقط
+SSE_HEARTBEAT = 15  # تعليق ": ping" يبقي الاتصال حيًا عبر البروكسي ويكشف العملاء المنقطعين (ثانية)
+SSE_RETRY_MS = 3000  # انتظار المتصفح قبل إعادة الاتصال
+# كل اتصال SSE يحجز thread (gthread) طوال عمره: gunicorn -k gthread --threads $WEB_THREADS
+WEB_THREADS = int(os.environ.get("WEB_THREADS", "32"))
+# نصف الـ threads على الأكثر للـ streams؛ الباقي لطلبات JSON (مع gevent: حدّد SSE_MAX_CLIENTS يدويًا)
+SSE_MAX_CLIENTS = int(os.environ.get("SSE_MAX_CLIENTS", str(max(WEB_THREADS // 2, 1))))
+SSE_MAX_AGE = 300  # الاتصال يُغلق بعدها ويعيد المتصفح الاتصال بعد retry: لا thread محجوز للأبد (ثانية)
+# auto: SSE فقط مع عامل متعدد الـ threads أو gevent؛ عامل sync يرد 503 والداشبورد يرجع للـ polling
+SSE_STREAMING = os.environ.get("SSE_STREAMING", "auto")
+SSE_POLL_INTERVAL = 1.0  # وضع remote: فحص SQLite لأحداث bot_runner (ثانية)
+
+event_bus = EventBus()
+
+# ==================== PROFILING ====================
+# معطّل افتراضيًا: PROFILE=1 عند التشغيل أو POST /api/profile أثناء العمل (بـ PROFILE_TOKEN فقط)
+PROFILE_SAMPLE_HZ = float(os.environ.get("PROFILE_SAMPLE_HZ", "50"))  # عينات Python stack في الثانية (0 = spans فقط)
+PROFILE_SLOWEST = int(os.environ.get("PROFILE_SLOWEST", "50"))
+PROFILE_MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", "300"))  # أقصى مدة تفعيل من الـ endpoint
+# سر يضبطه المشغّل على السيرفر فقط (ترويسة X-Profile-Token)؛ فارغ = الـ endpoints معطّلة
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+
+profiler = Profiler(enabled=os.environ.get("PROFILE") == "1", slowest=PROFILE_SLOWEST, sample_hz=PROFILE_SAMPLE_HZ)
+
 # ==================== DATABASE ====================
+DB_PATH = os.environ.get("DB_PATH", "users.db")
+LEGACY_JSON_PATH = "users.json"
+DB_FLUSH_INTERVAL = float(os.environ.get("DB_FLUSH_INTERVAL", "0.5"))  # أقصى تأخير قبل تثبيت الكتابة (ثانية)
+DB_FLUSH_BATCH = 500  # تثبيت مبكر إذا تراكمت هذه الكمية من الكتابات
+TRADES_CACHE_LIMIT = 100  # آخر الصفقات المحفوظة في الذاكرة لكل مستخدم
+# أكثر من عملية تكتب نفس الملف (عمّال الويب + bot_runner): القراءة من SQLite وليس من الذاكرة فقط
+DB_SHARED = BOT_RUNNER_MODE in ("remote", "runner")
+TRADE_PAGE_MAX = 500  # أقصى حجم صفحة في query_trades
+TRADE_ARCHIVE_AFTER_DAYS = int(os.environ.get("TRADE_ARCHIVE_AFTER_DAYS", "90"))  # أقدم من هذا → الأرشيف العمودي
+TRADE_ARCHIVE_INTERVAL = 24 * 60 * 60  # دورة الأرشفة في الخلفية (ثانية)
+TRADE_ARCHIVE_BATCH = 100_000  # صفقات لكل دفعة نقل (الأرشيف يُعاد كتابته مع كل دفعة)
+
+
+def _num(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def parse_trade_cursor(cursor: Optional[str]) -> Optional[Tuple[int, int]]:
+    """next_cursor من query_trades ("ts:seq") أو ValueError"""
+    if not cursor:
+        return None
+    ts, seq = cursor.split(":", 1)
+    return int(ts), int(seq)
+
+
 class Database:
-    def __init__(self):
-        self.file_path = "users.json"
+    """
+    ✅ تخزين SQLite بوضع WAL خلف نفس واجهة Database القديمة:
+    - القراءة من نسخة في الذاكرة (self.data) بدون أي I/O
+    - كل كتابة = سطر واحد (append للصفقات / upsert للمستخدم) بدل إعادة كتابة الملف كاملًا
+    - الكتابات تُجمع وتُثبَّت دفعةً واحدة خلال DB_FLUSH_INTERVAL كحد أقصى
+    - أول تشغيل ينقل البيانات من users.json تلقائيًا
+    - shared: عدة عمليات على نفس الملف؛ المستخدمون والصفقات وحالة البوتات تُقرأ من SQLite
+    - الصفقات: كل التاريخ مفهرس بـ (user, symbol, ts) + إحصاءات تراكمية تُحدَّث مع كل إدخال
+    - الصفقات الأقدم من TRADE_ARCHIVE_AFTER_DAYS تُنقل لأرشيف عمودي (trade_archive.py)
+    """
+
+    def __init__(
+        self,
+        file_path: str = DB_PATH,
+        flush_interval: float = DB_FLUSH_INTERVAL,
+        shared: bool = DB_SHARED,
+        archive_dir: Optional[str] = None,
+        archive_interval: Optional[float] = None,
+    ):
+        self.file_path = file_path
+        self.flush_interval = flush_interval
+        self.shared = shared
+        self._readers = threading.local()
+        self._bot_states: Dict[str, Tuple[str, float]] = {}  # user_id → (آخر data مكتوب، وقت آخر كتابة)
+        self.archive = TradeArchive(archive_dir or f"{os.path.splitext(file_path)[0]}_archive")
+        # عمّال الويب في وضع remote لا يؤرشفون: عملية واحدة تنقل الصفقات
+        if archive_interval is None:
+            archive_interval = TRADE_ARCHIVE_INTERVAL if BOT_RUNNER_MODE != "remote" else 0
+        self.archive_interval = archive_interval
+        self._next_archive = time.monotonic() + archive_interval
+
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()  # flush من الـ flusher ومن الطلبات على نفس الاتصال
+        self._pending: List[Tuple[str, tuple]] = []
+        self._wake = threading.Event()
+        self._closed = False
+        self._trade_seq = itertools.count()
+
+        self._conn = self._connect()
+        self._init_schema()
+        self._migrate_trades()
         self.data = self.load_data()
 
+        self._flusher = threading.Thread(target=self._flush_loop, name="db-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    # ---------- storage ----------
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.file_path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_schema(self):
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                user_id TEXT PRIMARY KEY,
+                data    TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS trades (
+                seq      INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id  TEXT NOT NULL,
+                trade_id TEXT NOT NULL,
+                data     TEXT NOT NULL,
+                symbol   TEXT,
+                side     TEXT,
+                quantity REAL,
+                price    REAL,
+                pnl      REAL,
+                ts       INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS idx_trades_user ON trades (user_id, seq);
+            CREATE TABLE IF NOT EXISTS trade_stats (
+                user_id      TEXT NOT NULL,
+                symbol       TEXT NOT NULL,
+                trades       INTEGER NOT NULL,
+                volume       REAL NOT NULL,
+                realized_pnl REAL NOT NULL,
+                closed       INTEGER NOT NULL,
+                wins         INTEGER NOT NULL,
+                first_ts     INTEGER,
+                last_ts      INTEGER,
+                PRIMARY KEY (user_id, symbol)
+            );
+            CREATE TABLE IF NOT EXISTS bot_state (
+                user_id    TEXT PRIMARY KEY,
+                data       TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS bot_checkpoints (
+                user_id    TEXT PRIMARY KEY,
+                data       TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            """
+        )
+
+    def _migrate_trades(self):
+        """
+        قواعد قديمة: الصفقات كانت JSON فقط. نضيف أعمدة الفهرسة ونعبئها مرة واحدة،
+        ثم نبني الإحصاءات التراكمية من التاريخ الموجود.
+        """
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(trades)")}
+        with self._conn:
+            self._conn.execute("BEGIN")
+            if "ts" not in columns:
+                for name, kind in (("symbol", "TEXT"), ("side", "TEXT"), ("quantity", "REAL"), ("price", "REAL"), ("pnl", "REAL"), ("ts", "INTEGER")):
+                    self._conn.execute(f"ALTER TABLE trades ADD COLUMN {name} {kind}")
+                rows = self._conn.execute("SELECT seq, data FROM trades").fetchall()
+                for seq, raw in rows:
+                    t = json.loads(raw)
+                    try:
+                        ts = int(datetime.fromisoformat(t["timestamp"]).timestamp() * 1000)
+                    except (KeyError, TypeError, ValueError):
+                        ts = 0
+                    self._conn.execute(
+                        "UPDATE trades SET symbol = ?, side = ?, quantity = ?, price = ?, pnl = ?, ts = ? WHERE seq = ?",
+                        (t.get("symbol") or "", t.get("side"), _num(t.get("quantity")), _num(t.get("price")), t.get("pnl"), ts, seq),
+                    )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_trades_user_ts ON trades (user_id, ts)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_trades_user_symbol_ts ON trades (user_id, symbol, ts)")
+            if self._conn.execute("SELECT 1 FROM trade_stats LIMIT 1").fetchone() is None:
+                self._conn.execute(
+                    """
+                    INSERT INTO trade_stats (user_id, symbol, trades, volume, realized_pnl, closed, wins, first_ts, last_ts)
+                    SELECT user_id, symbol, COUNT(*), TOTAL(quantity * price), TOTAL(pnl), COUNT(pnl),
+                           COUNT(CASE WHEN pnl > 0 THEN 1 END), MIN(ts), MAX(ts)
+                    FROM trades GROUP BY user_id, symbol
+                    """
+                )
+
+    def _reader(self) -> sqlite3.Connection:
+        """اتصال قراءة لكل thread (WAL: القراءة لا تنتظر الكتابة)"""
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = self._readers.conn = sqlite3.connect(self.file_path, isolation_level=None)
+        return conn
+
     def load_data(self):
+        data = {"users": {}, "trades": {}, "stats": {}}
         try:
-            with open(self.file_path, "r", encoding="utf-8") as f:
-                return json.load(f)
+            for user_id, raw in self._conn.execute("SELECT user_id, data FROM users"):
+                data["users"][user_id] = json.loads(raw)
+
+            for row in self._conn.execute(
+                "SELECT user_id, symbol, trades, volume, realized_pnl, closed, wins, first_ts, last_ts FROM trade_stats"
+            ):
+                data["stats"].setdefault(row[0], {})[row[1]] = list(row[2:])
+
+            rows = self._conn.execute(
+                """
+                SELECT user_id, data FROM (
+                    SELECT user_id, data, seq,
+                           ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY seq DESC) AS rn
+                    FROM trades
+                ) WHERE rn <= ? ORDER BY seq
+                """,
+                (TRADES_CACHE_LIMIT,),
+            )
+            for user_id, raw in rows:
+                data["trades"].setdefault(user_id, []).append(json.loads(raw))
+        except Exception as e:
+            print("DB LOAD ERROR:", e)
+            return data
+
+        if not data["users"] and not data["trades"]:
+            data = self._migrate_legacy_json(data)
+        return data
+
+    def _migrate_legacy_json(self, data):
+        """نقل users.json القديم (إن وُجد) إلى SQLite مرة واحدة"""
+        try:
+            with open(LEGACY_JSON_PATH, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
         except FileNotFoundError:
-            return {"users": {}, "trades": {}}
-        except Exception:
-            return {"users": {}, "trades": {}}
-
-    def save_data(self):
-        with open(self.file_path, "w", encoding="utf-8") as f:
-            json.dump(self.data, f, indent=2, ensure_ascii=False)
-
-    def add_user(self, username, api_key, api_secret, is_testnet=True):
-        user_id = hashlib.sha256(username.encode()).hexdigest()[:16]
-        self.data["users"][user_id] = {
-            "username": username,
-            "api_key": api_key,
-            "api_secret": api_secret,
-            "is_testnet": is_testnet,
-            "created_at": datetime.now().isoformat(),
-            "balance": 0.0,
-            "last_login": datetime.now().isoformat(),
-            "settings": {
-                "risk_per_trade": 0.01,
-                "max_positions": 1,
-                "symbols": ["BTCUSDT", "ETHUSDT", "BNBUSDT"],
-            },
-        }
-        self.save_data()
+            return data
+        except Exception as e:
+            print("LEGACY JSON MIGRATION ERROR:", e)
+            return data
+
+        users = legacy.get("users", {}) or {}
+        trades = legacy.get("trades", {}) or {}
+        with self._conn:
+            self._conn.execute("BEGIN")
+            for user_id, user in users.items():
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO users (user_id, data) VALUES (?, ?)",
+                    (user_id, json.dumps(user, ensure_ascii=False)),
+                )
+            for user_id, items in trades.items():
+                for t in items:
+                    try:
+                        ts = int(datetime.fromisoformat(t["timestamp"]).timestamp() * 1000)
+                    except (KeyError, TypeError, ValueError):
+                        ts = 0
+                    self._conn.execute(
+                        "INSERT INTO trades (user_id, trade_id, data, symbol, side, quantity, price, pnl, ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (user_id, t.get("id", ""), json.dumps(t, ensure_ascii=False), t.get("symbol") or "", t.get("side"),
+                         _num(t.get("quantity")), _num(t.get("price")), t.get("pnl"), ts),
+                    )
+                    self._add_stats(data["stats"], user_id, t.get("symbol") or "", t, ts)
+            for user_id, by_symbol in data["stats"].items():
+                for symbol, row in by_symbol.items():
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO trade_stats (user_id, symbol, trades, volume, realized_pnl, closed, wins, first_ts, last_ts) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (user_id, symbol, *row),
+                    )
+        data["users"] = users
+        data["trades"] = {u: items[-TRADES_CACHE_LIMIT:] for u, items in trades.items()}
+        return data
+
+    def _enqueue(self, sql: str, params: tuple):
+        with self._lock:
+            self._pending.append((sql, params))
+            if len(self._pending) >= DB_FLUSH_BATCH:
+                self._wake.set()
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                ERRORS.labels("db_flush").inc()
+                print("DB FLUSH ERROR:", e)
+            if self.archive_interval and time.monotonic() >= self._next_archive:
+                self._next_archive = time.monotonic() + self.archive_interval
+                try:
+                    moved = self.archive_trades()
+                    if moved:
+                        print(f"🗄️ أرشفة {moved} صفقة")
+                except Exception as e:
+                    ERRORS.labels("trade_archive").inc()
+                    print("TRADE ARCHIVE ERROR:", e)
+
+    @profiler.wrap("db.flush")
+    def flush(self):
+        """تثبيت كل الكتابات المعلّقة في transaction واحدة"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            t0 = time.perf_counter()
+            with self._conn:
+                self._conn.execute("BEGIN")
+                for sql, params in batch:
+                    self._conn.execute(sql, params)
+        DB_FLUSH_LATENCY.observe(time.perf_counter() - t0)
+        DB_FLUSH_ROWS.observe(len(batch))
+
+    # توافق مع الكود القديم: save_data كانت تكتب الملف فورًا
+    save_data = flush
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        try:
+            self.flush()
+            self._conn.close()
+        except Exception as e:
+            print("DB CLOSE ERROR:", e)
+
+    # ---------- users ----------
+    def _persist_user(self, user_id):
+        user = self.data["users"][user_id]
+        self._enqueue(
+            "INSERT OR REPLACE INTO users (user_id, data) VALUES (?, ?)",
+            (user_id, json.dumps(user, ensure_ascii=False)),
+        )
+
+    @staticmethod
+    def user_id_for(username: str) -> str:
+        return hashlib.sha256(username.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def paper_user_id_for(username: str) -> str:
+        """الحسابات الورقية في نطاق منفصل: إعداد ورقي بدون مفاتيح لا يصل أبدًا لسجل مستخدم بمفاتيح"""
+        return Database.user_id_for("paper:" + username)
+
+    def add_user(self, username, api_key, api_secret, is_testnet=True, paper=False):
+        user_id = self.paper_user_id_for(username) if paper else self.user_id_for(username)
+        with self._lock:
+            self.data["users"][user_id] = {
+                "username": username,
+                "api_key": api_key,
+                "api_secret": api_secret,
+                "is_testnet": is_testnet,
+                "paper": paper,  # أوامر على PaperExchange المحلي، وبيانات السوق من شبكة is_testnet
+                "created_at": datetime.now().isoformat(),
+                "balance": 0.0,
+                "last_login": datetime.now().isoformat(),
+                "settings": {
+                    "risk_per_trade": 0.01,
+                    "max_positions": 1,
+                    "symbols": ["BTCUSDT", "ETHUSDT", "BNBUSDT"],
+                },
+            }
+            self._persist_user(user_id)
+        if self.shared:
+            self.flush()  # الطلب التالي قد يصل لعامل آخر
         return user_id
 
     def get_user(self, user_id):
+        if self.shared and user_id:
+            row = self._reader().execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+            if row is None:
+                return self.data["users"].get(user_id)
+            with self._lock:
+                user = self.data["users"].setdefault(user_id, {})
+                user.update(json.loads(row[0]))
+            return user
         return self.data["users"].get(user_id)
 
     def update_user(self, user_id, updates):
-        if user_id in self.data["users"]:
-            self.data["users"][user_id].update(updates)
-            self.save_data()
-            return True
-        return False
+        with self._lock:
+            user = self.data["users"].get(user_id)
+            if user is None:
+                return False
+            # لا كتابة إذا لم يتغير شيء (dashboard يحدّث الرصيد مع كل تحميل)
+            if all(user.get(k) == v for k, v in updates.items()):
+                return True
+            user.update(updates)
+            # المفاتيح المتغيرة فقط تُدمج في الصف وقت التثبيت: عملية أخرى (setup في عامل ويب)
+            # قد تكون غيّرت بقية الحقول بعد آخر قراءة لنسختنا في الذاكرة
+            paths = []
+            for key, value in updates.items():
+                paths += [f'$."{key}"', json.dumps(value, ensure_ascii=False)]
+            self._enqueue(
+                f"UPDATE users SET data = json_set(data{', ?, json(?)' * len(updates)}) WHERE user_id = ?",
+                (*paths, user_id),
+            )
+        return True
+
+    # ---------- trades ----------
+    @staticmethod
+    def _add_stats(stats: Dict, user_id: str, symbol: str, trade: Dict, ts: int):
+        """[trades, volume, realized_pnl, closed, wins, first_ts, last_ts] لكل (user, symbol)"""
+        row = stats.setdefault(user_id, {}).setdefault(symbol, [0, 0.0, 0.0, 0, 0, ts, ts])
+        pnl = trade.get("pnl")
+        row[0] += 1
+        row[1] += _num(trade.get("quantity")) * _num(trade.get("price"))
+        if pnl is not None:
+            row[2] += pnl
+            row[3] += 1
+            row[4] += 1 if pnl > 0 else 0
+        row[6] = ts
 
     def add_trade(self, user_id, trade_data):
-        if user_id not in self.data["trades"]:
-            self.data["trades"][user_id] = []
-
-        trade_data["id"] = hashlib.sha256(str(time.time()).encode()).hexdigest()[:12]
-        trade_data["timestamp"] = datetime.now().isoformat()
-        self.data["trades"][user_id].append(trade_data)
-
-        if len(self.data["trades"][user_id]) > 100:
-            self.data["trades"][user_id] = self.data["trades"][user_id][-100:]
-
-        self.save_data()
+        now = time.time()
+        trade_data["id"] = hashlib.sha256(f"{user_id}:{now}:{next(self._trade_seq)}".encode()).hexdigest()[:12]
+        trade_data["timestamp"] = datetime.fromtimestamp(now).isoformat()
+        ts = int(now * 1000)
+        symbol = trade_data.get("symbol") or ""
+        pnl = trade_data.get("pnl")
+        quantity, price = _num(trade_data.get("quantity")), _num(trade_data.get("price"))
+
+        with self._lock:
+            trades = self.data["trades"].setdefault(user_id, [])
+            trades.append(trade_data)
+            if len(trades) > TRADES_CACHE_LIMIT:
+                del trades[: len(trades) - TRADES_CACHE_LIMIT]
+            self._add_stats(self.data["stats"], user_id, symbol, trade_data, ts)
+
+            self._enqueue(
+                "INSERT INTO trades (user_id, trade_id, data, symbol, side, quantity, price, pnl, ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (user_id, trade_data["id"], json.dumps(trade_data, ensure_ascii=False), symbol, trade_data.get("side"), quantity, price, pnl, ts),
+            )
+            # الإحصاءات تتحدث في نفس الـ transaction مع الصفقة (لا إعادة حساب عند القراءة)
+            self._enqueue(
+                """
+                INSERT INTO trade_stats (user_id, symbol, trades, volume, realized_pnl, closed, wins, first_ts, last_ts)
+                VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (user_id, symbol) DO UPDATE SET
+                    trades = trades + 1,
+                    volume = volume + excluded.volume,
+                    realized_pnl = realized_pnl + excluded.realized_pnl,
+                    closed = closed + excluded.closed,
+                    wins = wins + excluded.wins,
+                    last_ts = excluded.last_ts
+                """,
+                (user_id, symbol, quantity * price, pnl or 0.0, int(pnl is not None), int(pnl is not None and pnl > 0), ts, ts),
+            )
+        event_bus.publish(user_id, "trade", trade_data)
         return trade_data["id"]
 
     def get_trades(self, user_id, limit=50):
+        if self.shared:
+            # صفقات البوت تكتبها عملية bot_runner
+            rows = self._reader().execute(
+                "SELECT data FROM trades WHERE user_id = ? ORDER BY seq DESC LIMIT ?", (user_id, limit)
+            ).fetchall()
+            return [json.loads(raw) for (raw,) in reversed(rows)]
         return self.data["trades"].get(user_id, [])[-limit:]
 
+    def last_trade_seq(self) -> int:
+        row = self._reader().execute("SELECT MAX(seq) FROM trades").fetchone()
+        return row[0] or 0
+
+    def trades_after(self, user_ids: List[str], seq: int) -> List[Tuple[int, str, Dict]]:
+        """صفقات أحدث من seq لعدة مستخدمين باستعلام واحد (نطاق على rowid بدون مسح)"""
+        if not user_ids:
+            return []
+        marks = ",".join("?" * len(user_ids))
+        rows = self._reader().execute(
+            f"SELECT seq, user_id, data FROM trades WHERE seq > ? AND user_id IN ({marks}) ORDER BY seq",
+            (seq, *user_ids),
+        ).fetchall()
+        return [(row_seq, user_id, json.loads(raw)) for row_seq, user_id, raw in rows]
+
+    def query_trades(
+        self,
+        user_id,
+        symbol: Optional[str] = None,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+    ) -> Dict:
+        """
+        صفحة من كل تاريخ الصفقات، الأحدث أولًا (SQLite ثم الأرشيف).
+        end_ms حصري؛ cursor = next_cursor من الصفحة السابقة (ValueError إذا كان غير صالح).
+        """
+        limit = max(1, min(int(limit), TRADE_PAGE_MAX))
+        before = parse_trade_cursor(cursor)
+        self.flush()
+
+        sql = "SELECT seq, ts, data FROM trades WHERE user_id = ?"
+        params: List = [user_id]
+        if symbol:
+            sql += " AND symbol = ?"
+            params.append(symbol)
+        if start_ms is not None:
+            sql += " AND ts >= ?"
+            params.append(int(start_ms))
+        if end_ms is not None:
+            sql += " AND ts < ?"
+            params.append(int(end_ms))
+        if before is not None:
+            sql += " AND (ts, seq) < (?, ?)"
+            params += before
+        sql += " ORDER BY ts DESC, seq DESC LIMIT ?"
+        params.append(limit + 1)
+
+        page = [{**json.loads(raw), "seq": seq, "ts": ts} for seq, ts, raw in self._reader().execute(sql, params)]
+        if len(page) <= limit:
+            last = (page[-1]["ts"], page[-1]["seq"]) if page else before
+            page += self.archive.query(user_id, symbol, start_ms, end_ms, last, limit + 1 - len(page))
+
+        has_more = len(page) > limit
+        page = page[:limit]
+        return {"trades": page, "next_cursor": f"{page[-1]['ts']}:{page[-1]['seq']}" if has_more else None}
+
+    def get_trade_stats(self, user_id) -> Dict:
+        """الإحصاءات التراكمية (كل التاريخ بما فيه المؤرشف) بدون المرور على الصفقات"""
+        if self.shared:
+            rows = self._reader().execute(
+                "SELECT symbol, trades, volume, realized_pnl, closed, wins, first_ts, last_ts FROM trade_stats WHERE user_id = ?",
+                (user_id,),
+            ).fetchall()
+        else:
+            with self._lock:
+                rows = [(symbol, *row) for symbol, row in self.data["stats"].get(user_id, {}).items()]
+
+        def summary(trades, volume, pnl, closed, wins, first_ts, last_ts):
+            return {
+                "trades": trades,
+                "volume": round(volume, 8),
+                "realized_pnl": round(pnl, 8),
+                "closed_trades": closed,
+                "wins": wins,
+                "win_rate": round(wins / closed * 100, 2) if closed else None,
+                "first_ts": first_ts,
+                "last_ts": last_ts,
+            }
+
+        by_symbol = {symbol or "?": summary(*row) for symbol, *row in rows}
+        totals = [sum(r[i] for r in rows) for i in range(1, 6)]
+        first = min((r[6] for r in rows if r[6] is not None), default=None)
+        last = max((r[7] for r in rows if r[7] is not None), default=None)
+        return {**summary(*totals, first, last), "by_symbol": by_symbol}
+
+    def archive_trades(self, before_ms: Optional[int] = None, batch: int = TRADE_ARCHIVE_BATCH) -> int:
+        """نقل الصفقات الأقدم من before_ms من SQLite إلى الأرشيف العمودي (الإحصاءات لا تتغير)"""
+        if before_ms is None:
+            before_ms = int((time.time() - TRADE_ARCHIVE_AFTER_DAYS * 86400) * 1000)
+        self.flush()
+        reader = self._reader()
+        users = [u for (u,) in reader.execute("SELECT DISTINCT user_id FROM trades WHERE ts < ?", (before_ms,))]
+        moved = 0
+        for user_id in users:
+            while True:
+                rows = reader.execute(
+                    "SELECT seq, ts, data FROM trades WHERE user_id = ? AND ts < ? ORDER BY ts, seq LIMIT ?",
+                    (user_id, before_ms, batch),
+                ).fetchall()
+                if not rows:
+                    break
+                # الأرشيف أولًا ثم الحذف: توقف بينهما يترك نسخة مكررة يتجاهلها الأرشيف لا صفقة مفقودة
+                self.archive.append(user_id, [(seq, ts, json.loads(raw)) for seq, ts, raw in rows])
+                last_seq, last_ts = rows[-1][0], rows[-1][1]
+                with self._flush_lock, self._conn:
+                    self._conn.execute("BEGIN")
+                    self._conn.execute(
+                        "DELETE FROM trades WHERE user_id = ? AND ts < ? AND (ts, seq) <= (?, ?)",
+                        (user_id, before_ms, last_ts, last_seq),
+                    )
+                moved += len(rows)
+        return moved
+
+    # ---------- bot state ----------
+    def put_bot_state(self, user_id, state: Dict):
+        """
+        نفس الحالة لا تُكتب ثانية، لكن updated_at يتقدم كنبضة (كل BOT_STATE_HEARTBEAT على الأكثر):
+        بوت خامل بدون صفقات ولا تغيّر أسعار ليس «متوقفًا» عند القارئ
+        """
+        raw = json.dumps(state, ensure_ascii=False, sort_keys=True)
+        now = time.time()
+        with self._lock:
+            last = self._bot_states.get(user_id)
+            if last is not None and last[0] == raw:
+                if now - last[1] < BOT_STATE_HEARTBEAT:
+                    return
+                self._bot_states[user_id] = (raw, now)
+                self._enqueue("UPDATE bot_state SET updated_at = ? WHERE user_id = ?", (now, user_id))
+                return
+            self._bot_states[user_id] = (raw, now)
+            self._enqueue(
+                "INSERT OR REPLACE INTO bot_state (user_id, data, updated_at) VALUES (?, ?, ?)",
+                (user_id, raw, now),
+            )
+
+    def get_bot_state(self, user_id) -> Optional[Dict]:
+        row = self._reader().execute("SELECT data, updated_at FROM bot_state WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            return None
+        state = json.loads(row[0])
+        state["updated_at"] = row[1]
+        return state
+
+    def count_running_bots(self) -> int:
+        rows = self._reader().execute("SELECT data FROM bot_state").fetchall()
+        return sum(1 for (raw,) in rows if json.loads(raw).get("running"))
+
+    # ---------- bot checkpoints ----------
+    def put_checkpoint(self, user_id, checkpoint: Dict):
+        self._enqueue(
+            "INSERT OR REPLACE INTO bot_checkpoints (user_id, data, updated_at) VALUES (?, ?, ?)",
+            (user_id, json.dumps(checkpoint, ensure_ascii=False), time.time()),
+        )
+
+    def delete_checkpoint(self, user_id):
+        self._enqueue("DELETE FROM bot_checkpoints WHERE user_id = ?", (user_id,))
+
+    def get_checkpoints(self) -> Dict[str, Dict]:
+        """كل البوتات التي كانت تعمل عند آخر إيقاف للعملية"""
+        self.flush()
+        rows = self._reader().execute("SELECT user_id, data, updated_at FROM bot_checkpoints").fetchall()
+        checkpoints = {}
+        for user_id, raw, updated_at in rows:
+            checkpoint = json.loads(raw)
+            checkpoint["updated_at"] = updated_at
+            checkpoints[user_id] = checkpoint
+        return checkpoints
+
 
 db = Database()
 
+# ==================== RATE LIMITER ====================
+WEIGHT_LIMIT_1M = int(os.environ.get("BINANCE_WEIGHT_LIMIT_1M", "6000"))  # REQUEST_WEIGHT لكل IP
+ORDER_LIMIT_10S = int(os.environ.get("BINANCE_ORDER_LIMIT_10S", "100"))  # ORDERS لكل حساب
+RATE_LIMIT_SAFETY = 0.9  # لا نستهلك أكثر من 90% من الحد المعلن
+ORDER_RESERVE = 0.1  # نسبة من الوزن محجوزة للأوامر فقط
+REQUEST_QUEUE_TIMEOUT = 10  # أقصى انتظار في الطابور قبل الفشل (ثانية)
+
+PRIORITY_ORDER = 0  # place_order
+PRIORITY_NORMAL = 1  # الرصيد / الشموع / الأسعار
+PRIORITY_LOW = 2  # تشخيص ومزامنة وقت
+
+# أوزان Binance لكل endpoint (الافتراضي 1)
+ENDPOINT_WEIGHTS = {
+    ("GET", "/api/v3/account"): 20,
+    ("GET", "/api/v3/klines"): 2,
+    ("GET", "/api/v3/exchangeInfo"): 20,
+    ("POST", "/api/v3/userDataStream"): 2,
+    ("PUT", "/api/v3/userDataStream"): 2,
+    ("DELETE", "/api/v3/userDataStream"): 2,
+}
+
+
+def endpoint_weight(method: str, path: str, params: Optional[dict] = None) -> int:
+    if path == "/api/v3/ticker/price":
+        # رمز واحد = 2، عدة رموز أو الكل = 4
+        return 2 if params and "symbol" in params else 4
+    return ENDPOINT_WEIGHTS.get((method.upper(), path), 1)
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, window_s: float):
+        self.capacity = capacity
+        self.rate = capacity / window_s
+        self.tokens = capacity
+        self._ts = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._ts) * self.rate)
+        self._ts = now
+
+    def time_until(self, amount: float) -> float:
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """
+    ✅ جدولة الطلبات لكل host مع مراعاة حدود Binance:
+    - token bucket للوزن (REQUEST_WEIGHT/دقيقة) وآخر للأوامر لكل مفتاح (ORDERS/10 ثوانٍ)
+    - مزامنة مع X-MBX-USED-WEIGHT-1M و X-MBX-ORDER-COUNT-10S
+    - طابور أولويات: place_order أولًا، ثم الرصيد/البيانات، ثم التشخيص
+    - عند 429 / 418 يتوقف الكل حتى Retry-After
+    """
+
+    _instances: Dict[str, "RateLimiter"] = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def for_host(cls, base_url: str) -> "RateLimiter":
+        with cls._instances_lock:
+            limiter = cls._instances.get(base_url)
+            if limiter is None:
+                limiter = cls._instances[base_url] = cls(base_url)
+            return limiter
+
+    def __init__(self, base_url: str, weight_limit: int = WEIGHT_LIMIT_1M, order_limit: int = ORDER_LIMIT_10S):
+        self.base_url = base_url
+        self._cond = threading.Condition()
+        self._weight = TokenBucket(weight_limit * RATE_LIMIT_SAFETY, 60)
+        self._order_limit = order_limit * RATE_LIMIT_SAFETY
+        self._orders: Dict[str, TokenBucket] = {}
+        self._queue: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._waiting = [0, 0, 0]
+
+        self.blocked_until = 0.0
+        self.used_weight = 0
+        self.throttled = 0  # عدد ردود 429/418
+        self.rejected = 0  # طلبات تجاوزت REQUEST_QUEUE_TIMEOUT
+
+    def _reserve(self, priority: int) -> float:
+        return self._weight.capacity * ORDER_RESERVE * priority
+
+    def _order_bucket(self, api_key: str) -> TokenBucket:
+        bucket = self._orders.get(api_key)
+        if bucket is None:
+            bucket = self._orders[api_key] = TokenBucket(self._order_limit, 10)
+        return bucket
+
+    def acquire(self, weight: int, priority: int = PRIORITY_NORMAL, order_key: Optional[str] = None, timeout: float = REQUEST_QUEUE_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._queue, ticket)
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._weight.refill(now)
+                    orders = self._order_bucket(order_key) if order_key else None
+                    if orders is not None:
+                        orders.refill(now)
+
+                    if now < self.blocked_until:
+                        wait = self.blocked_until - now
+                    elif self._queue[0] != ticket:
+                        wait = None  # ننتظر دورنا
+                    else:
+                        need = min(weight + self._reserve(priority), self._weight.capacity)
+                        wait = max(self._weight.time_until(need), orders.time_until(1) if orders else 0.0)
+                        if wait == 0.0:
+                            self._weight.tokens -= weight
+                            if orders is not None:
+                                orders.tokens -= 1
+                            return
+
+                    remaining = deadline - now
+                    if remaining <= 0 or (wait is not None and now < self.blocked_until and wait > remaining):
+                        self.rejected += 1
+                        raise RateLimitExceeded(f"rate limit queue timeout on {self.base_url}")
+                    self._cond.wait(min(wait, remaining) if wait is not None else remaining)
+            finally:
+                self._waiting[priority] -= 1
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+    def observe(self, r, order_key: Optional[str] = None):
+        """تحديث الحالة من headers الرد"""
+        headers = r.headers
+        with self._cond:
+            used = headers.get("X-MBX-USED-WEIGHT-1M") or headers.get("x-mbx-used-weight-1m")
+            if used is not None:
+                self.used_weight = int(used)
+                self._weight.refill(time.monotonic())
+                self._weight.tokens = min(self._weight.tokens, self._weight.capacity - self.used_weight)
+
+            count = headers.get("X-MBX-ORDER-COUNT-10S") or headers.get("x-mbx-order-count-10s")
+            if count is not None and order_key:
+                bucket = self._order_bucket(order_key)
+                bucket.refill(time.monotonic())
+                bucket.tokens = min(bucket.tokens, bucket.capacity - int(count))
+
+            if r.status_code in (418, 429):
+                self.throttled += 1
+                try:
+                    retry_after = float(headers.get("Retry-After", 60))
+                except ValueError:
+                    retry_after = 60.0
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+                print(f"RATE LIMITED ({r.status_code}) on {self.base_url}: retry after {retry_after}s")
+            self._cond.notify_all()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            self._weight.refill(time.monotonic())
+            return {
+                "base_url": self.base_url,
+                "queue_depth": {"order": self._waiting[0], "normal": self._waiting[1], "low": self._waiting[2]},
+                "weight_tokens": round(self._weight.tokens, 1),
+                "used_weight_1m": self.used_weight,
+                "blocked_for_s": round(max(0.0, self.blocked_until - time.monotonic()), 1),
+                "throttled": self.throttled,
+                "rejected": self.rejected,
+            }
+
+
+# ==================== CIRCUIT BREAKER ====================
+BINANCE_CONNECT_TIMEOUT = float(os.environ.get("BINANCE_CONNECT_TIMEOUT", "3.05"))  # منفصل عن read timeout
+BREAKER_WINDOW = 30  # نافذة حساب نسبة الأخطاء (ثانية)
+BREAKER_MIN_CALLS = 10  # أقل عدد طلبات في النافذة قبل الحكم بالنسبة
+BREAKER_ERROR_RATE = 0.5
+BREAKER_SLOW_CALL = 5.0  # طلب أبطأ من هذا (ثانية) يُحسب بطيئًا
+BREAKER_SLOW_RATE = 0.5
+BREAKER_CONSECUTIVE_FAILURES = 5  # انقطاع كامل: لا ننتظر اكتمال النافذة
+BREAKER_COOLDOWN = 10  # مدة الفتح الأولى، تتضاعف مع كل probe فاشل
+BREAKER_MAX_COOLDOWN = 120
+HEDGE_DELAY_MIN = 0.3  # أقل انتظار قبل إرسال نسخة احتياطية من GET
+HEDGE_DELAY_MAX = 2.0
+HEDGE_WORKERS = int(os.environ.get("BINANCE_HEDGE_WORKERS", "64"))
+
+_hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="binance-hedge")
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    ✅ قاطع لكل host:
+    - closed: يفتح عند نسبة أخطاء أو طلبات بطيئة عالية، أو أخطاء متتالية
+    - open: كل الطلبات تفشل فورًا (CircuitOpen) بدل حجز thread لثوانٍ
+    - half_open: طلب تجريبي واحد؛ نجاحه يغلق القاطع وفشله يضاعف مدة الفتح
+    - أخطاء 4xx تعني أن Binance يرد، فلا تُحسب فشلًا (429 يتولاها RateLimiter)
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    _instances: Dict[str, "CircuitBreaker"] = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def for_host(cls, base_url: str) -> "CircuitBreaker":
+        with cls._instances_lock:
+            breaker = cls._instances.get(base_url)
+            if breaker is None:
+                breaker = cls._instances[base_url] = cls(base_url)
+            return breaker
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.state = self.CLOSED
+        self.cooldown = BREAKER_COOLDOWN
+        self._opened_at = 0.0
+        self._probe_inflight = False
+        self._consecutive = 0
+        self._calls: deque = deque(maxlen=500)  # (monotonic, ok, latency_s)
+        self._lock = threading.Lock()
+
+        self.trips = 0
+        self.short_circuited = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    @property
+    def retry_in(self) -> float:
+        return max(0.0, self._opened_at + self.cooldown - time.monotonic()) if self.state == self.OPEN else 0.0
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    self.short_circuited += 1
+                    raise CircuitOpen(f"Binance unavailable ({self.base_url}), retry in {self.retry_in:.0f}s")
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self._probe_inflight:
+                    self.short_circuited += 1
+                    raise CircuitOpen(f"Binance unavailable ({self.base_url}), probing")
+                self._probe_inflight = True
+
+    def release(self):
+        """طلب سُمح له ثم أُلغي قبل الإرسال (مثلًا RateLimitExceeded)"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_inflight = False
+
+    def record(self, ok: bool, latency: float):
+        now = time.monotonic()
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._probe_inflight:
+                self._probe_inflight = False
+                if ok and latency < BREAKER_SLOW_CALL:
+                    print(f"CIRCUIT CLOSED: {self.base_url}")
+                    self.state = self.CLOSED
+                    self.cooldown = BREAKER_COOLDOWN
+                    self._calls.clear()
+                    self._consecutive = 0
+                else:
+                    self._trip(now, min(self.cooldown * 2, BREAKER_MAX_COOLDOWN))
+                return
+            if self.state != self.CLOSED:
+                return
+
+            self._calls.append((now, ok, latency))
+            self._consecutive = 0 if ok else self._consecutive + 1
+            while self._calls and now - self._calls[0][0] > BREAKER_WINDOW:
+                self._calls.popleft()
+
+            if self._consecutive >= BREAKER_CONSECUTIVE_FAILURES:
+                self._trip(now, self.cooldown)
+                return
+            n = len(self._calls)
+            if n >= BREAKER_MIN_CALLS:
+                errors = sum(1 for _, good, _ in self._calls if not good)
+                slow = sum(1 for _, _, lat in self._calls if lat >= BREAKER_SLOW_CALL)
+                if errors / n >= BREAKER_ERROR_RATE or slow / n >= BREAKER_SLOW_RATE:
+                    self._trip(now, self.cooldown)
+
+    def _trip(self, now: float, cooldown: float):
+        self.state = self.OPEN
+        self._opened_at = now
+        self.cooldown = cooldown
+        self.trips += 1
+        print(f"CIRCUIT OPEN: {self.base_url} for {cooldown:.0f}s")
+
+    def hedge_delay(self) -> float:
+        """p95 لزمن الطلبات الناجحة الأخيرة: ما بعده يُعتبر ذيلًا يستحق نسخة احتياطية"""
+        with self._lock:
+            latencies = sorted(lat for _, ok, lat in self._calls if ok)
+        if len(latencies) < BREAKER_MIN_CALLS:
+            return HEDGE_DELAY_MAX
+        p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        return min(HEDGE_DELAY_MAX, max(HEDGE_DELAY_MIN, p95))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            n = len(self._calls)
+            errors = sum(1 for _, ok, _ in self._calls if not ok)
+        return {
+            "base_url": self.base_url,
+            "state": self.state,
+            "retry_in_s": round(self.retry_in, 1),
+            "window_calls": n,
+            "window_error_rate": round(errors / n, 3) if n else 0.0,
+            "trips": self.trips,
+            "short_circuited": self.short_circuited,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+# ==================== BINANCE CLOCK ====================
+CLOCK_RESYNC_INTERVAL = 300  # إعادة مزامنة دورية (ثانية)
+CLOCK_DRIFT_TOLERANCE_MS = 250  # قفزة في ساعة الجهاز (NTP مثلًا) تستدعي إعادة المزامنة
+CLOCK_SAMPLES = 3  # نأخذ العيّنة ذات أقل RTT
+
+
+class BinanceClock:
+    """
+    ✅ فرق وقت مشترك لكل base_url (testnet / mainnet):
+    - قياس offset و RTT مرة واحدة ومشاركته بين كل BinanceAPIManager
+    - إعادة مزامنة في الخلفية عند انتهاء المدة أو اكتشاف انحراف الساعة
+    - مزامنة فورية فقط عند code=-1021 من Binance
+    """
+
+    _instances: Dict[str, "BinanceClock"] = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def for_base_url(cls, base_url: str) -> "BinanceClock":
+        with cls._instances_lock:
+            clock = cls._instances.get(base_url)
+            if clock is None:
+                clock = cls._instances[base_url] = cls(base_url)
+            return clock
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.offset_ms = 0
+        self.rtt_ms: Optional[float] = None
+        self.last_sync = 0.0  # time.monotonic() لآخر مزامنة ناجحة
+
+        self._lock = threading.Lock()
+        self._resyncing = False
+        self._anchor_wall = 0.0
+        self._anchor_mono = 0.0
+
+    def _sample(self) -> Tuple[float, float]:
+        breaker = CircuitBreaker.for_host(self.base_url)
+        limiter = RateLimiter.for_host(self.base_url)
+        breaker.allow()
+        try:
+            limiter.acquire(1, PRIORITY_LOW)
+        except RateLimitExceeded:
+            breaker.release()
+            raise
+        t0 = time.time()
+        try:
+            r = self.session.get(f"{self.base_url}/api/v3/time", timeout=(BINANCE_CONNECT_TIMEOUT, 5))
+        except requests.RequestException:
+            breaker.record(False, time.time() - t0)
+            raise
+        t1 = time.time()
+        breaker.record(r.status_code < 500, t1 - t0)
+        limiter.observe(r)
+        r.raise_for_status()
+        server_ms = int(r.json()["serverTime"])
+        # نفترض أن السيرفر ختم الوقت في منتصف الرحلة
+        return server_ms - (t0 + t1) * 500, (t1 - t0) * 1000
+
+    @profiler.wrap("binance.sync_time")
+    def sync(self, samples: int = CLOCK_SAMPLES) -> bool:
+        """مزامنة الوقت مع Binance"""
+        try:
+            best = min((self._sample() for _ in range(max(1, samples))), key=lambda s: s[1])
+        except Exception as e:
+            ERRORS.labels("time_sync").inc()
+            print("TIME SYNC ERROR:", e)
+            return False
+
+        with self._lock:
+            if self.last_sync:
+                CLOCK_OFFSET_CHANGE.observe(abs(int(best[0]) - self.offset_ms))
+            self.offset_ms = int(best[0])
+            self.rtt_ms = best[1]
+            self.last_sync = self._anchor_mono = time.monotonic()
+            self._anchor_wall = time.time()
+        return True
+
+    def _needs_resync(self) -> bool:
+        mono = time.monotonic()
+        if mono - self.last_sync > CLOCK_RESYNC_INTERVAL:
+            return True
+        drift_ms = ((time.time() - self._anchor_wall) - (mono - self._anchor_mono)) * 1000
+        return abs(drift_ms) > CLOCK_DRIFT_TOLERANCE_MS
+
+    def _resync_in_background(self):
+        with self._lock:
+            if self._resyncing:
+                return
+            self._resyncing = True
+
+        def run():
+            try:
+                self.sync()
+            finally:
+                self._resyncing = False
+
+        threading.Thread(target=run, name="clock-resync", daemon=True).start()
+
+    def now_ms(self) -> int:
+        if not self.last_sync:
+            # أول استخدام: لا يوجد offset بعد، نزامن مباشرة (مرة واحدة لكل base_url)
+            self.sync(samples=1)
+        elif self._needs_resync():
+            self._resync_in_background()
+        return int(time.time() * 1000) + self.offset_ms
+
+    def status(self) -> Dict:
+        return {
+            "base_url": self.base_url,
+            "offset_ms": self.offset_ms,
+            "rtt_ms": self.rtt_ms,
+            "age_s": round(time.monotonic() - self.last_sync, 1) if self.last_sync else None,
+        }
+
+
 # ==================== BINANCE API MANAGER ====================
+BINANCE_HTTP_POOL_MAXSIZE = 8  # اتصالات keep-alive لكل manager (الداشبورد + البوت بالتوازي)
+AUTH_CHECK_WORKERS = 16
+
+# فحوص test_api_authentication المستقلة تعمل بالتوازي
+_auth_check_pool = ThreadPoolExecutor(max_workers=AUTH_CHECK_WORKERS, thread_name_prefix="auth-check")
+
+
+def credential_fingerprint(api_key: str, api_secret: str, testnet: bool) -> str:
+    """بصمة للمفاتيح بدون تخزين السر نفسه كمفتاح"""
+    raw = f"{(api_key or '').strip()}:{(api_secret or '').strip()}:{int(bool(testnet))}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:24]
+
+
+def paper_fingerprint(user_id: str, testnet: bool) -> str:
+    """الحساب الورقي يخص المستخدم (بدون مفاتيح): البصمة من user_id والشبكة"""
+    return f"paper:{user_id}:{int(bool(testnet))}"
+
+
+def account_fingerprint(user_id: str, user: Dict) -> str:
+    """بصمة الحساب الحالي في سجل المستخدم (نفس بصمة manager الـ pool)"""
+    if user.get("paper"):
+        return paper_fingerprint(user_id, user["is_testnet"])
+    return credential_fingerprint(user.get("api_key", ""), user.get("api_secret", ""), user["is_testnet"])
+
+
 class BinanceAPIManager:
     """
     ✅ إصلاحات أساسية:
@@ -110,18 +1210,23 @@ class BinanceAPIManager:
     def __init__(self, api_key: str, api_secret: str, testnet: bool = True):
         self.api_key = (api_key or "").strip()
         self.api_secret = (api_secret or "").strip()
+        self.testnet = testnet
+        self.fingerprint = credential_fingerprint(self.api_key, self.api_secret, testnet)
         self.base_url = BINANCE_TESTNET_SPOT if testnet else BINANCE_MAINNET_SPOT
 
         self.session = requests.Session()
-        self.session.headers.update(
-            {
-                "X-MBX-APIKEY": self.api_key,
-                "Content-Type": "application/x-www-form-urlencoded",
-            }
-        )
-
-        # فرق الوقت بين سيرفرنا و Binance (ms)
-        self._time_offset_ms = 0
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=BINANCE_HTTP_POOL_MAXSIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Content-Type": "application/x-www-form-urlencoded"})
+        if self.api_key:
+            # manager بدون مفاتيح (بيانات السوق العامة) لا يرسل header فارغ
+            self.session.headers["X-MBX-APIKEY"] = self.api_key
+
+        # فرق الوقت بين سيرفرنا و Binance (ms) مشترك لكل من يستخدم نفس base_url
+        self.clock = BinanceClock.for_base_url(self.base_url)
+        self.limiter = RateLimiter.for_host(self.base_url)
+        self.breaker = CircuitBreaker.for_host(self.base_url)
 
     # ---------- helpers ----------
     def _sign(self, data: str) -> str:
@@ -131,46 +1236,123 @@ class BinanceAPIManager:
             hashlib.sha256,
         ).hexdigest()
 
-    def _get_server_time_ms(self) -> int:
-        r = self.session.get(f"{self.base_url}/api/v3/time", timeout=10)
-        r.raise_for_status()
-        return int(r.json()["serverTime"])
+    @property
+    def _time_offset_ms(self) -> int:
+        return self.clock.offset_ms
 
     def sync_time(self) -> bool:
-        """مزامنة الوقت مع Binance"""
-        try:
-            server_ms = self._get_server_time_ms()
-            local_ms = int(time.time() * 1000)
-            self._time_offset_ms = server_ms - local_ms
-            return True
-        except Exception as e:
-            print("TIME SYNC ERROR:", e)
-            return False
+        """مزامنة الوقت مع Binance (تحدّث الساعة المشتركة)"""
+        return self.clock.sync()
 
     def _now_ms(self) -> int:
-        return int(time.time() * 1000) + self._time_offset_ms
+        return self.clock.now_ms()
 
-    def _request(self, method: str, path: str, params: Optional[dict] = None, signed: bool = False, timeout: int = 15):
+    @staticmethod
+    def _is_timestamp_error(r) -> bool:
+        if r.status_code != 400:
+            return False
+        try:
+            return r.json().get("code") == -1021
+        except Exception:
+            return False
+
+    @profiler.wrap(lambda self, method, path, *args, **kwargs: f"binance {method.upper()} {path}")
+    def _request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[dict] = None,
+        signed: bool = False,
+        timeout: int = 15,
+        priority: int = PRIORITY_NORMAL,
+        query: Optional[str] = None,
+    ):
         """
         طلب موحّد يدعم:
-        - signed: يضيف timestamp/recvWindow/signature بعد مزامنة الوقت
+        - signed: يضيف timestamp/recvWindow/signature من الساعة المشتركة
+        - query: query string جاهز مسبقًا (أوامر مجهّزة) يُضاف إليه timestamp و signature فقط
+        - عند code=-1021 فقط: مزامنة فورية ثم إعادة المحاولة مرة واحدة
+        - كل طلب يمر عبر RateLimiter المشترك للـ host (وزن + أولوية)
+        - CircuitBreaker للـ host: فشل فوري (CircuitOpen) أثناء الانقطاع
+        - timeout هو read timeout؛ الاتصال نفسه محدود بـ BINANCE_CONNECT_TIMEOUT
+        - GET (idempotent) يُرسل مرة ثانية إذا تأخر أكثر من p95 المعتاد، ويُؤخذ أول رد
         """
         params = params or {}
+        url = f"{self.base_url}{path}"
+        method = method.upper()
+        weight = endpoint_weight(method, path, params)
+        order_key = self.api_key if path == "/api/v3/order" and method == "POST" else None
+
+        requests_by = BINANCE_REQUESTS.labels
+        latency = BINANCE_LATENCY.labels(method, path)
 
-        if signed:
-            # مزامنة الوقت قبل التوقيع (حل مشكلة -1021)
-            self.sync_time()
-            params["timestamp"] = self._now_ms()
+        def send_once(url, **kwargs):
+            try:
+                self.breaker.allow()
+            except CircuitOpen:
+                requests_by(method, path, "circuit_open").inc()
+                raise
+            try:
+                self.limiter.acquire(weight, priority, order_key=order_key)
+            except RateLimitExceeded:
+                self.breaker.release()
+                requests_by(method, path, "rate_limited").inc()
+                raise
+            t0 = time.monotonic()
+            try:
+                r = self.session.request(method, url, timeout=(BINANCE_CONNECT_TIMEOUT, timeout), **kwargs)
+            except requests.RequestException as e:
+                elapsed = time.monotonic() - t0
+                self.breaker.record(False, elapsed)
+                latency.observe(elapsed)
+                requests_by(method, path, type(e).__name__).inc()
+                raise
+            elapsed = time.monotonic() - t0
+            self.breaker.record(r.status_code < 500, elapsed)
+            self.limiter.observe(r, order_key=order_key)
+            latency.observe(elapsed)
+            requests_by(method, path, r.status_code).inc()
+            return r
+
+        def send(url, **kwargs):
+            if method == "GET":
+                return self._hedged(send_once, url, **kwargs)
+            return send_once(url, **kwargs)
+
+        if not signed:
+            return send(url, params=params)
+
+        if query is None:
             params.setdefault("recvWindow", 5000)
+            query = "&".join([f"{k}={v}" for k, v in params.items()])
 
-            qs = "&".join([f"{k}={v}" for k, v in params.items()])
-            params["signature"] = self._sign(qs)
+        for attempt in range(2):
+            qs = f"{query}&timestamp={self._now_ms()}"
+            r = send(f"{url}?{qs}&signature={self._sign(qs)}")
+            if attempt == 0 and self._is_timestamp_error(r) and self.sync_time():
+                continue
+            return r
 
-        url = f"{self.base_url}{path}"
-        if method.upper() == "GET":
-            return self.session.get(url, params=params, timeout=timeout)
-        else:
-            return self.session.post(url, params=params, timeout=timeout)
+    def _hedged(self, send_once: Callable, url: str, **kwargs):
+        primary = _hedge_pool.submit(send_once, url, **kwargs)
+        try:
+            return primary.result(timeout=self.breaker.hedge_delay())
+        except FutureTimeout:
+            pass
+        if self.breaker.state != CircuitBreaker.CLOSED:
+            return primary.result()
+
+        self.breaker.hedges += 1
+        backup = _hedge_pool.submit(send_once, url, **kwargs)
+        pending = {primary, backup}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    if f is backup:
+                        self.breaker.hedge_wins += 1
+                    return f.result()
+        return primary.result()  # الاثنان فشلا: نرفع خطأ الطلب الأصلي
 
     # ---------- diagnostics ----------
     def test_api_authentication(self) -> Dict:
@@ -191,21 +1373,27 @@ class BinanceAPIManager:
             "server_time": None,
         }
 
+        # الاختباران مستقلان: اتصال بدون مفاتيح و /account موقّع في نفس الوقت (رحلة واحدة بدل اثنتين)
+        ping = _auth_check_pool.submit(self._request, "GET", "/api/v3/time", timeout=10, priority=PRIORITY_LOW)
+        account = _auth_check_pool.submit(
+            self._request, "GET", "/api/v3/account", signed=True, timeout=15, priority=PRIORITY_LOW
+        )
+
         # 1) اختبار اتصال بدون مفاتيح
+        connection_error = None
         try:
-            t = self._request("GET", "/api/v3/time", timeout=10)
-            if t.status_code != 200:
-                result["message"] = f"❌ فشل الوصول إلى Binance: HTTP {t.status_code}"
-                return result
-            result["connection"] = True
-            result["server_time"] = t.json().get("serverTime")
+            t = ping.result()
+            if t.status_code == 200:
+                result["connection"] = True
+                result["server_time"] = t.json().get("serverTime")
+            else:
+                connection_error = f"❌ فشل الوصول إلى Binance: HTTP {t.status_code}"
         except Exception as e:
-            result["message"] = f"❌ خطأ اتصال/شبكة: {e}"
-            return result
+            connection_error = f"❌ خطأ اتصال/شبكة: {e}"
 
         # 2) اختبار مفاتيح (موقّع)
         try:
-            r = self._request("GET", "/api/v3/account", signed=True, timeout=15)
+            r = account.result()
             data = {}
             try:
                 data = r.json()
@@ -213,12 +1401,10 @@ class BinanceAPIManager:
                 data = {"raw": r.text[:300]}
 
             if r.status_code == 200:
+                result["connection"] = True  # /account وصل حتى لو فشل /time
                 result["authentication"] = True
                 result["trading_enabled"] = bool(data.get("canTrade", False))
-                for b in data.get("balances", []):
-                    if b.get("asset") == "USDT":
-                        result["balance"] = float(b.get("free", 0) or 0)
-                        break
+                result["balance"] = Portfolio.from_balances(data.get("balances", [])).free_of(QUOTE_ASSET)
                 result["success"] = True
                 result["message"] = "✅ المصادقة ناجحة"
                 return result
@@ -226,13 +1412,39 @@ class BinanceAPIManager:
             # أخطاء Binance ترجع code/msg غالبًا
             code = data.get("code")
             msg = data.get("msg") or str(data)
-            result["message"] = f"❌ Binance error (HTTP {r.status_code}) | code={code} | msg={msg}"
+            result["message"] = connection_error or f"❌ Binance error (HTTP {r.status_code}) | code={code} | msg={msg}"
             return result
 
         except Exception as e:
-            result["message"] = f"❌ خطأ غير متوقع أثناء المصادقة: {e}"
+            result["message"] = connection_error or f"❌ خطأ غير متوقع أثناء المصادقة: {e}"
             return result
 
+    # ---------- user data stream ----------
+    def create_listen_key(self) -> Optional[str]:
+        try:
+            r = self._request("POST", "/api/v3/userDataStream", timeout=10)
+            if r.status_code == 200:
+                return r.json().get("listenKey")
+            print("create_listen_key error:", r.status_code, r.text[:200])
+            return None
+        except Exception as e:
+            print("create_listen_key error:", e)
+            return None
+
+    def keepalive_listen_key(self, listen_key: str) -> bool:
+        try:
+            r = self._request("PUT", "/api/v3/userDataStream", params={"listenKey": listen_key}, timeout=10)
+            return r.status_code == 200
+        except Exception as e:
+            print("keepalive_listen_key error:", e)
+            return False
+
+    def close_listen_key(self, listen_key: str):
+        try:
+            self._request("DELETE", "/api/v3/userDataStream", params={"listenKey": listen_key}, timeout=10)
+        except Exception as e:
+            print("close_listen_key error:", e)
+
     # ---------- basic data ----------
     def get_account_info(self) -> Optional[Dict]:
         try:
@@ -246,15 +1458,7 @@ class BinanceAPIManager:
 
     def get_balance(self) -> float:
         info = self.get_account_info()
-        if not info:
-            return 0.0
-        for b in info.get("balances", []):
-            if b.get("asset") == "USDT":
-                try:
-                    return float(b.get("free", 0) or 0)
-                except Exception:
-                    return 0.0
-        return 0.0
+        return Portfolio.from_balances(info.get("balances", [])).free_of(QUOTE_ASSET) if info else 0.0
 
     def get_ticker_price(self, symbol: str) -> Optional[float]:
         try:
@@ -266,14 +1470,29 @@ class BinanceAPIManager:
             print("get_ticker_price error:", e)
             return None
 
-    def get_klines(self, symbol: str, interval: str = "1h", limit: int = 100) -> List:
+    def get_ticker_prices(self, symbols: Optional[List[str]] = None) -> Dict[str, float]:
+        """أسعار عدة رموز في طلب واحد (كل الرموز إذا symbols=None)"""
         try:
-            r = self._request(
-                "GET",
-                "/api/v3/klines",
-                params={"symbol": symbol, "interval": interval, "limit": limit},
-                timeout=15,
-            )
+            params = {"symbols": json.dumps(sorted(symbols), separators=(",", ":"))} if symbols else {}
+            r = self._request("GET", "/api/v3/ticker/price", params=params, timeout=10)
+            if r.status_code == 400 and symbols:
+                # رمز غير صالح يفشل الطلب كاملًا (code=-1121): نجلب الكل ونصفّي
+                r = self._request("GET", "/api/v3/ticker/price", timeout=10)
+                wanted = set(symbols)
+                return {t["symbol"]: float(t["price"]) for t in r.json() if t["symbol"] in wanted} if r.status_code == 200 else {}
+            if r.status_code == 200:
+                return {t["symbol"]: float(t["price"]) for t in r.json()}
+            return {}
+        except Exception as e:
+            print("get_ticker_prices error:", e)
+            return {}
+
+    def get_klines(self, symbol: str, interval: str = "1h", limit: int = 100, start_time: Optional[int] = None) -> List:
+        try:
+            params = {"symbol": symbol, "interval": interval, "limit": limit}
+            if start_time is not None:
+                params["startTime"] = int(start_time)
+            r = self._request("GET", "/api/v3/klines", params=params, timeout=15)
             if r.status_code == 200:
                 return r.json()
             return []
@@ -281,16 +1500,48 @@ class BinanceAPIManager:
             print("get_klines error:", e)
             return []
 
-    def place_order(self, symbol: str, side: str, quantity: float, order_type: str = "MARKET") -> Dict:
+    def get_exchange_info(self, symbols: Optional[List[str]] = None) -> Optional[Dict]:
         try:
-            params = {
-                "symbol": symbol,
-                "side": side.upper(),
-                "type": order_type.upper(),
-                "quantity": quantity,
-                "recvWindow": 60000,
-            }
-            r = self._request("POST", "/api/v3/order", params=params, signed=True, timeout=15)
+            params = {"symbols": json.dumps(symbols, separators=(",", ":"))} if symbols else None
+            r = self._request("GET", "/api/v3/exchangeInfo", params=params, timeout=15)
+            if r.status_code == 200:
+                return r.json()
+            print("get_exchange_info error: HTTP", r.status_code, r.text[:200])
+            return None
+        except Exception as e:
+            print("get_exchange_info error:", e)
+            return None
+
+    def prepare_order(
+        self, symbol: str, side: str, quantity, order_type: str = "MARKET", price=None, ref_price=None
+    ) -> PreparedOrder:
+        """تقريب الكمية/السعر على فلاتر الرمز والتحقق محليًا (يرمي OrderRejected)"""
+        filters = exchange_info_for(self.testnet).get(symbol)
+        return prepare_order(filters, symbol, side, quantity, order_type, price, ref_price)
+
+    def place_order(
+        self,
+        symbol: str,
+        side: str,
+        quantity=None,
+        order_type: str = "MARKET",
+        price=None,
+        ref_price=None,
+        prepared: Optional[PreparedOrder] = None,
+    ) -> Dict:
+        """
+        ✅ الأمر يُجهّز ويُتحقق منه محليًا قبل الإرسال:
+        - أمر مخالف للفلاتر لا يصل لـ Binance (rejected_locally)
+        - prepared: أمر مجهّز مسبقًا عبر prepare_order (يوفر التقريب وقت الإرسال)
+        """
+        try:
+            if prepared is None:
+                try:
+                    prepared = self.prepare_order(symbol, side, quantity, order_type, price, ref_price)
+                except OrderRejected as e:
+                    return {"error": f"Order rejected locally: {e}", "rejected_locally": True}
+
+            r = self._request("POST", "/api/v3/order", query=prepared.query, signed=True, timeout=15, priority=PRIORITY_ORDER)
             data = {}
             try:
                 data = r.json()
@@ -308,13 +1559,930 @@ class BinanceAPIManager:
             return {"error": f"place_order exception: {e}"}
 
 
+# ==================== MANAGER POOL ====================
+BINANCE_POOL_MAX_MANAGERS = int(os.environ.get("BINANCE_POOL_MAX_MANAGERS", "256"))
+BINANCE_POOL_IDLE_TTL = 15 * 60  # حذف الـ manager الخامل بعد هذه المدة (ثانية)
+
+
+class BinanceManagerPool:
+    """
+    ✅ سجل مشترك لـ BinanceAPIManager حسب بصمة المفاتيح:
+    - الداشبورد والبوت و setup يعيدون استخدام نفس الـ Session (اتصالات TCP/TLS دافئة)
+    - LRU + TTL للعناصر الخاملة
+    - تغيير مفاتيح المستخدم يلغي الـ manager القديم تلقائيًا
+    """
+
+    def __init__(self, max_size: int = BINANCE_POOL_MAX_MANAGERS, idle_ttl: float = BINANCE_POOL_IDLE_TTL):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, Tuple[BinanceAPIManager, float]]" = OrderedDict()
+        self._by_user: Dict[str, str] = {}
+
+    def get(self, user_id: Optional[str], api_key: str, api_secret: str, testnet: bool = True, paper: bool = False) -> BinanceAPIManager:
+        fp = paper_fingerprint(user_id, testnet) if paper else credential_fingerprint(api_key, api_secret, testnet)
+        now = time.monotonic()
+        with self._lock:
+            if user_id:
+                old_fp = self._by_user.get(user_id)
+                if old_fp and old_fp != fp:
+                    self._drop(old_fp)
+                self._by_user[user_id] = fp
+
+            item = self._items.get(fp)
+            if item is None:
+                CACHE_REQUESTS.labels("manager_pool", "miss").inc()
+                manager = PaperBinanceManager(user_id, testnet) if paper else BinanceAPIManager(api_key, api_secret, testnet)
+            else:
+                CACHE_REQUESTS.labels("manager_pool", "hit").inc()
+                manager = item[0]
+            self._items[fp] = (manager, now)
+            self._items.move_to_end(fp)
+            self._evict(now)
+            return manager
+
+    def for_user(self, user_id: str, user: Dict) -> BinanceAPIManager:
+        """manager حسب وضع المستخدم: مفاتيحه على testnet/mainnet أو حسابه الورقي"""
+        return self.get(
+            user_id, user.get("api_key", ""), user.get("api_secret", ""), user["is_testnet"], paper=bool(user.get("paper"))
+        )
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            fp = self._by_user.pop(user_id, None)
+            if fp:
+                self._drop(fp)
+
+    def _drop(self, fp: str):
+        item = self._items.pop(fp, None)
+        if item is not None:
+            item[0].session.close()
+
+    def _evict(self, now: float):
+        while self._items:
+            fp, (_, last_used) = next(iter(self._items.items()))
+            if len(self._items) <= self.max_size and now - last_used < self.idle_ttl:
+                break
+            self._drop(fp)
+
+    def __len__(self):
+        return len(self._items)
+
+
+binance_pool = BinanceManagerPool()
+
+
+# ==================== CREDENTIAL CHECKS ====================
+AUTH_CHECK_TTL = 60  # setup ثم start (أو إعادة تشغيل البوت) خلال هذه المدة بدون طلبات جديدة (ثانية)
+
+
+class CredentialCheckCache:
+    """
+    ✅ نتيجة test_api_authentication لكل بصمة مفاتيح:
+    - النجاح يُعاد استخدامه خلال TTL
+    - طلبات متزامنة لنفس المفاتيح تنتظر نفس الفحص (single-flight)
+    - الفشل لا يُخزَّن: المستخدم قد يصلح صلاحيات المفتاح ويعيد المحاولة فورًا
+    """
+
+    def __init__(self, ttl: float = AUTH_CHECK_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._results: Dict[str, Tuple[Dict, float]] = {}
+        self._inflight: Dict[str, Future] = {}
+
+    def verify(self, manager: BinanceAPIManager) -> Dict:
+        fp = manager.fingerprint
+        with self._lock:
+            cached = self._results.get(fp)
+            if cached is not None and time.monotonic() - cached[1] < self.ttl:
+                CACHE_REQUESTS.labels("auth_check", "hit").inc()
+                return {**cached[0], "cached": True}
+            future = self._inflight.get(fp)
+            owner = future is None
+            if owner:
+                future = self._inflight[fp] = Future()
+        CACHE_REQUESTS.labels("auth_check", "miss").inc()
+        if not owner:
+            return future.result()
+
+        result = None
+        try:
+            result = manager.test_api_authentication()
+        finally:
+            if result is None:
+                result = {"success": False, "message": "❌ خطأ غير متوقع أثناء المصادقة"}
+            now = time.monotonic()
+            with self._lock:
+                self._inflight.pop(fp, None)
+                if result["success"]:
+                    self._results = {k: v for k, v in self._results.items() if now - v[1] < self.ttl}
+                    self._results[fp] = (result, now)
+            future.set_result(result)
+        return result
+
+
+credential_checks = CredentialCheckCache()
+
+
+# ==================== MARKET DATA HUB ====================
+PRICE_CACHE_TTL = 5  # كل القرّاء خلال هذه المدة يتشاركون نفس الجلب (ثانية)
+
+
+class MarketDataHub:
+    """
+    ✅ أسعار مشتركة لكل البوتات على نفس الشبكة (testnet / mainnet):
+    - كل بوت يسجّل رموزه، والـ hub يجلب اتحاد الرموز في طلب واحد /ticker/price?symbols=[...]
+    - كاش لكل دورة (PRICE_CACHE_TTL) مع single-flight: طلب واحد مهما كان عدد القرّاء
+    - callbacks اختيارية لتوزيع الأسعار الجديدة على المشتركين
+    => عدد طلبات Binance يتبع عدد الرموز المختلفة وليس المستخدمين × الرموز
+    """
+
+    _instances: Dict[bool, "MarketDataHub"] = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def for_network(cls, testnet: bool) -> "MarketDataHub":
+        with cls._instances_lock:
+            hub = cls._instances.get(bool(testnet))
+            if hub is None:
+                hub = cls._instances[bool(testnet)] = cls(testnet)
+            return hub
+
+    def __init__(self, testnet: bool = True, ttl: float = PRICE_CACHE_TTL):
+        self.testnet = testnet
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._subscribers: Dict[object, Tuple[frozenset, Optional[Callable]]] = {}
+        self._prices: Dict[str, float] = {}
+        self._updated_at = 0.0  # time.monotonic()
+        self._fetched_symbols: frozenset = frozenset()
+        # رموز طُلبت ولم يرجعها Binance (أصل بدون زوج USDT في المحفظة): لا نطلبها ثانية
+        self._unlisted: frozenset = frozenset()
+        self._pushed_at: Dict[str, float] = {}  # أسعار الـ stream (bookTicker)
+        self.fetches = 0
+        self.version = 0  # يزيد مع كل تحديث أسعار (مفتاح كاش التقييمات المشتقة)
+
+    def subscribe(self, key, symbols: List[str], callback=None):
+        with self._lock:
+            self._subscribers[key] = (frozenset(s.upper() for s in symbols), callback)
+
+    def unsubscribe(self, key):
+        with self._lock:
+            self._subscribers.pop(key, None)
+
+    def _wanted(self, extra: frozenset) -> frozenset:
+        with self._lock:
+            wanted = set(extra)
+            for symbols, _ in self._subscribers.values():
+                wanted |= symbols
+            return frozenset(wanted) - self._unlisted
+
+    def _fresh(self, symbols: frozenset) -> bool:
+        now = time.monotonic()
+        symbols = symbols - self._unlisted
+        if now - self._updated_at < self.ttl and symbols <= self._fetched_symbols:
+            return True
+        return bool(symbols) and all(now - self._pushed_at.get(s, 0.0) < self.ttl for s in symbols)
+
+    @profiler.wrap("market.prices")
+    def prices(self, symbols: Optional[List[str]] = None) -> Dict[str, float]:
+        requested = frozenset(s.upper() for s in (symbols or []))
+        if self._fresh(requested):
+            CACHE_REQUESTS.labels("prices", "hit").inc()
+        else:
+            CACHE_REQUESTS.labels("prices", "miss").inc()
+            # single-flight: من يصل أثناء الجلب ينتظر النتيجة بدل طلب جديد
+            with self._fetch_lock:
+                if not self._fresh(requested):
+                    self.refresh(requested)
+        prices = self._prices
+        if not symbols:
+            return dict(prices)
+        return {s: prices[s] for s in requested if s in prices}
+
+    def get_price(self, symbol: str) -> Optional[float]:
+        return self.prices([symbol]).get(symbol.upper())
+
+    def refresh(self, extra: frozenset = frozenset()):
+        wanted = self._wanted(extra)
+        if not wanted:
+            return
+        manager = binance_pool.get(None, "", "", self.testnet)
+        prices = manager.get_ticker_prices(list(wanted))
+        self.fetches += 1
+        if not prices:
+            return
+        self._unlisted |= wanted - prices.keys()
+        self._prices = {**self._prices, **prices}
+        self._fetched_symbols = wanted
+        self._updated_at = time.monotonic()
+        self.version += 1
+        self._fan_out(prices)
+
+    def push(self, prices: Dict[str, float]):
+        """أسعار قادمة من الـ stream: تحدّث الكاش بدون أي طلب REST"""
+        now = time.monotonic()
+        self._prices = {**self._prices, **prices}
+        for symbol in prices:
+            self._pushed_at[symbol] = now
+        self.version += 1
+        self._fan_out(prices)
+
+    def _fan_out(self, prices: Dict[str, float]):
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        for symbols, callback in subscribers:
+            if callback is None:
+                continue
+            try:
+                callback({s: prices[s] for s in symbols if s in prices})
+            except Exception as e:
+                print("market hub callback error:", e)
+
+
+# ==================== EXCHANGE INFO ====================
+_exchange_info: Dict[bool, ExchangeInfoCache] = {}
+_exchange_info_lock = threading.Lock()
+
+
+def exchange_info_for(testnet: bool) -> ExchangeInfoCache:
+    """فلاتر الرموز مشتركة لكل المستخدمين على نفس الشبكة (exchangeInfo لا يحتاج مفاتيح)"""
+    with _exchange_info_lock:
+        cache = _exchange_info.get(testnet)
+        if cache is None:
+            cache = _exchange_info[testnet] = ExchangeInfoCache(
+                lambda symbols: binance_pool.get(None, "", "", testnet).get_exchange_info(symbols)
+            )
+        return cache
+
+
+# ==================== PAPER TRADING ====================
+# تأخير الإرسال→التنفيذ المحاكى (PAPER_LATENCY_MS=0 لاختبار الضغط بأقصى معدل أوامر)
+PAPER_LATENCY_MS = float(os.environ.get("PAPER_LATENCY_MS", "30"))
+PAPER_LATENCY_JITTER_MS = float(os.environ.get("PAPER_LATENCY_JITTER_MS", "10"))
+PAPER_START_USDT = float(os.environ.get("PAPER_START_USDT", "10000"))
+PAPER_VOLUME_INTERVAL = "1h"  # عمق الدفتر الورقي من متوسط حجم هذه الشموع
+PAPER_VOLUME_CANDLES = 24
+PAPER_SAVE_INTERVAL = 2.0  # أقصى معدل لحفظ الأرصدة الافتراضية في سجل المستخدم (ثانية)
+PAPER_MARK_INTERVAL = float(os.environ.get("PAPER_MARK_INTERVAL", "5"))  # أقصى عمر سعر لأمر LIMIT معلّق (ثانية)
+
+_paper_exchanges: Dict[bool, PaperExchange] = {}
+_paper_feeds: Dict[bool, "PaperMarketFeed"] = {}
+_paper_lock = threading.Lock()
+
+
+def _paper_volume_rate(symbol: str) -> Optional[float]:
+    """متوسط الحجم (وحدة الأصل / ثانية) من الشموع المخزنة أصلًا للبوتات، بدون طلب جديد"""
+    buf = kline_store.get(symbol, PAPER_VOLUME_INTERVAL)
+    with buf.lock:
+        tail = buf.tail(min(len(buf), PAPER_VOLUME_CANDLES))
+    if not len(tail):
+        return None
+    return float(tail[:, VOLUME].mean()) / (INTERVAL_MS[PAPER_VOLUME_INTERVAL] / 1000)
+
+
+def paper_exchange_for(testnet: bool) -> PaperExchange:
+    """محرك ورقي واحد لكل شبكة بيانات: السعر الحي من MarketDataHub (نفس طلب ticker المشترك)"""
+    with _paper_lock:
+        exchange = _paper_exchanges.get(testnet)
+        if exchange is None:
+            hub = MarketDataHub.for_network(testnet)
+
+            def price_source(symbol: str):
+                price = hub.get_price(symbol)
+                return (price, _paper_volume_rate(symbol)) if price else None
+
+            exchange = _paper_exchanges[testnet] = PaperExchange(
+                price_source,
+                latency=LatencyModel(PAPER_LATENCY_MS, PAPER_LATENCY_JITTER_MS),
+                start_balances={QUOTE_ASSET: PAPER_START_USDT},
+            )
+            _paper_feeds[testnet] = PaperMarketFeed(exchange, hub)
+        return exchange
+
+
+def paper_feed_for(testnet: bool) -> "PaperMarketFeed":
+    paper_exchange_for(testnet)
+    return _paper_feeds[testnet]
+
+
+class PaperMarketFeed:
+    """
+    ✅ أوامر LIMIT الورقية المعلّقة تتبع السوق الحي (وليس فقط عند وصول أمر جديد):
+    - اشتراك في MarketDataHub برموز الأوامر المعلّقة فقط: كل سعر يجلبه أي بوت أو يدفعه الـ stream يُطابَق فورًا
+    - thread دوري (PAPER_MARK_INTERVAL) يطلب أسعار هذه الرموز عندما لا يطلبها أحد؛
+      prices() لا يرسل طلبًا إذا كانت الأسعار حديثة (وصلت أصلًا عبر الاشتراك)
+    - بدون أوامر معلّقة: لا اشتراك ولا thread
+    """
+
+    def __init__(self, exchange: PaperExchange, hub: MarketDataHub, interval: float = PAPER_MARK_INTERVAL):
+        self.exchange = exchange
+        self.hub = hub
+        self.interval = interval
+        self.key = ("paper", hub.testnet)
+        self._lock = threading.Lock()
+        self._symbols: frozenset = frozenset()
+        self._thread: Optional[threading.Thread] = None
+
+    def sync(self) -> frozenset:
+        """يُستدعى بعد كل أمر أو إلغاء: الاشتراك = الرموز التي عليها أوامر معلّقة الآن"""
+        symbols = frozenset(self.exchange.resting_symbols())
+        with self._lock:
+            if symbols != self._symbols:
+                self._symbols = symbols
+                if symbols:
+                    self.hub.subscribe(self.key, list(symbols), self._on_prices)
+                else:
+                    self.hub.unsubscribe(self.key)
+            if symbols and self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"paper-feed-{self.hub.testnet}", daemon=True)
+                self._thread.start()
+        return symbols
+
+    def _on_prices(self, prices: Dict[str, float]):
+        for symbol, price in prices.items():
+            self.exchange.set_market(symbol, price, _paper_volume_rate(symbol))
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                symbols = self.sync()
+                if symbols:
+                    self.hub.prices(list(symbols))
+                    continue
+            except Exception as e:
+                ERRORS.labels("paper_feed").inc()
+                print("PAPER FEED ERROR:", e)
+                continue
+            with self._lock:
+                if not self._symbols:
+                    self._thread = None
+                    return
+
+
+class PaperBinanceManager(BinanceAPIManager):
+    """
+    ✅ وضع التداول الورقي (user["paper"]):
+    - بيانات السوق (شموع / أسعار / exchangeInfo) من الشبكة المختارة كالمعتاد وبدون مفاتيح
+    - الأوامر و /account من PaperExchange داخل العملية: لا طلبات موقّعة ولا حد ORDERS/10s
+    - الأرصدة الافتراضية تُحفظ في سجل المستخدم (paper_balances) وتُستعاد بعد إعادة التشغيل
+    - أوامر LIMIT المعلّقة تُطابَق مع كل سعر حي (PaperMarketFeed) وتُلغى بـ cancel_order
+    """
+
+    def __init__(self, user_id: str, testnet: bool = True):
+        super().__init__("", "", testnet)
+        self.user_id = user_id
+        self.fingerprint = paper_fingerprint(user_id, testnet)
+        self.exchange = paper_exchange_for(testnet)
+        self.feed = paper_feed_for(testnet)
+        user = db.get_user(user_id) or {}
+        self.exchange.open_account(user_id, user.get("paper_balances"))
+        self._saved_version = self.exchange.account_version(user_id)
+        self._saved_at = time.monotonic()
+
+    def save(self, force: bool = False):
+        """حفظ الأرصدة إذا تغيرت (محدود بـ PAPER_SAVE_INTERVAL إلا مع force)"""
+        version = self.exchange.account_version(self.user_id)
+        if version == self._saved_version:
+            return
+        now = time.monotonic()
+        if not force and now - self._saved_at < PAPER_SAVE_INTERVAL:
+            return
+        self._saved_version, self._saved_at = version, now
+        db.update_user(self.user_id, {"paper_balances": self.exchange.account_info(self.user_id)["balances"]})
+
+    def test_api_authentication(self) -> Dict:
+        info = self.get_account_info()
+        return {
+            "success": True,
+            "message": "✅ حساب ورقي (محاكاة محلية)",
+            "connection": True,
+            "authentication": True,
+            "trading_enabled": True,
+            "balance": Portfolio.from_balances(info["balances"]).free_of(QUOTE_ASSET),
+            "server_time": int(time.time() * 1000),
+        }
+
+    def create_listen_key(self) -> Optional[str]:
+        return None  # لا user stream: الحساب محلي و /account بدون تكلفة
+
+    def get_account_info(self) -> Optional[Dict]:
+        self.save()
+        return self.exchange.account_info(self.user_id)
+
+    def place_order(
+        self,
+        symbol: str,
+        side: str,
+        quantity=None,
+        order_type: str = "MARKET",
+        price=None,
+        ref_price=None,
+        prepared: Optional[PreparedOrder] = None,
+    ) -> Dict:
+        """نفس تجهيز وتحقق الأمر الحقيقي، ثم التنفيذ على المحرك المحلي بدل POST /order"""
+        try:
+            if prepared is None:
+                try:
+                    prepared = self.prepare_order(symbol, side, quantity, order_type, price, ref_price)
+                except OrderRejected as e:
+                    return {"error": f"Order rejected locally: {e}", "rejected_locally": True}
+            try:
+                res = self.exchange.place_order(
+                    self.user_id,
+                    prepared.symbol,
+                    prepared.side,
+                    float(prepared.quantity),
+                    prepared.order_type,
+                    float(prepared.price) if prepared.price is not None else None,
+                )
+            except PaperRejected as e:
+                PAPER_ORDERS.labels("REJECTED").inc()
+                return {"error": f"Paper error | code={e.code} | msg={e}"}
+            PAPER_ORDERS.labels(res["status"]).inc()
+            if res["status"] in ("NEW", "PARTIALLY_FILLED"):
+                self.feed.sync()
+            self.save()
+            return res
+        except Exception as e:
+            return {"error": f"place_order exception: {e}"}
+
+    def cancel_order(self, symbol: str, order_id: int) -> Dict:
+        """إلغاء أمر LIMIT معلّق (بدل DELETE /order): الرصيد المحجوز يعود free"""
+        try:
+            res = self.exchange.cancel_order(self.user_id, symbol.upper(), int(order_id))
+        except PaperRejected as e:
+            return {"error": f"Paper error | code={e.code} | msg={e}"}
+        except Exception as e:
+            return {"error": f"cancel_order exception: {e}"}
+        self.feed.sync()
+        self.save(force=True)
+        return res
+
+    def get_open_orders(self, symbol: Optional[str] = None) -> List[Dict]:
+        return self.exchange.open_orders(self.user_id, symbol.upper() if symbol else None)
+
+
+# ==================== BALANCE CACHE ====================
+BALANCE_CACHE_TTL = 30  # بعدها تُعتبر اللقطة قديمة ويُطلب تحديث في الخلفية (ثانية)
+
+
+class AccountSnapshotCache:
+    """
+    ✅ لقطة رصيد/حساب لكل مستخدم (stale-while-revalidate):
+    - الصفحات تُعرض فورًا من آخر لقطة مع عمرها
+    - عند انتهاء TTL يُطلب تحديث غير متزامن (طلب واحد فقط لكل مستخدم في نفس الوقت)
+    - البوت يملأ نفس الكاش من حلقته
+    - كل لقطة تحمل Portfolio لكل الأصول غير الصفرية؛ تحديثات الـ stream تعدّل الأصول المتغيرة فقط
+    """
+
+    def __init__(self, ttl: float = BALANCE_CACHE_TTL, workers: int = 4):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        self._inflight = set()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="balance-refresh")
+
+    @staticmethod
+    def _entry(account: Dict, portfolio: Portfolio, updated_at: float, fingerprint: Optional[str] = None) -> Dict:
+        return {
+            "balance": portfolio.free_of(QUOTE_ASSET),
+            "can_trade": bool(account.get("canTrade", False)),
+            "account": account,  # بدون balances: الأرصدة في portfolio فقط
+            "portfolio": portfolio,
+            "updated_at": updated_at,
+            "fingerprint": fingerprint,  # الحساب الذي جاءت منه اللقطة (manager.fingerprint)
+        }
+
+    def _store(self, user_id: str, entry: Dict) -> Dict:
+        with self._lock:
+            self._entries[user_id] = entry
+        db.update_user(user_id, {"balance": entry["balance"]})
+        # retain: تحديث /account بنفس الرصيد لا يصل للمتصفح
+        event_bus.publish(user_id, "balance", {"balance": entry["balance"], "can_trade": entry["can_trade"]}, retain=True)
+        return entry
+
+    def put(self, user_id: str, account_info: Dict, fingerprint: Optional[str] = None) -> Dict:
+        account = {k: v for k, v in account_info.items() if k != "balances"}
+        portfolio = Portfolio.from_balances(account_info.get("balances", []))
+        return self._store(user_id, self._entry(account, portfolio, time.time(), fingerprint))
+
+    def apply_balances(self, user_id: str, balances: List[Dict]) -> Optional[Dict]:
+        """
+        تحديث أرصدة جزئي (outboundAccountPosition من الـ user stream) في اللقطة الحالية.
+        balances: [{"a": asset, "f": free, "l": locked}, ...]
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        portfolio = entry["portfolio"].apply((b["a"], b["f"], b["l"]) for b in balances)
+        return self._store(user_id, self._entry(entry["account"], portfolio, time.time(), entry["fingerprint"]))
+
+    @profiler.wrap("portfolio.valuation")
+    def valuation(self, user_id: str, testnet: bool) -> Optional[Dict]:
+        """
+        قيمة كل الأصول بـ QUOTE_ASSET من أسعار MarketDataHub (طلب ticker واحد مشترك مع البوتات).
+        تُحسب مرة واحدة لكل (نسخة الأرصدة، نسخة الأسعار).
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        portfolio = entry["portfolio"]
+        hub = MarketDataHub.for_network(testnet)
+        symbols = portfolio.pricing_symbols()
+        # اشتراك: تحديث أسعار البوتات يجلب رموز المحفظة في نفس الطلب
+        hub.subscribe(("portfolio", user_id), symbols)
+        prices = hub.prices(symbols) if symbols else {}
+        return portfolio.valuation(prices, hub.version)
+
+    def get(self, user_id: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        age = time.time() - entry["updated_at"]
+        return {**entry, "age_s": round(age, 1), "stale": age > self.ttl}
+
+    def refresh_async(self, user_id: str, manager: BinanceAPIManager):
+        with self._lock:
+            if user_id in self._inflight:
+                return
+            self._inflight.add(user_id)
+        self._executor.submit(self._refresh, user_id, manager)
+
+    def _refresh(self, user_id: str, manager: BinanceAPIManager):
+        try:
+            info = manager.get_account_info()
+            if info:
+                self.put(user_id, info, manager.fingerprint)
+        except Exception as e:
+            print("balance refresh error:", e)
+        finally:
+            with self._lock:
+                self._inflight.discard(user_id)
+
+    def get_or_refresh(self, user_id: str, user: Dict) -> Optional[Dict]:
+        """يرجّع اللقطة الحالية (قد تكون None أو قديمة) ويطلب تحديثًا في الخلفية عند الحاجة"""
+        snap = self.get(user_id)
+        if snap is not None and snap["fingerprint"] not in (None, account_fingerprint(user_id, user)):
+            # setup (ربما في عامل آخر) غيّر المفاتيح أو الوضع: اللقطة تخص الحساب القديم
+            self.invalidate(user_id)
+            snap = None
+        CACHE_REQUESTS.labels("balance", "miss" if snap is None else "stale" if snap["stale"] else "hit").inc()
+        if snap is None or snap["stale"]:
+            manager = binance_pool.for_user(user_id, user)
+            # أثناء انقطاع Binance نعرض الكاش فقط بدون تكديس طلبات فاشلة
+            if manager.breaker.state != CircuitBreaker.OPEN:
+                self.refresh_async(user_id, manager)
+        return snap
+
+    def restore(self, user_id: str, saved: Dict, fingerprint: Optional[str] = None):
+        """لقطة من checkpoint بعمرها الأصلي: تُعرض فورًا وتُحدّث في الخلفية إذا كانت قديمة"""
+        account_info = saved.get("account") or {}
+        account = {k: v for k, v in account_info.items() if k != "balances"}
+        portfolio = Portfolio.from_balances(account_info.get("balances", []))
+        entry = self._entry(account, portfolio, saved.get("updated_at") or 0.0, fingerprint)
+        with self._lock:
+            self._entries.setdefault(user_id, entry)
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+        self.release(user_id)
+
+    def release(self, user_id: str):
+        """رموز المحفظة لا تُضاف لطلب أسعار البوتات بعد الآن (تُعاد مع أول valuation)"""
+        for testnet in (True, False):
+            MarketDataHub.for_network(testnet).unsubscribe(("portfolio", user_id))
+
+
+balance_cache = AccountSnapshotCache()
+
+# شموع مشتركة بين كل البوتات (ذاكرة ثابتة لكل symbol/interval)
+kline_store = KlineStore()
+
+
+# ==================== BOT SCHEDULER ====================
+BOT_TICK_INTERVAL = 60  # ثانية بين كل tick لنفس البوت
+BOT_TICK_JITTER = 5  # توزيع عشوائي لتجنب أن تضرب كل البوتات Binance في نفس اللحظة
+BOT_SCHEDULER_WORKERS = int(os.environ.get("BOT_SCHEDULER_WORKERS", "8"))
+
+
+class BotScheduler:
+    """
+    ✅ مجدول مشترك بدل thread لكل بوت:
+    - heap من المواعيد (deadline) + thread واحد للتوزيع + عدد ثابت من الـ workers
+    - المواعيد تعتمد على deadline السابق (لا تنجرف مع مدة الـ tick) + jitter
+    - stop فوري: البوت يُحذف من الجدول ولا ينتظر sleep
+    - قياس تأخر الـ tick (lag) عن موعده
+    """
+
+    def __init__(self, workers: int = BOT_SCHEDULER_WORKERS, interval: float = BOT_TICK_INTERVAL, jitter: float = BOT_TICK_JITTER):
+        self.interval = interval
+        self.jitter = jitter
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, int, int, "SimpleTradingBot"]] = []
+        self._bots: Dict[int, "SimpleTradingBot"] = {}
+        self._gen: Dict[int, int] = {}  # مدخلات heap بجيل قديم تُتجاهل (بعد wake)
+        self._running: set = set()
+        self._wake_pending: set = set()
+        self._seq = itertools.count()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bot-tick")
+        self._thread: Optional[threading.Thread] = None
+
+        self.ticks = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.avg_lag = 0.0  # EWMA
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._dispatch, name="bot-scheduler", daemon=True)
+            self._thread.start()
+
+    def add(self, bot: "SimpleTradingBot", delay: Optional[float] = None):
+        with self._cond:
+            self._bots[id(bot)] = bot
+            first = delay if delay is not None else random.uniform(0, self.jitter)
+            self._push(time.monotonic() + first, bot)
+            self._ensure_started()
+            self._cond.notify()
+
+    def remove(self, bot: "SimpleTradingBot"):
+        # الحذف كسول: مدخل الـ heap يُتجاهل عند خروجه
+        with self._cond:
+            self._bots.pop(id(bot), None)
+            self._gen.pop(id(bot), None)
+            self._wake_pending.discard(id(bot))
+
+    def wake(self, bot: "SimpleTradingBot"):
+        """تنفيذ tick الآن (مثلًا عند إغلاق شمعة من الـ stream) بدل انتظار الموعد"""
+        with self._cond:
+            if self._bots.get(id(bot)) is not bot:
+                return
+            if id(bot) in self._running:
+                self._wake_pending.add(id(bot))
+                return
+            self._push(time.monotonic(), bot)
+            self._cond.notify()
+
+    def _push(self, deadline: float, bot: "SimpleTradingBot"):
+        gen = self._gen.get(id(bot), 0) + 1
+        self._gen[id(bot)] = gen
+        heapq.heappush(self._heap, (deadline, next(self._seq), gen, bot))
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._cond.wait(timeout)
+                deadline, _, gen, bot = heapq.heappop(self._heap)
+                if self._bots.get(id(bot)) is not bot or self._gen.get(id(bot)) != gen:
+                    continue
+                self._running.add(id(bot))
+            self._executor.submit(self._run, bot, deadline)
+
+    def _run(self, bot: "SimpleTradingBot", deadline: float):
+        started = time.monotonic()
+        lag = started - deadline
+        BOT_TICK_LAG.observe(max(lag, 0.0))
+        try:
+            if self._bots.get(id(bot)) is bot:  # قد يكون أُوقف بعد دخوله طابور الـ workers
+                bot.tick()
+        except Exception as e:
+            ERRORS.labels("bot_loop").inc()
+            print("bot loop error:", e)
+        finally:
+            BOT_TICK_DURATION.observe(time.monotonic() - started)
+            with self._cond:
+                self._running.discard(id(bot))
+                self.ticks += 1
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+                self.avg_lag += (lag - self.avg_lag) * 0.05
+                if self._bots.get(id(bot)) is bot:
+                    if id(bot) in self._wake_pending:
+                        self._wake_pending.discard(id(bot))
+                        next_deadline = time.monotonic()
+                    else:
+                        next_deadline = deadline + self.interval + random.uniform(-self.jitter, self.jitter) / 2
+                    # إذا تأخرنا أكثر من دورة كاملة لا نحاول اللحاق بكل الدورات الفائتة
+                    self._push(max(next_deadline, time.monotonic()), bot)
+                    self._cond.notify()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "bots": len(self._bots),
+                "queued": len(self._heap),
+                "ticks": self.ticks,
+                "last_lag_s": round(self.last_lag, 3),
+                "avg_lag_s": round(self.avg_lag, 3),
+                "max_lag_s": round(self.max_lag, 3),
+            }
+
+
+bot_scheduler = BotScheduler()
+
+
+# ==================== STREAMING ====================
+BINANCE_STREAMING = os.environ.get("BINANCE_STREAMING", "0") == "1"
+BINANCE_TESTNET_WS = os.environ.get("BINANCE_TESTNET_WS", "wss://stream.testnet.binance.vision")
+BINANCE_MAINNET_WS = os.environ.get("BINANCE_MAINNET_WS", "wss://stream.binance.com:9443")
+LISTEN_KEY_KEEPALIVE = 30 * 60  # Binance يُنهي الـ listenKey بعد 60 دقيقة بدون keepalive
+
+
+class MarketStream:
+    """
+    ✅ stream سوق واحد (combined) لكل شبكة يغطي كل البوتات:
+    - <symbol>@kline_<interval>: الشمعة المغلقة تُضاف للـ KlineStore وتوقظ البوتات المعنية
+    - <symbol>@bookTicker: متوسط bid/ask يُدفع لـ MarketDataHub
+    - SUBSCRIBE / UNSUBSCRIBE على نفس الاتصال عند تشغيل/إيقاف البوتات
+    - بعد أي انقطاع: سد الفجوة من REST
+    """
+
+    _instances: Dict[bool, "MarketStream"] = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def for_network(cls, testnet: bool) -> "MarketStream":
+        with cls._instances_lock:
+            ms = cls._instances.get(bool(testnet))
+            if ms is None:
+                ms = cls._instances[bool(testnet)] = cls(testnet)
+            return ms
+
+    def __init__(self, testnet: bool):
+        self.testnet = testnet
+        self.ws_base = BINANCE_TESTNET_WS if testnet else BINANCE_MAINNET_WS
+        self._lock = threading.Lock()
+        self._subs: Dict[int, Tuple["SimpleTradingBot", frozenset]] = {}
+        self._active: set = set()
+        self._req_id = itertools.count(1)
+        self.client = StreamClient(
+            self._url,
+            self._on_message,
+            on_reconnect=self._resync,
+            on_connect=self._sync_subscriptions,
+            name=f"market-{'testnet' if testnet else 'mainnet'}",
+        )
+
+    @staticmethod
+    def streams_for(bot: "SimpleTradingBot") -> frozenset:
+        names = set()
+        for s in bot.symbols:
+            names.add(f"{s.lower()}@kline_{bot.timeframe}")
+            names.add(f"{s.lower()}@bookTicker")
+        return frozenset(names)
+
+    def _wanted(self) -> set:
+        wanted = set()
+        for _, streams in self._subs.values():
+            wanted |= streams
+        return wanted
+
+    def _url(self) -> Optional[str]:
+        with self._lock:
+            self._active = self._wanted()
+            if not self._active:
+                return None
+            return f"{self.ws_base}/stream?streams=" + "/".join(sorted(self._active))
+
+    def _sync_subscriptions(self):
+        with self._lock:
+            wanted = self._wanted()
+            new, stale = wanted - self._active, self._active - wanted
+        if new and self.client.send_json({"method": "SUBSCRIBE", "params": sorted(new), "id": next(self._req_id)}):
+            with self._lock:
+                self._active |= new
+        if stale and self.client.send_json({"method": "UNSUBSCRIBE", "params": sorted(stale), "id": next(self._req_id)}):
+            with self._lock:
+                self._active -= stale
+
+    def add(self, bot: "SimpleTradingBot"):
+        with self._lock:
+            self._subs[id(bot)] = (bot, self.streams_for(bot))
+        self.client.start()
+        if self.client.connected.is_set():
+            self._sync_subscriptions()
+
+    def remove(self, bot: "SimpleTradingBot"):
+        with self._lock:
+            self._subs.pop(id(bot), None)
+            empty = not self._subs
+        if empty:
+            self.client.reconnect()  # url_factory ترجع None فيبقى خاملًا بدون اتصال
+        elif self.client.connected.is_set():
+            self._sync_subscriptions()
+
+    def _public_manager(self) -> BinanceAPIManager:
+        return binance_pool.get(None, "", "", self.testnet)
+
+    def _on_message(self, msg: Dict):
+        data = msg.get("data", msg)
+        if data.get("e") == "kline":
+            k = data["k"]
+            if k.get("x"):
+                self._on_closed_kline(data["s"], k)
+        elif "b" in data and "a" in data and "s" in data:
+            MarketDataHub.for_network(self.testnet).push({data["s"]: (float(data["b"]) + float(data["a"])) / 2})
+
+    def _on_closed_kline(self, symbol: str, k: Dict):
+        interval = k["i"]
+        ok = kline_store.apply_closed(symbol, interval, int(k["t"]), float(k["o"]), float(k["h"]), float(k["l"]), float(k["c"]), float(k["v"]))
+        if not ok:
+            manager = self._public_manager()
+            kline_store.update(symbol, interval, manager, now_ms=manager.clock.now_ms)
+
+        stream = f"{symbol.lower()}@kline_{interval}"
+        with self._lock:
+            bots = [bot for bot, streams in self._subs.values() if stream in streams]
+        for bot in bots:
+            bot_scheduler.wake(bot)
+
+    def _resync(self):
+        with self._lock:
+            pairs = {(s, bot.timeframe) for bot, _ in self._subs.values() for s in bot.symbols}
+        manager = self._public_manager()
+        for symbol, interval in pairs:
+            kline_store.update(symbol, interval, manager, now_ms=manager.clock.now_ms)
+        MarketDataHub.for_network(self.testnet).refresh()
+
+
+class UserStream:
+    """
+    ✅ user data stream لكل بوت:
+    - listenKey جديد مع كل اتصال + keepalive كل 30 دقيقة
+    - outboundAccountPosition يحدّث كاش الرصيد ورصيد البوت مباشرة
+    - بعد أي انقطاع: إعادة جلب /account في الخلفية
+    """
+
+    def __init__(self, bot: "SimpleTradingBot"):
+        self.bot = bot
+        self.ws_base = BINANCE_TESTNET_WS if bot.testnet else BINANCE_MAINNET_WS
+        self.listen_key: Optional[str] = None
+        self.client = StreamClient(
+            self._url,
+            self._on_message,
+            on_reconnect=self._resync,
+            heartbeat=(LISTEN_KEY_KEEPALIVE, self._keepalive),
+            name=f"user-{bot.user_id}",
+        )
+
+    @property
+    def live(self) -> bool:
+        return self.client.connected.is_set()
+
+    def start(self):
+        self.client.start()
+
+    def stop(self):
+        self.client.stop()
+        if self.listen_key:
+            self.bot.binance.close_listen_key(self.listen_key)
+            self.listen_key = None
+
+    def _url(self) -> Optional[str]:
+        self.listen_key = self.bot.binance.create_listen_key()
+        return f"{self.ws_base}/ws/{self.listen_key}" if self.listen_key else None
+
+    def _keepalive(self):
+        if self.listen_key and not self.bot.binance.keepalive_listen_key(self.listen_key):
+            self.client.reconnect()
+
+    def _on_message(self, msg: Dict):
+        event = msg.get("e")
+        if event == "outboundAccountPosition":
+            snap = balance_cache.apply_balances(self.bot.user_id, msg.get("B", []))
+            if snap is not None:
+                self.bot.balance = snap["balance"]
+            else:
+                balance_cache.refresh_async(self.bot.user_id, self.bot.binance)
+        elif event == "listenKeyExpired":
+            self.client.reconnect()
+
+    def _resync(self):
+        balance_cache.refresh_async(self.bot.user_id, self.bot.binance)
+
+
 # ==================== TRADING BOT ====================
+BOT_CHECKPOINT_INTERVAL = 5 * 60  # حفظ دوري للقطة الحساب؛ الصفقات والشموع الجديدة تُحفظ فورًا
+
+
 class SimpleTradingBot:
-    def __init__(self, user_id: str, api_key: str, api_secret: str, testnet: bool = True):
+    def __init__(self, user_id: str, api_key: str, api_secret: str, testnet: bool = True, paper: bool = False):
         self.user_id = user_id
-        self.binance = BinanceAPIManager(api_key, api_secret, testnet)
+        self.testnet = testnet
+        self.paper = paper
+        self.binance = binance_pool.get(user_id, api_key, api_secret, testnet, paper=paper)
+        self.market = MarketDataHub.for_network(testnet)
+        self.user_stream: Optional[UserStream] = None
         self.running = False
-        self.thread = None
 
         self.symbols = ["BTCUSDT", "ETHUSDT", "BNBUSDT"]
         self.timeframe = "1h"
@@ -323,14 +2491,27 @@ class SimpleTradingBot:
         self.max_positions = 1
 
         self.active_positions = []
-        self.trade_history = []
-        self.balance = 0.0
+        # آخر الصفقات فقط (للفحص السريع)؛ التاريخ الكامل والإحصاءات في SQLite والأرشيف
+        self.trade_history: "deque[Dict]" = deque(maxlen=TRADES_CACHE_LIMIT)
+        self.balance = 0.0  # USDT الحر (ما يمكن إنفاقه)
+        self.equity = 0.0  # قيمة كل الأصول بـ USDT (أساس risk_per_trade)
+        self.started_at: Optional[str] = None
+        self.last_candle: Dict[str, int] = {}  # آخر شمعة (open_time) قُيّمت إشارتها لكل رمز
+
+        self._checkpoint_lock = threading.Lock()
+        self._checkpoint_at = 0.0
+        self._checkpoint_dirty = False
+
+        self.indicators = IndicatorEngine(self.symbols)
+        self._seen_versions = [0] * len(self.symbols)
+        self.last_signals: Dict[str, Dict] = {}
+        self.last_prices: Dict[str, float] = {}
 
     def start(self):
         if self.running:
             return {"status": "error", "message": "البوت يعمل بالفعل"}
 
-        api_test = self.binance.test_api_authentication()
+        api_test = credential_checks.verify(self.binance)
         if not api_test["success"]:
             return {"status": "error", "message": api_test["message"]}
 
@@ -341,25 +2522,555 @@ class SimpleTradingBot:
         if self.balance < 10:
             return {"status": "error", "message": f"الرصيد غير كافٍ ({self.balance} USDT). يجب ≥ 10"}
 
-        self.running = True
-        self.thread = threading.Thread(target=self._loop, daemon=True)
-        self.thread.start()
+        self.started_at = datetime.now().isoformat()
+        # فلاتر الرموز جاهزة قبل أول أمر (طلب exchangeInfo واحد لكل الرموز)
+        exchange_info_for(self.testnet).warm(self.symbols)
+        self._run()
         return {"status": "success", "message": "✅ بدأ البوت", "balance": self.balance}
 
+    def resume(self):
+        """
+        استئناف من checkpoint بعد إعادة تشغيل العملية: بدون test_api_authentication،
+        وأول tick فورًا (الاتصالات والساعة والشموع سُخّنت مسبقًا في warm_up_bots)
+        """
+        if self.running:
+            return
+        self._run(delay=0)
+
+    def _run(self, delay: Optional[float] = None):
+        self.running = True
+        self.market.subscribe(id(self), self.symbols)
+        if BINANCE_STREAMING:
+            MarketStream.for_network(self.testnet).add(self)
+            if not self.paper:
+                self.user_stream = UserStream(self)
+                self.user_stream.start()
+        self.save_checkpoint()
+        bot_scheduler.add(self, delay=delay)
+
     def stop(self):
-        self.running = False
+        with self._checkpoint_lock:
+            self.running = False
+        bot_scheduler.remove(self)
+        self.market.unsubscribe(id(self))
+        balance_cache.release(self.user_id)
+        if BINANCE_STREAMING:
+            MarketStream.for_network(self.testnet).remove(self)
+        if self.user_stream is not None:
+            self.user_stream.stop()
+            self.user_stream = None
+        if self.paper:
+            self.binance.save(force=True)
         return {"status": "success", "message": "⏹️ توقف البوت"}
 
     def get_status(self):
-        return {"running": self.running, "balance": self.balance, "active_positions": len(self.active_positions)}
+        return {
+            "running": self.running,
+            "balance": self.balance,
+            "equity": self.equity,
+            "active_positions": len(self.active_positions),
+            "signals": self.last_signals,
+        }
+
+    # ---------- checkpoint ----------
+    def checkpoint(self) -> Dict:
+        """كل ما يلزم لاستئناف البوت في عملية جديدة (JSON)"""
+        snap = balance_cache.get(self.user_id)
+        account = None
+        if snap is not None:
+            account = {
+                "balance": snap["balance"],
+                "can_trade": snap["can_trade"],
+                # الأصول غير الصفرية فقط (Portfolio)
+                "account": {**snap["account"], "balances": snap["portfolio"].balances()},
+                "updated_at": snap["updated_at"],
+            }
+        return {
+            "testnet": self.testnet,
+            "paper": self.paper,
+            "started_at": self.started_at,
+            "settings": {
+                "symbols": self.symbols,
+                "timeframe": self.timeframe,
+                "risk_per_trade": self.risk_per_trade,
+                "min_confidence": self.min_confidence,
+                "max_positions": self.max_positions,
+            },
+            "positions": self.active_positions,
+            "last_candle": self.last_candle,
+            "balance": self.balance,
+            "account": account,
+        }
+
+    def restore(self, checkpoint: Dict):
+        settings = checkpoint.get("settings") or {}
+        self.symbols = list(settings.get("symbols", self.symbols))
+        self.timeframe = settings.get("timeframe", self.timeframe)
+        self.risk_per_trade = settings.get("risk_per_trade", self.risk_per_trade)
+        self.min_confidence = settings.get("min_confidence", self.min_confidence)
+        self.max_positions = settings.get("max_positions", self.max_positions)
+        self.indicators = IndicatorEngine(self.symbols)
+        self._seen_versions = [0] * len(self.symbols)
+
+        self.active_positions = list(checkpoint.get("positions") or [])
+        self.last_candle = {s: int(t) for s, t in (checkpoint.get("last_candle") or {}).items()}
+        self.balance = float(checkpoint.get("balance") or 0.0)
+        self.started_at = checkpoint.get("started_at") or datetime.now().isoformat()
+        if checkpoint.get("account"):
+            balance_cache.restore(self.user_id, checkpoint["account"], self.binance.fingerprint)
+
+    @profiler.wrap("bot.checkpoint")
+    def save_checkpoint(self):
+        with self._checkpoint_lock:
+            # بعد stop لا نكتب: وإلا يعود checkpoint حذفه المستخدم
+            if not self.running:
+                return
+            db.put_checkpoint(self.user_id, self.checkpoint())
+            self._checkpoint_at = time.monotonic()
+            self._checkpoint_dirty = False
+
+    def _maybe_checkpoint(self):
+        if self._checkpoint_dirty or time.monotonic() - self._checkpoint_at >= BOT_CHECKPOINT_INTERVAL:
+            self.save_checkpoint()
+
+    @profiler.wrap("bot.tick", detail=lambda self: self.user_id)
+    def tick(self):
+        """دورة واحدة للبوت (يستدعيها BotScheduler كل BOT_TICK_INTERVAL)"""
+        if not self.running:
+            return
+        snap = balance_cache.get(self.user_id)
+        if snap is not None and self.user_stream is not None and self.user_stream.live:
+            # الـ user stream يبقي الكاش محدّثًا: لا حاجة لـ /account
+            self.balance = snap["balance"]
+        else:
+            info = self.binance.get_account_info()
+            if info:
+                self.balance = balance_cache.put(self.user_id, info, self.binance.fingerprint)["balance"]
+        self.last_prices = self.market.prices(self.symbols)
+        valuation = balance_cache.valuation(self.user_id, self.testnet)
+        self.equity = valuation["total_value"] if valuation else self.balance
+        for symbol in self.symbols:
+            with profiler.span("klines.update", symbol):
+                kline_store.update(symbol, self.timeframe, self.binance, now_ms=self.binance.clock.now_ms)
+        if self.running and self._feed_indicators():
+            self._evaluate_signals()
+        self._maybe_checkpoint()
+        bot_control.publish(self)
+
+    # ---------- strategy ----------
+    @profiler.wrap("bot.indicators")
+    def _feed_indicators(self) -> bool:
+        """
+        تغذية محرك المؤشرات بالشموع الجديدة فقط (لكل الرموز دفعة واحدة).
+        يرجّع True إذا وصلت شمعة جديدة واحدة على الأقل.
+        """
+        tails, counts, reset = [], [], []
+        for i, symbol in enumerate(self.symbols):
+            buf = kline_store.get(symbol, self.timeframe)
+            with buf.lock:
+                new = buf.version - self._seen_versions[i]
+                n = min(new, len(buf))
+                tails.append(buf.tail(n))
+                self._seen_versions[i] = buf.version
+            counts.append(n)
+            # أول مرة أو الـ buffer أُعيدت تعبئته: نبدأ المؤشرات من الصفر لهذا الرمز
+            reset.append(n > 0 and new >= len(buf))
+
+        counts = np.array(counts)
+        steps = int(counts.max()) if len(counts) else 0
+        if steps == 0:
+            return False
+        self.indicators.reset(np.array(reset))
+
+        # مصفوفة (رموز × خطوات × OHLCV) مبطّنة من اليسار، ثم تحديث متجه لكل خطوة
+        padded = np.zeros((len(self.symbols), steps, 5))
+        for i, tail in enumerate(tails):
+            if len(tail):
+                padded[i, steps - len(tail):] = tail
+        for j in range(steps):
+            mask = j >= steps - counts
+            self.indicators.update(padded[:, j, HIGH], padded[:, j, LOW], padded[:, j, CLOSE], mask)
+        return True
+
+    @profiler.wrap("bot.signals")
+    def _evaluate_signals(self):
+        confidence, direction = self.indicators.signals()
+        values = self.indicators.values()
+        self.last_signals = {
+            s: {"confidence": round(float(confidence[i]), 1), "direction": int(direction[i])}
+            for i, s in enumerate(self.symbols)
+        }
+        for i, symbol in enumerate(self.symbols):
+            # كل شمعة تُقيَّم مرة واحدة فقط (ولا تُعاد بعد استئناف من checkpoint)
+            last = kline_store.get(symbol, self.timeframe).last_open_time
+            if last is None or last <= self.last_candle.get(symbol, -1):
+                continue
+            self.last_candle[symbol] = last
+            self._checkpoint_dirty = True
+            if confidence[i] < self.min_confidence:
+                continue
+            price = self.last_prices.get(symbol) or float(values["close"][i])
+            self._act(symbol, int(direction[i]), float(confidence[i]), price, float(values["atr"][i]))
+
+    def _act(self, symbol: str, direction: int, confidence: float, price: float, atr: float):
+        position = next((p for p in self.active_positions if p["symbol"] == symbol), None)
+        if direction > 0 and position is None and len(self.active_positions) < self.max_positions:
+            # المخاطرة من قيمة المحفظة كاملة، والشراء محدود بالـ USDT الحر
+            qty = entry_size(self.equity, self.balance, self.risk_per_trade, price, atr)
+            if qty > 0:
+                self._execute(symbol, "BUY", qty, price, confidence)
+        elif direction < 0 and position is not None:
+            self._execute(symbol, "SELL", position["quantity"], price, confidence, position)
+
+    def _execute(self, symbol: str, side: str, qty: float, price: float, confidence: float, position: Optional[Dict] = None):
+        try:
+            order = self.binance.prepare_order(symbol, side, qty, ref_price=price)
+        except OrderRejected as e:
+            print(f"bot order skipped ({symbol} {side}):", e)
+            return
+        res = self.binance.place_order(symbol, side, prepared=order)
+        if "error" in res:
+            print("bot order error:", res["error"])
+            return
+
+        executed = float(res.get("executedQty", 0) or 0)
+        if not executed:
+            if res.get("status") in ("EXPIRED", "REJECTED"):
+                # لا سيولة (التداول الورقي أو سوق حقيقي فارغ): لا صفقة
+                print(f"bot order not filled ({symbol} {side}):", res.get("status"))
+                return
+            executed = float(order.quantity)
+        quote = float(res.get("cummulativeQuoteQty", 0) or 0)
+        fill_price = quote / executed if quote and executed else price
+        # الرسوم بعملة الاستلام تُخصم من الكمية المملوكة (وإلا يفشل البيع لاحقًا بـ -2010)
+        base = symbol[: -len(QUOTE_ASSET)] if symbol.endswith(QUOTE_ASSET) else None
+        commission = sum(float(f.get("commission", 0) or 0) for f in res.get("fills", ()) if f.get("commissionAsset") == base)
+
+        trade = {
+            "symbol": symbol,
+            "side": side,
+            "quantity": executed,
+            "price": fill_price,
+            "status": res.get("status", "FILLED"),
+            "confidence": round(confidence, 1),
+            "order_id": res.get("orderId"),
+        }
+        if side == "BUY":
+            held = executed - commission
+            self.active_positions.append({"symbol": symbol, "quantity": held, "entry_price": fill_price, "opened_at": datetime.now().isoformat()})
+        else:
+            trade["pnl"] = (fill_price - position["entry_price"]) * executed
+            # تنفيذ جزئي: الباقي يبقى مركزًا مفتوحًا
+            remaining = position["quantity"] - executed
+            if remaining > 1e-12:
+                position["quantity"] = remaining
+            else:
+                self.active_positions.remove(position)
+
+        self.trade_history.append(trade)
+        db.add_trade(self.user_id, trade)
+        self.save_checkpoint()
+
+
+# ==================== BOT CONTROL ====================
+BOT_RUNNER_TIMEOUT = 30  # start يشمل اختبار المفاتيح مع Binance
+BOT_STATE_STALE_AFTER = 3 * BOT_TICK_INTERVAL  # لا تحديث من الـ runner = ربما توقف
+BOT_STATE_HEARTBEAT = BOT_TICK_INTERVAL  # حالة بلا تغيير: تحديث updated_at فقط بهذا المعدل
+BOT_RESUME = os.environ.get("BOT_RESUME", "1") == "1"  # استئناف البوتات من checkpoint عند تشغيل العملية
+BOT_WARMUP_WORKERS = 16
+BOT_WARMUP_TIMEOUT = 20  # لا ننتظر أكثر من هذا قبل أول tick (ثانية)
+
+
+# البوتات العاملة في هذه العملية فقط (فارغة في عمّال الويب بوضع remote)
+active_bots = {}
+
+
+class BotRunnerUnavailable(Exception):
+    pass
+
+
+def warm_up_bots(bots: List["SimpleTradingBot"]):
+    """
+    ✅ تسخين بالتوازي قبل أول tick للبوتات المستأنفة:
+    - الساعة لكل شبكة أولًا (الطلبات الموقّعة تحتاج offset)
+    - ثم معًا: exchangeInfo لكل شبكة + الشموع لكل (symbol, interval) + الأسعار
+      + /account لكل bot (يفتح اتصال TLS للـ manager ويحدّث لقطة الرصيد)
+    - الفشل لا يمنع الاستئناف: tick يعيد المحاولة كالمعتاد
+    """
+    t0 = time.monotonic()
+    networks: Dict[bool, "SimpleTradingBot"] = {}
+    symbols: Dict[bool, set] = {}
+    pairs: Dict[Tuple[str, str], "SimpleTradingBot"] = {}
+    for bot in bots:
+        networks.setdefault(bot.testnet, bot)
+        symbols.setdefault(bot.testnet, set()).update(bot.symbols)
+        for symbol in bot.symbols:
+            pairs.setdefault((symbol, bot.timeframe), bot)
+
+    def fetch_account(bot: "SimpleTradingBot"):
+        info = bot.binance.get_account_info()
+        if info:
+            bot.balance = balance_cache.put(bot.user_id, info, bot.binance.fingerprint)["balance"]
+
+    with ThreadPoolExecutor(max_workers=BOT_WARMUP_WORKERS, thread_name_prefix="bot-warmup") as pool:
+        clocks = [pool.submit(bot.binance.clock.sync) for bot in networks.values()]
+        wait(clocks, timeout=BOT_WARMUP_TIMEOUT)
+
+        futures = [pool.submit(exchange_info_for(testnet).warm, sorted(names)) for testnet, names in symbols.items()]
+        futures += [pool.submit(MarketDataHub.for_network(testnet).prices, sorted(names)) for testnet, names in symbols.items()]
+        futures += [
+            pool.submit(kline_store.update, symbol, interval, bot.binance, bot.binance.clock.now_ms)
+            for (symbol, interval), bot in pairs.items()
+        ]
+        futures += [pool.submit(fetch_account, bot) for bot in bots]
+        done, not_done = wait(futures, timeout=max(BOT_WARMUP_TIMEOUT - (time.monotonic() - t0), 0))
+        for f in done:
+            if f.exception() is not None:
+                ERRORS.labels("bot_warmup").inc()
+                print("BOT WARMUP ERROR:", f.exception())
+        for f in not_done:
+            f.cancel()
+    return time.monotonic() - t0
+
+
+class LocalBotControl:
+    """
+    ✅ البوتات تعمل داخل هذه العملية (run.py أو bot_runner.py):
+    - active_bots هو المصدر الوحيد لحالة التشغيل
+    - في الوضع المشترك تُنشر الحالة لجدول bot_state ليقرأها عمّال الويب
+    - start يحجز المستخدم قبل bot.start() البطيء: أمران متزامنان (عمّال أو threads الـ runner) لا ينشئان بوتين
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._starting = set()
+
+    def start(self, user_id: str) -> Dict:
+        user = db.get_user(user_id)
+        if not user:
+            return {"status": "error", "message": "المستخدم غير موجود"}
+
+        with self._lock:
+            if user_id in self._starting or (user_id in active_bots and active_bots[user_id]["bot"].running):
+                return {"status": "error", "message": "البوت يعمل بالفعل"}
+            self._starting.add(user_id)
+        try:
+            if not binance_available(user["is_testnet"]):
+                retry_in = CircuitBreaker.for_host(_spot_url(user["is_testnet"])).retry_in
+                return {"status": "error", "message": f"⚠️ Binance غير متاح حاليًا، حاول بعد {retry_in:.0f} ثانية"}
+
+            bot = SimpleTradingBot(user_id, user["api_key"], user["api_secret"], user["is_testnet"], paper=bool(user.get("paper")))
+            res = bot.start()
+            if res["status"] == "success":
+                active_bots[user_id] = {"bot": bot, "started_at": bot.started_at}
+                self.publish(bot, flush=True)
+            return res
+        finally:
+            with self._lock:
+                self._starting.discard(user_id)
+
+    def stop(self, user_id: str) -> Dict:
+        entry = active_bots.pop(user_id, None)
+        if entry is None:
+            return {"status": "error", "message": "لا يوجد بوت نشط"}
+        res = entry["bot"].stop()
+        # إيقاف من المستخدم: لا استئناف عند إعادة التشغيل
+        db.delete_checkpoint(user_id)
+        self.publish(entry["bot"], flush=True)
+        return res
+
+    def resume_all(self) -> int:
+        """تشغيل كل البوتات المحفوظة في bot_checkpoints (مرة واحدة عند بدء العملية)"""
+        if not BOT_RESUME:
+            return 0
+        bots, reserved = [], []
+        try:
+            for user_id, checkpoint in db.get_checkpoints().items():
+                with self._lock:
+                    if user_id in active_bots or user_id in self._starting:
+                        continue
+                    self._starting.add(user_id)
+                reserved.append(user_id)
+                user = db.get_user(user_id)
+                # المستخدم حُذف أو غيّر الشبكة / وضع التنفيذ: المراكز المحفوظة لم تعد تخصه
+                if (
+                    not user
+                    or bool(user.get("is_testnet")) != bool(checkpoint.get("testnet"))
+                    or bool(user.get("paper")) != bool(checkpoint.get("paper"))
+                ):
+                    db.delete_checkpoint(user_id)
+                    continue
+                try:
+                    bot = SimpleTradingBot(
+                        user_id, user["api_key"], user["api_secret"], user["is_testnet"], paper=bool(user.get("paper"))
+                    )
+                    bot.restore(checkpoint)
+                except Exception as e:
+                    ERRORS.labels("bot_resume").inc()
+                    print("BOT RESUME ERROR:", user_id, e)
+                    continue
+                bots.append(bot)
+            if not bots:
+                return 0
+
+            elapsed = warm_up_bots(bots)
+            for bot in bots:
+                bot.resume()
+                active_bots[bot.user_id] = {"bot": bot, "started_at": bot.started_at}
+                self.publish(bot)
+            db.flush()
+            print(f"♻️ استئناف {len(bots)} بوت (تسخين {elapsed:.1f} ثانية)")
+            return len(bots)
+        finally:
+            with self._lock:
+                self._starting.difference_update(reserved)
+
+    def shutdown(self):
+        """إيقاف العملية وليس المستخدم: checkpoint أخير ثم إيقاف البوتات لتُستأنف في التشغيل التالي"""
+        for user_id in list(active_bots):
+            entry = active_bots.pop(user_id, None)
+            if entry is None:
+                continue
+            bot = entry["bot"]
+            try:
+                bot.save_checkpoint()
+                bot.stop()
+                self.publish(bot)
+            except Exception as e:
+                print("BOT SHUTDOWN ERROR:", e)
+        db.flush()
+
+    def status(self, user_id: str) -> Optional[Dict]:
+        entry = active_bots.get(user_id)
+        if entry is None:
+            return None
+        return {**entry["bot"].get_status(), "started_at": entry["started_at"]}
+
+    def count(self) -> int:
+        return len(active_bots)
+
+    def publish(self, bot: "SimpleTradingBot", flush: bool = False):
+        if not DB_SHARED and not event_bus.has(bot.user_id):
+            return
+        entry = active_bots.get(bot.user_id)
+        state = {**bot.get_status(), "started_at": entry["started_at"] if entry else None}
+        event_bus.publish(bot.user_id, "status", state, retain=True)
+        if not DB_SHARED:
+            return
+        db.put_bot_state(bot.user_id, state)
+        if flush:
+            db.flush()
+
+
+class RemoteBotControl:
+    """
+    ✅ عامل ويب (gunicorn) بدون بوتات:
+    - start / stop عبر IPC إلى bot_runner.py (سطر JSON لكل أمر)
+    - الحالة من جدول bot_state المشترك بدون IPC
+    """
+
+    def __init__(self, address: str = BOT_RUNNER_ADDRESS, timeout: float = BOT_RUNNER_TIMEOUT):
+        self.address = address
+        self.timeout = timeout
+
+    def _connect(self):
+        if ":" in self.address and not self.address.startswith("/"):
+            host, port = self.address.rsplit(":", 1)
+            return socket.create_connection((host, int(port)), timeout=self.timeout)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.address)
+        return sock
+
+    def call(self, cmd: str, **params) -> Dict:
+        try:
+            with self._connect() as sock:
+                sock.sendall(json.dumps({"cmd": cmd, "token": SESSION_SECRET, **params}).encode() + b"\n")
+                with sock.makefile("rb") as f:
+                    line = f.readline()
+        except OSError as e:
+            raise BotRunnerUnavailable(str(e)) from e
+        if not line:
+            raise BotRunnerUnavailable("empty reply")
+        return json.loads(line)
+
+    def _command(self, cmd: str, user_id: str) -> Dict:
+        try:
+            return self.call(cmd, user_id=user_id)
+        except BotRunnerUnavailable as e:
+            print("BOT RUNNER ERROR:", e)
+            return {"status": "error", "message": "⚠️ خدمة تشغيل البوتات غير متاحة حاليًا"}
+
+    def start(self, user_id: str) -> Dict:
+        db.flush()  # الـ runner يقرأ المستخدم من SQLite
+        return self._command("start", user_id)
+
+    def stop(self, user_id: str) -> Dict:
+        return self._command("stop", user_id)
+
+    def status(self, user_id: str) -> Optional[Dict]:
+        state = db.get_bot_state(user_id)
+        if state is None or not state.get("running"):
+            return None
+        state["stale"] = time.time() - state["updated_at"] > BOT_STATE_STALE_AFTER
+        return state
+
+    def count(self) -> int:
+        return db.count_running_bots()
+
+    def publish(self, bot: "SimpleTradingBot", flush: bool = False):
+        pass
+
+    def resume_all(self) -> int:
+        return 0  # الاستئناف مسؤولية bot_runner.py
 
-    def _loop(self):
-        while self.running:
+    def shutdown(self):
+        pass
+
+
+class SharedEventBridge:
+    """
+    ✅ وضع remote: البوتات في bot_runner.py وأحداثها لا تصل لناقل هذا العامل
+    - thread واحد لكل عامل ويب، يعمل فقط بعد أول اتصال SSE
+    - كل SSE_POLL_INTERVAL: الصفقات الجديدة لكل المستخدمين المتصلين باستعلام واحد (seq > آخر seq)
+    - الحالة من bot_state تمر بتصفية retain في الناقل: لا حدث إذا لم تتغير
+    """
+
+    def __init__(self, interval: float = SSE_POLL_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sse-bridge", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        last_seq = None
+        while True:
+            time.sleep(self.interval)
             try:
-                self.balance = self.binance.get_balance()
+                if last_seq is None:
+                    last_seq = db.last_trade_seq()
+                users = event_bus.keys()
+                if not users:
+                    continue
+                for seq, user_id, trade in db.trades_after(users, last_seq):
+                    last_seq = max(last_seq, seq)
+                    event_bus.publish(user_id, "trade", trade)
+                for user_id in users:
+                    event_bus.publish(user_id, "status", bot_control.status(user_id) or {"running": False}, retain=True)
             except Exception as e:
-                print("bot loop error:", e)
-            time.sleep(60)
+                ERRORS.labels("sse_bridge").inc()
+                print("SSE BRIDGE ERROR:", e)
+
+
+bot_control = RemoteBotControl() if BOT_RUNNER_MODE == "remote" else LocalBotControl()
+shared_event_bridge = SharedEventBridge()
+# atexit بترتيب عكسي: هذا يعمل قبل db.close فتُثبَّت الـ checkpoints الأخيرة
+atexit.register(bot_control.shutdown)
 
 
 # ==================== AUTH DECORATOR ====================
@@ -372,8 +3083,113 @@ def login_required(f):
     return decorated
 
 
+def profile_admin_required(f):
+    """
+    /api/profile*: ترويسة X-Profile-Token = PROFILE_TOKEN (وليس الجلسة: اسم المستخدم يكتبه أي أحد في /setup)
+    بدون PROFILE_TOKEN على السيرفر → 404 لكل الطلبات
+    """
+
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not PROFILE_TOKEN:
+            return jsonify({"status": "error", "message": "profiler endpoints disabled"}), 404
+        token = request.headers.get("X-Profile-Token", "")
+        if not hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode()):
+            return jsonify({"status": "error", "message": "⛔ غير مسموح"}), 403
+        return f(*args, **kwargs)
+    return decorated
+
+
 # ==================== ROUTES ====================
-active_bots = {}
+
+
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+    if profiler.enabled:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        g.profile_span = profiler.push(f"http {request.method} {route}")
+
+
+@app.after_request
+def _record_request(response):
+    # قبل الـ body: اتصال SSE لا يبقى span مفتوحًا طوال عمره
+    profiler.pop(g.pop("profile_span", None))
+    started = getattr(g, "request_started", None)
+    if started is not None:
+        # قالب المسار (وليس الـ URL الفعلي) حتى لا تنفجر الـ labels
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_LATENCY.labels(request.method, route).observe(time.perf_counter() - started)
+        HTTP_REQUESTS.labels(request.method, route, response.status_code).inc()
+    return response
+
+
+@app.teardown_request
+def _close_profile_span(exc):
+    profiler.pop(g.pop("profile_span", None))
+
+
+@before_render_template.connect_via(app)
+def _render_started(sender, template, context, **extra):
+    if profiler.enabled:
+        g.profile_render = profiler.push(f"render {template.name}")
+
+
+@template_rendered.connect_via(app)
+def _render_done(sender, template, context, **extra):
+    profiler.pop(g.pop("profile_render", None))
+
+
+def _spot_url(testnet: bool) -> str:
+    return BINANCE_TESTNET_SPOT if testnet else BINANCE_MAINNET_SPOT
+
+
+def binance_available(testnet: bool) -> bool:
+    """False فقط عندما يكون القاطع مفتوحًا (half_open يسمح بطلب تجريبي)"""
+    breaker = CircuitBreaker.for_host(_spot_url(testnet))
+    return not (breaker.state == CircuitBreaker.OPEN and breaker.retry_in > 0)
+
+
+def _strip(value, volatile: Tuple[str, ...]):
+    if isinstance(value, dict):
+        return {k: _strip(v, volatile) for k, v in value.items() if k not in volatile}
+    return value
+
+
+def streaming_supported() -> bool:
+    """
+    stream مفتوح يحجز عامل الطلب كاملًا: مع gunicorn sync (thread واحد لكل عامل)
+    أربعة tabs توقف الويب كله، لذلك SSE يحتاج wsgi.multithread (gthread / werkzeug threaded) أو gevent
+    """
+    if SSE_STREAMING != "auto":
+        return SSE_STREAMING == "1"
+    if request.environ.get("wsgi.multithread"):
+        return True
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("socket")
+
+
+def conditional_json(payload: Dict, volatile: Tuple[str, ...] = ()) -> Response:
+    """
+    ✅ JSON مع ETag ضعيف (المتصفح يعيد الطلب بـ If-None-Match تلقائيًا):
+    - نفس المحتوى → 304 بدون body (لا تسلسل ولا نقل للعميل الخامل)
+    - volatile: حقول تتغير مع كل طلب (العمر بالثواني) لا تدخل في الـ ETag
+    """
+    digest = hashlib.sha1(
+        json.dumps(_strip(payload, volatile), sort_keys=True, ensure_ascii=False, default=str).encode()
+    ).hexdigest()[:20]
+    if request.if_none_match.contains_weak(digest):
+        CACHE_REQUESTS.labels("etag", "hit").inc()
+        response = Response(status=304)
+    else:
+        CACHE_REQUESTS.labels("etag", "miss").inc()
+        response = jsonify(payload)
+    response.set_etag(digest, weak=True)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
 
 @app.route("/")
 def index():
@@ -394,6 +3210,20 @@ def login():
     return render_template("login.html")
 
 
+def _account_changed(previous: Optional[Dict], api_key: str, api_secret: str, testnet: bool, paper: bool) -> bool:
+    """مفاتيح أو شبكة أو وضع تنفيذ مختلف عن السجل الحالي (حساب Binance آخر فعليًا)"""
+    if previous is None:
+        return False
+    old = (previous.get("api_key") or "", previous.get("api_secret") or "", bool(previous.get("is_testnet")), bool(previous.get("paper")))
+    return old != (api_key, api_secret, testnet, paper)
+
+
+def _forget_account(user_id: str):
+    """بعد تغيير الحساب: لا manager بالمفاتيح القديمة في الـ pool ولا رصيد الحساب القديم في الكاش"""
+    binance_pool.invalidate(user_id)
+    balance_cache.invalidate(user_id)
+
+
 @app.route("/setup", methods=["GET", "POST"])
 @login_required
 def setup():
@@ -401,14 +3231,36 @@ def setup():
         api_key = (request.form.get("api_key") or "").strip()
         api_secret = (request.form.get("api_secret") or "").strip()
         testnet = request.form.get("testnet", "on") == "on"
+        paper = request.form.get("paper") == "on"
         username = (request.form.get("username") or "trader").strip()
 
+        user_id = Database.paper_user_id_for(username) if paper else Database.user_id_for(username)
+        previous = db.get_user(user_id)
+        if paper and previous is not None and session["user_id"] != user_id:
+            # لا مفاتيح تثبت الملكية: الحساب الورقي الموجود لجلسته فقط
+            return render_template("setup.html", error="❌ اسم المستخدم مستخدم لحساب ورقي آخر")
+        changed = _account_changed(previous, "" if paper else api_key, "" if paper else api_secret, testnet, paper)
+        if changed and bot_control.status(user_id):
+            # مراكز البوت تخص الحساب القديم
+            return render_template("setup.html", error="⏹️ أوقف البوت قبل تغيير المفاتيح أو نوع الحساب")
+
+        if paper:
+            # حساب ورقي: لا مفاتيح ولا طلبات موقّعة (بيانات السوق فقط من الشبكة المختارة)
+            user_id = db.add_user(username, "", "", testnet, paper=True)
+            if changed:
+                _forget_account(user_id)
+            session["user_id"] = user_id
+            return redirect(url_for("dashboard"))
+
         if not api_key or not api_secret:
             return render_template("setup.html", error="يجب إدخال جميع الحقول")
 
+        if not binance_available(testnet):
+            return render_template("setup.html", error="⚠️ Binance غير متاح حاليًا، حاول بعد قليل")
+
         # اختبار مفاتيح بشكل صحيح + عرض خطأ Binance الحقيقي
-        binance = BinanceAPIManager(api_key, api_secret, testnet)
-        api_test = binance.test_api_authentication()
+        binance = binance_pool.get(None, api_key, api_secret, testnet)
+        api_test = credential_checks.verify(binance)
 
         if not api_test["success"]:
             # اعرض السبب الحقيقي (code/msg)
@@ -418,6 +3270,8 @@ def setup():
             return render_template("setup.html", error='❌ فعّل "Enable Trading" في إعدادات API داخل Binance')
 
         user_id = db.add_user(username, api_key, api_secret, testnet)
+        if changed:
+            _forget_account(user_id)
         session["user_id"] = user_id
         return redirect(url_for("dashboard"))
 
@@ -432,59 +3286,279 @@ def dashboard():
     if not user:
         return redirect(url_for("setup"))
 
-    # تحديث الرصيد
-    try:
-        b = BinanceAPIManager(user["api_key"], user["api_secret"], user["is_testnet"])
-        bal = b.get_balance()
-        db.update_user(user_id, {"balance": bal})
-        user["balance"] = bal
-    except Exception as e:
-        print("balance refresh error:", e)
+    # الرصيد من الكاش فورًا، والتحديث في الخلفية
+    snap = balance_cache.get_or_refresh(user_id, user)
+    balance_age = snap["age_s"] if snap else None
 
-    bot_status = "stopped"
-    if user_id in active_bots and active_bots[user_id]["bot"].running:
-        bot_status = "running"
+    state = bot_control.status(user_id)
+    bot_status = "running" if state and state.get("running") else "stopped"
 
     trades = db.get_trades(user_id, 10)
-    return render_template("dashboard.html", user=user, bot_status=bot_status, trades=trades)
+    return render_template("dashboard.html", user=user, bot_status=bot_status, trades=trades, balance_age=balance_age)
 
 
-@app.route("/api/start_bot", methods=["POST"])
+@app.route("/api/get_balance")
 @login_required
-def start_bot():
+def get_balance():
     user_id = session.get("user_id")
     user = db.get_user(user_id)
     if not user:
         return jsonify({"status": "error", "message": "المستخدم غير موجود"})
 
-    if user_id in active_bots and active_bots[user_id]["bot"].running:
-        return jsonify({"status": "error", "message": "البوت يعمل بالفعل"})
+    snap = balance_cache.get_or_refresh(user_id, user)
+    degraded = not binance_available(user["is_testnet"])
+    if snap is None:
+        return conditional_json(
+            {"status": "pending", "balance": float(user.get("balance", 0.0)), "age_s": None, "stale": True, "degraded": degraded}
+        )
+    valuation = balance_cache.valuation(user_id, user["is_testnet"])
+    return conditional_json(
+        {
+            "status": "success",
+            "balance": snap["balance"],
+            "equity": valuation["total_value"] if valuation else snap["balance"],
+            "age_s": snap["age_s"],
+            "stale": snap["stale"],
+            "degraded": degraded,
+        },
+        volatile=("age_s",),
+    )
+
+
+@app.route("/api/portfolio")
+@login_required
+def get_portfolio():
+    """كل الأصول غير الصفرية مقيّمة بـ USDT من نفس لقطة الرصيد"""
+    user_id = session.get("user_id")
+    user = db.get_user(user_id)
+    if not user:
+        return jsonify({"status": "error", "message": "المستخدم غير موجود"})
 
-    bot = SimpleTradingBot(user_id, user["api_key"], user["api_secret"], user["is_testnet"])
-    res = bot.start()
-    if res["status"] == "success":
-        active_bots[user_id] = {"bot": bot, "started_at": datetime.now().isoformat()}
-    return jsonify(res)
+    snap = balance_cache.get_or_refresh(user_id, user)
+    if snap is None:
+        return conditional_json({"status": "pending", "age_s": None})
+    return conditional_json(
+        {"status": "success", "age_s": snap["age_s"], "stale": snap["stale"], **balance_cache.valuation(user_id, user["is_testnet"])},
+        volatile=("age_s",),
+    )
+
+
+def _bot_status_data(user_id: str, user: Dict) -> Dict:
+    """حالة البوت + قيمة المحفظة + عدد الصفقات (نفس الشكل في /api/bot_status وأول رسالة SSE)"""
+    snap = balance_cache.get_or_refresh(user_id, user)
+    data = bot_control.status(user_id) or {"running": False, "active_positions": 0}
+    valuation = balance_cache.valuation(user_id, user["is_testnet"]) if snap else None
+    data["equity"] = valuation["total_value"] if valuation else float(user.get("balance", 0.0))
+    data["balance_age_s"] = snap["age_s"] if snap else None
+    data["total_trades"] = db.get_trade_stats(user_id)["trades"]
+    return data
+
+
+@app.route("/api/bot_status")
+@login_required
+def bot_status():
+    user_id = session.get("user_id")
+    user = db.get_user(user_id)
+    if not user:
+        return jsonify({"status": "error", "message": "المستخدم غير موجود"})
+
+    data = _bot_status_data(user_id, user)
+    return conditional_json(
+        {"status": "running" if data.get("running") else "stopped", "data": data}, volatile=("balance_age_s",)
+    )
+
+
+@app.route("/api/stream")
+@login_required
+def event_stream():
+    """
+    ✅ Server-Sent Events بدل polling الداشبورد:
+    - أول رسالة status كاملة (نفس /api/bot_status) ثم التغييرات فقط: status / balance / trade
+    - resync = ضاعت أحداث (عميل بطيء) → العميل يعيد الجلب من JSON endpoints
+    - 503 فوق SSE_MAX_CLIENTS أو مع عامل sync: الداشبورد يرجع للـ polling مع ETag
+    - كل اتصال يُغلق بعد SSE_MAX_AGE والمتصفح يعيد الاتصال تلقائيًا (لقطة جديدة)
+    """
+    user_id = session.get("user_id")
+    user = db.get_user(user_id)
+    if not user:
+        return jsonify({"status": "error", "message": "المستخدم غير موجود"}), 404
+    if not streaming_supported():
+        return jsonify({"status": "error", "message": "⚠️ التحديث اللحظي غير متاح على هذا الخادم"}), 503
+    if event_bus.count() >= SSE_MAX_CLIENTS:
+        return jsonify({"status": "error", "message": "⚠️ عدد الاتصالات الحية ممتلئ"}), 503
+    if BOT_RUNNER_MODE == "remote":
+        shared_event_bridge.ensure_started()
+
+    # الاشتراك قبل اللقطة: ما يحدث بينهما يصل كحدث ولا يضيع
+    sub = event_bus.subscribe(user_id)
+    snapshot = json.dumps(_bot_status_data(user_id, user), ensure_ascii=False, default=str)
+
+    def generate():
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n" + format_sse("status", snapshot)
+            deadline = time.monotonic() + SSE_MAX_AGE
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                events = sub.get(min(SSE_HEARTBEAT, remaining))
+                if events is None:
+                    yield ": ping\n\n"
+                else:
+                    yield "".join(format_sse(event, payload) for event, payload in events)
+        finally:
+            sub.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/get_trades")
+@login_required
+def get_trades():
+    """
+    صفحات كل تاريخ الصفقات: ?limit=&cursor=&symbol=&start=&end= (start/end بالـ ms)
+    الصفحة الأولى = الأحدث؛ next_cursor للصفحة التالية (الأقدم)
+    """
+    user_id = session.get("user_id")
+    args = request.args
+    try:
+        page = db.query_trades(
+            user_id,
+            symbol=(args.get("symbol") or "").upper() or None,
+            start_ms=int(args["start"]) if args.get("start") else None,
+            end_ms=int(args["end"]) if args.get("end") else None,
+            cursor=args.get("cursor"),
+            limit=int(args.get("limit", 10)),
+        )
+    except ValueError:
+        return jsonify({"status": "error", "message": "معاملات غير صالحة"}), 400
+    # الصفحة داخليًا الأحدث أولًا؛ نرجعها الأقدم أولًا مثل get_trades (الداشبورد يعكسها للعرض)
+    return conditional_json(
+        {"status": "success", "trades": page["trades"][::-1], "next_cursor": page["next_cursor"], "stats": db.get_trade_stats(user_id)}
+    )
+
+
+@app.route("/api/start_bot", methods=["POST"])
+@login_required
+def start_bot():
+    return jsonify(bot_control.start(session.get("user_id")))
 
 
 @app.route("/api/stop_bot", methods=["POST"])
 @login_required
 def stop_bot():
-    user_id = session.get("user_id")
-    if user_id not in active_bots:
-        return jsonify({"status": "error", "message": "لا يوجد بوت نشط"})
-    res = active_bots[user_id]["bot"].stop()
-    del active_bots[user_id]
-    return jsonify(res)
+    return jsonify(bot_control.stop(session.get("user_id")))
+
+
+def _cache_hit_ratios() -> Dict[Tuple[str], float]:
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), child in list(CACHE_REQUESTS._children.items()):
+        hits_total = totals.setdefault(cache, [0.0, 0.0])
+        value = child.value
+        hits_total[1] += value
+        if result == "hit":
+            hits_total[0] += value
+    return {(cache,): hits / total for cache, (hits, total) in totals.items() if total}
+
+
+Gauge("bot_active", "Running bots", fn=lambda: bot_control.count())
+Gauge("bot_scheduler_queued", "Bots waiting in the scheduler heap", fn=lambda: len(bot_scheduler._heap))
+Gauge("bot_scheduler_avg_lag_seconds", "Exponential moving average of tick lag", fn=lambda: bot_scheduler.avg_lag)
+Gauge(
+    "binance_clock_offset_ms", "Server time minus local time", ("base_url",),
+    fn=lambda: {(c.base_url,): c.offset_ms for c in list(BinanceClock._instances.values()) if c.last_sync},
+)
+Gauge(
+    "binance_clock_rtt_ms", "Round trip of the best time sample", ("base_url",),
+    fn=lambda: {(c.base_url,): c.rtt_ms for c in list(BinanceClock._instances.values()) if c.rtt_ms is not None},
+)
+Gauge(
+    "binance_rate_limit_queue_depth", "Requests waiting for rate limit tokens", ("base_url",),
+    fn=lambda: {(r.base_url,): sum(r._waiting) for r in list(RateLimiter._instances.values())},
+)
+Gauge(
+    "binance_used_weight_1m", "Last X-MBX-USED-WEIGHT-1M seen", ("base_url",),
+    fn=lambda: {(r.base_url,): r.used_weight for r in list(RateLimiter._instances.values())},
+)
+Gauge(
+    "binance_circuit_open", "1 while the circuit breaker is open", ("base_url",),
+    fn=lambda: {(b.base_url,): int(b.state != CircuitBreaker.CLOSED) for b in list(CircuitBreaker._instances.values())},
+)
+Gauge("db_pending_writes", "Writes queued for the next SQLite flush", fn=lambda: len(db._pending))
+Gauge("cache_hit_ratio", "Hits / lookups since start", ("cache",), fn=_cache_hit_ratios)
+Gauge("binance_manager_pool_size", "Pooled BinanceAPIManager instances", fn=lambda: len(binance_pool._items))
+Gauge("sse_clients", "Connected /api/stream clients in this process", fn=lambda: event_bus.count())
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route("/api/profile", methods=["GET", "POST"])
+@profile_admin_required
+def profile():
+    """
+    ✅ التحكم في الـ profiler أثناء العمل:
+    - GET: أكثر المسارات استهلاكًا + أبطأ العمليات مع شجرة أبنائها
+    - POST {"enabled": true|false, "reset": true, "seconds": N}
+      التفعيل دائمًا بمدة (افتراضي وحد أقصى PROFILE_MAX_SECONDS) ثم يتعطّل تلقائيًا
+    """
+    if request.method == "POST":
+        body = request.get_json(silent=True) or request.form
+        if str(body.get("reset", "")).lower() in ("1", "true", "on"):
+            profiler.reset()
+        if "enabled" in body:
+            if str(body["enabled"]).lower() in ("1", "true", "on"):
+                try:
+                    seconds = float(body.get("seconds") or PROFILE_MAX_SECONDS)
+                except (TypeError, ValueError):
+                    return jsonify({"status": "error", "message": "seconds يجب أن يكون رقمًا"}), 400
+                profiler.enable(duration=min(max(seconds, 1.0), PROFILE_MAX_SECONDS))
+            else:
+                profiler.disable()
+    return jsonify({"status": "success", **profiler.stats()})
+
+
+@app.route("/api/profile/collapsed")
+@profile_admin_required
+def profile_collapsed():
+    """?kind=spans (الوقت الذاتي بالميكروثانية) | samples (Python stacks) — مدخل flamegraph.pl / speedscope"""
+    kind = request.args.get("kind", "spans")
+    if kind not in ("spans", "samples"):
+        return jsonify({"status": "error", "message": "kind = spans | samples"}), 400
+    return Response(
+        profiler.collapsed(kind),
+        content_type="text/plain; charset=utf-8",
+        headers={"Content-Disposition": f"attachment; filename=profile-{kind}.folded"},
+    )
+
+
+@app.route("/health")
+def health():
+    return jsonify(
+        {
+            "status": "ok",
+            "active_bots": bot_control.count(),
+            "bot_runner_mode": BOT_RUNNER_MODE,
+            "scheduler": bot_scheduler.stats(),
+            "exchange_info": {("testnet" if k else "mainnet"): c.stats() for k, c in list(_exchange_info.items())},
+            "rate_limits": [limiter.stats() for limiter in list(RateLimiter._instances.values())],
+            "circuit_breakers": [breaker.stats() for breaker in list(CircuitBreaker._instances.values())],
+        }
+    )
 
 
 @app.route("/logout")
 def logout():
     user_id = session.get("user_id")
-    if user_id in active_bots:
+    if user_id and bot_control.status(user_id):
         try:
-            active_bots[user_id]["bot"].stop()
-            del active_bots[user_id]
+            bot_control.stop(user_id)
         except Exception:
             pass
     session.clear()
@@ -495,4 +3569,7 @@ def logout():
 if __name__ == "__main__":
     os.makedirs("templates", exist_ok=True)
     os.makedirs("static", exist_ok=True)
+    # مع debug العملية الأب تراقب الملفات فقط؛ البوتات تُستأنف في العملية الابن
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        bot_control.resume_all()
     app.run(host="0.0.0.0", port=5000, debug=True, threaded=True)
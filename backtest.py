@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+🧪 Backtest محلي لاستراتيجية SimpleTradingBot (بدون أي اتصال بـ Binance)
+- يقرأ شموع من CSV (صيغة Binance أو مع header) أو Parquet
+- نفس كود الاستراتيجية: compute_series + confidence_scores + entry_size
+- المؤشرات متجهة على كل الزمن، وحلقة التنفيذ تمر فقط على لحظات الإشارات
+- رسوم + انزلاق سعري + حجم صفقة حسب risk_per_trade
+- مسح معاملات (sweep) موزع على ProcessPool
+
+الاستخدام:
+    python backtest.py data/BTCUSDT-1m.csv data/ETHUSDT-1m.csv --min-confidence 60 70 80 --risk 0.01 0.02
+    python backtest.py --synthetic 3 --candles 1051200 --workers 4
+"""
+
+import os
+import sys
+import csv
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from indicators import compute_series, confidence_scores, entry_size
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet اختياري
+    pq = None
+
+DEFAULT_PARAMS = {
+    "initial_balance": 1000.0,
+    "risk_per_trade": 0.01,
+    "min_confidence": 70,
+    "max_positions": 1,
+    "fee_rate": 0.001,  # 0.1% رسوم Binance spot الافتراضية
+    "slippage_bps": 5.0,
+}
+
+# ==================== DATA ====================
+class MarketData:
+    """شموع عدة رموز على محور زمني مشترك: مصفوفات (زمن × رموز)"""
+
+    def __init__(self, symbols: List[str], open_time: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray):
+        self.symbols = symbols
+        self.open_time = open_time
+        self.high = high
+        self.low = low
+        self.close = close
+        self._series = None
+
+    def __len__(self):
+        return len(self.open_time)
+
+    @property
+    def series(self) -> Dict[str, np.ndarray]:
+        # المؤشرات لا تعتمد على المعاملات: تُحسب مرة واحدة لكل مجموعة بيانات
+        if self._series is None:
+            self._series = compute_series(self.high, self.low, self.close)
+        return self._series
+
+
+def _symbol_from_path(path: str) -> str:
+    name = os.path.basename(path).split(".")[0]
+    return name.replace("_", "-").split("-")[0].upper()
+
+
+def load_klines(path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """يرجّع (open_time int64, ohlcv float64[n, 5]) من ملف CSV أو Parquet"""
+    if path.endswith(".parquet"):
+        if pq is None:
+            raise RuntimeError("قراءة Parquet تحتاج pyarrow: pip install pyarrow")
+        table = pq.read_table(path, columns=["open_time", "open", "high", "low", "close", "volume"])
+        cols = [table.column(c).to_numpy() for c in table.column_names]
+        return cols[0].astype(np.int64), np.column_stack(cols[1:]).astype(np.float64)
+
+    with open(path, "r", newline="") as f:
+        first = f.readline()
+    has_header = not first.split(",")[0].strip().lstrip("-").isdigit()
+    raw = np.loadtxt(path, delimiter=",", skiprows=1 if has_header else 0, usecols=range(6), dtype=np.float64, ndmin=2)
+    return raw[:, 0].astype(np.int64), raw[:, 1:6]
+
+
+def load_market(paths: List[str]) -> MarketData:
+    """تحميل عدة ملفات ومحاذاتها على الأوقات المشتركة فقط"""
+    loaded = [load_klines(p) for p in paths]
+    common = loaded[0][0]
+    for times, _ in loaded[1:]:
+        common = np.intersect1d(common, times, assume_unique=True)
+
+    high, low, close = [], [], []
+    for times, ohlcv in loaded:
+        idx = np.searchsorted(times, common)
+        high.append(ohlcv[idx, 1])
+        low.append(ohlcv[idx, 2])
+        close.append(ohlcv[idx, 3])
+    return MarketData([_symbol_from_path(p) for p in paths], common, np.column_stack(high), np.column_stack(low), np.column_stack(close))
+
+
+def synthetic_market(n_symbols: int, candles: int, seed: int = 0, interval_ms: int = 60_000) -> MarketData:
+    """random walk هندسي للتجارب وقياس الأداء"""
+    rng = np.random.default_rng(seed)
+    log_ret = rng.normal(0.0, 0.001, (candles, n_symbols))
+    close = 100.0 * np.exp(np.cumsum(log_ret, axis=0))
+    spread = np.abs(rng.normal(0.0, 0.0007, (candles, n_symbols))) * close
+    open_time = np.arange(candles, dtype=np.int64) * interval_ms
+    return MarketData([f"SYN{i}USDT" for i in range(n_symbols)], open_time, close + spread, close - spread, close)
+
+
+# ==================== ENGINE ====================
+def run_backtest(data: MarketData, params: Optional[Dict] = None) -> Dict:
+    """
+    نفس منطق SimpleTradingBot._act على كل شمعة مغلقة:
+    - شراء: ثقة ≥ min_confidence + اتجاه صاعد + لا صفقة مفتوحة للرمز + عدد الصفقات < max_positions
+    - بيع: ثقة ≥ min_confidence + اتجاه هابط + صفقة مفتوحة للرمز
+    """
+    p = {**DEFAULT_PARAMS, **(params or {})}
+    series = data.series
+    confidence, direction = confidence_scores(series)
+    close, atr = series["close"], series["atr"]
+    n_times, n_symbols = close.shape
+
+    slip = p["slippage_bps"] / 10_000
+    fee = p["fee_rate"]
+
+    # الأحداث فقط: (زمن، رمز) فيها إشارة فوق الحد، مرتبة زمنيًا ثم حسب ترتيب الرموز كما في البوت
+    ev_t, ev_i = np.nonzero((confidence >= p["min_confidence"]) & (direction != 0))
+    events = zip(ev_t.tolist(), ev_i.tolist(), direction[ev_t, ev_i].tolist(), close[ev_t, ev_i].tolist(), atr[ev_t, ev_i].tolist())
+
+    cash = p["initial_balance"]
+    held = [0.0] * n_symbols
+    entry = [0.0] * n_symbols
+    open_positions = 0
+    cash_delta = np.zeros(n_times)
+    qty_delta = np.zeros((n_times, n_symbols))
+    trades: List[Dict] = []
+
+    for t, i, side, price, sym_atr in events:
+        if side > 0:
+            if held[i] or open_positions >= p["max_positions"]:
+                continue
+            fill = price * (1 + slip)
+            # مثل البوت: المخاطرة من قيمة المحفظة (النقد + المراكز بسعر الإغلاق الحالي)، والشراء من النقد فقط
+            equity = cash + sum(h * close[t, j] for j, h in enumerate(held) if h)
+            qty = entry_size(equity, cash / (1 + fee), p["risk_per_trade"], fill, sym_atr)
+            if qty <= 0:
+                continue
+            cost = qty * fill * (1 + fee)
+            cash -= cost
+            held[i], entry[i] = qty, fill
+            open_positions += 1
+            cash_delta[t] -= cost
+            qty_delta[t, i] += qty
+            trades.append({"time": int(data.open_time[t]), "symbol": data.symbols[i], "side": "BUY", "quantity": qty, "price": fill, "fee": qty * fill * fee})
+        elif held[i]:
+            fill = price * (1 - slip)
+            qty = held[i]
+            proceeds = qty * fill * (1 - fee)
+            cash += proceeds
+            pnl = proceeds - qty * entry[i] * (1 + fee)
+            held[i] = 0.0
+            open_positions -= 1
+            cash_delta[t] += proceeds
+            qty_delta[t, i] -= qty
+            trades.append({"time": int(data.open_time[t]), "symbol": data.symbols[i], "side": "SELL", "quantity": qty, "price": fill, "fee": qty * fill * fee, "pnl": pnl})
+
+    # منحنى رأس المال متجه: رصيد نقدي + قيمة الكميات المحتفظ بها بسعر الإغلاق
+    equity = p["initial_balance"] + np.cumsum(cash_delta) + (np.cumsum(qty_delta, axis=0) * close).sum(axis=1)
+    return _report(data, p, equity, trades)
+
+
+def _report(data: MarketData, params: Dict, equity: np.ndarray, trades: List[Dict]) -> Dict:
+    peak = np.maximum.accumulate(equity) if len(equity) else equity
+    drawdown = (equity - peak) / np.where(peak > 0, peak, 1.0) if len(equity) else equity
+    closed = [t for t in trades if t["side"] == "SELL"]
+    wins = sum(1 for t in closed if t["pnl"] > 0)
+    final = float(equity[-1]) if len(equity) else params["initial_balance"]
+    return {
+        "params": params,
+        "symbols": data.symbols,
+        "candles": len(data),
+        "final_equity": final,
+        "return_pct": (final / params["initial_balance"] - 1) * 100,
+        "max_drawdown_pct": float(drawdown.min() * 100) if len(drawdown) else 0.0,
+        "trades": trades,
+        "closed_trades": len(closed),
+        "win_rate": wins / len(closed) if closed else 0.0,
+        "fees": sum(t["fee"] for t in trades),
+        "equity": equity,
+        "drawdown": drawdown,
+    }
+
+
+# ==================== SWEEP ====================
+_worker_data: Optional[MarketData] = None
+
+
+def _init_worker(paths: Optional[List[str]], synthetic: Optional[Tuple[int, int, int]]):
+    global _worker_data
+    _worker_data = load_market(paths) if paths else synthetic_market(*synthetic)
+    _ = _worker_data.series  # حساب المؤشرات مرة واحدة لكل worker
+
+
+def _run_in_worker(params: Dict) -> Dict:
+    report = run_backtest(_worker_data, params)
+    # المنحنيات كبيرة: نعيد الملخص فقط للعملية الأم
+    report.pop("equity")
+    report.pop("drawdown")
+    report["trades"] = len(report["trades"])
+    return report
+
+
+def param_grid(grid: Dict[str, List]) -> List[Dict]:
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def sweep(grid: Dict[str, List], paths: Optional[List[str]] = None, synthetic: Optional[Tuple[int, int, int]] = None, workers: Optional[int] = None) -> List[Dict]:
+    combos = param_grid(grid)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(paths, synthetic)) as pool:
+        return list(pool.map(_run_in_worker, combos))
+
+
+# ==================== OUTPUT ====================
+def write_report_files(report: Dict, out_dir: str):
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "trades.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["time", "symbol", "side", "quantity", "price", "fee", "pnl"])
+        writer.writeheader()
+        writer.writerows(report["trades"])
+    np.savetxt(
+        os.path.join(out_dir, "equity.csv"),
+        np.column_stack([np.arange(len(report["equity"])), report["equity"], report["drawdown"]]),
+        delimiter=",", header="index,equity,drawdown", comments="", fmt=["%d", "%.6f", "%.6f"],
+    )
+
+
+def _print_summary(r: Dict):
+    p = r["params"]
+    trades = r["trades"] if isinstance(r["trades"], int) else len(r["trades"])
+    print(
+        f"conf={p['min_confidence']:<5} risk={p['risk_per_trade']:<6} max_pos={p['max_positions']:<3} "
+        f"equity={r['final_equity']:12.2f}  return={r['return_pct']:8.2f}%  maxDD={r['max_drawdown_pct']:8.2f}%  "
+        f"trades={trades:<6} win={r['win_rate'] * 100:5.1f}%"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="ملفات شموع CSV/Parquet (رمز لكل ملف)")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="استخدام N رموز عشوائية بدل الملفات")
+    parser.add_argument("--candles", type=int, default=525_600, help="عدد الشموع العشوائية (سنة 1m افتراضيًا)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-confidence", type=float, nargs="+", default=[DEFAULT_PARAMS["min_confidence"]])
+    parser.add_argument("--risk", type=float, nargs="+", default=[DEFAULT_PARAMS["risk_per_trade"]])
+    parser.add_argument("--max-positions", type=int, nargs="+", default=[DEFAULT_PARAMS["max_positions"]])
+    parser.add_argument("--fee", type=float, default=DEFAULT_PARAMS["fee_rate"])
+    parser.add_argument("--slippage-bps", type=float, default=DEFAULT_PARAMS["slippage_bps"])
+    parser.add_argument("--balance", type=float, default=DEFAULT_PARAMS["initial_balance"])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", help="مجلد لحفظ trades.csv و equity.csv (تشغيل واحد فقط)")
+    args = parser.parse_args(argv)
+
+    if not args.files and not args.synthetic:
+        parser.error("حدد ملفات شموع أو --synthetic N")
+
+    grid = {
+        "min_confidence": args.min_confidence,
+        "risk_per_trade": args.risk,
+        "max_positions": args.max_positions,
+        "fee_rate": [args.fee],
+        "slippage_bps": [args.slippage_bps],
+        "initial_balance": [args.balance],
+    }
+    synthetic = (args.synthetic, args.candles, args.seed) if args.synthetic else None
+
+    t0 = time.perf_counter()
+    combos = param_grid(grid)
+    if len(combos) == 1:
+        data = load_market(args.files) if args.files else synthetic_market(*synthetic)
+        results = [run_backtest(data, combos[0])]
+        if args.out:
+            write_report_files(results[0], args.out)
+    else:
+        results = sweep(grid, args.files or None, synthetic, args.workers)
+    elapsed = time.perf_counter() - t0
+
+    for r in sorted(results, key=lambda r: r["final_equity"], reverse=True):
+        _print_summary(r)
+    print(f"\n{len(results)} run(s) × {results[0]['candles']} candles × {len(results[0]['symbols'])} symbols in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,540 @@
+#!/usr/bin/env python3
+"""
+⏱️ قياسات أداء محلية (بدون أي اتصال بـ Binance)
+
+الاستخدام:
+    python benchmarks.py db --trades 20000 --users 50
+    python benchmarks.py trades --trades 1000000 --symbols 5
+    python benchmarks.py clock --orders 200 --latency-ms 20
+    python benchmarks.py indicators --symbols 3 300 --ticks 2000
+    python benchmarks.py orders --orders 300 --latency-ms 20
+    python benchmarks.py paper --orders 200000 --threads 4
+    python benchmarks.py load --users 50 --concurrency 16 --latency-ms 20 --error-rate 0.01
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+import statistics
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# لا نلمس قاعدة البيانات الحقيقية أثناء القياس
+_TMP_DIR = tempfile.mkdtemp(prefix="bench_")
+os.environ.setdefault("DB_PATH", os.path.join(_TMP_DIR, "app.db"))
+# التداول الورقي بأقصى معدل: بدون تأخير محاكى
+os.environ.setdefault("PAPER_LATENCY_MS", "0")
+
+import numpy as np  # noqa: E402
+
+import requests  # noqa: E402
+from werkzeug.serving import WSGIRequestHandler, make_server  # noqa: E402
+
+import app  # noqa: E402
+import indicators  # noqa: E402
+from mock_binance import MockRestServer, mock_kline, mock_price  # noqa: E402
+from paper import LatencyModel, PaperExchange  # noqa: E402
+
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def _report_latency(name: str, samples_ms):
+    print(
+        f"{name:<32} n={len(samples_ms):<6} p50={_percentile(samples_ms, 50):8.2f}ms "
+        f"p99={_percentile(samples_ms, 99):8.2f}ms  mean={statistics.fmean(samples_ms):8.2f}ms"
+    )
+
+
+def _report(name: str, count: int, elapsed: float, unit: str = "ops"):
+    rate = count / elapsed if elapsed > 0 else float("inf")
+    print(f"{name:<32} {count:>9} {unit} in {elapsed:8.3f}s  →  {rate:12.1f} {unit}/s")
+
+
+# ==================== DB ====================
+class LegacyJSONDatabase:
+    """نسخة مطابقة لمسار الكتابة القديم: json.dump(indent=2) للملف كاملًا مع كل كتابة"""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.data = {"users": {}, "trades": {}}
+
+    def save_data(self):
+        with open(self.file_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2, ensure_ascii=False)
+
+    def add_trade(self, user_id, trade_data):
+        if user_id not in self.data["trades"]:
+            self.data["trades"][user_id] = []
+        trade_data["id"] = hashlib.sha256(str(time.time()).encode()).hexdigest()[:12]
+        trade_data["timestamp"] = datetime.now().isoformat()
+        self.data["trades"][user_id].append(trade_data)
+        if len(self.data["trades"][user_id]) > 100:
+            self.data["trades"][user_id] = self.data["trades"][user_id][-100:]
+        self.save_data()
+        return trade_data["id"]
+
+
+def _sample_trade(i: int) -> dict:
+    return {"symbol": "BTCUSDT", "side": "BUY" if i % 2 else "SELL", "quantity": 0.001, "price": 60000.0 + i, "status": "FILLED"}
+
+
+def bench_db(args):
+    users = [f"user{i:04d}" for i in range(args.users)]
+
+    legacy = LegacyJSONDatabase(os.path.join(_TMP_DIR, "legacy.json"))
+    n_legacy = min(args.trades, args.legacy_trades)
+    t0 = time.perf_counter()
+    for i in range(n_legacy):
+        legacy.add_trade(users[i % len(users)], _sample_trade(i))
+    _report("legacy json add_trade", n_legacy, time.perf_counter() - t0, "trades")
+
+    db = app.Database(os.path.join(_TMP_DIR, "bench.db"))
+    t0 = time.perf_counter()
+    for i in range(args.trades):
+        db.add_trade(users[i % len(users)], _sample_trade(i))
+    enqueue_elapsed = time.perf_counter() - t0
+    db.flush()
+    total_elapsed = time.perf_counter() - t0
+    _report("sqlite add_trade (enqueue)", args.trades, enqueue_elapsed, "trades")
+    _report("sqlite add_trade (durable)", args.trades, total_elapsed, "trades")
+    db.close()
+
+
+# ==================== TRADE HISTORY ====================
+def _time_queries(db, user: str, label: str, repeats: int, mid_ts: int, span_ms: int, symbol: str):
+    def timed(fn):
+        samples = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - t0) * 1000)
+        return samples
+
+    window = max(span_ms // 100, 1)  # 1% من التاريخ
+    mid_cursor = f"{mid_ts}:{2 ** 62}"
+    _report_latency(f"{label} first page (50)", timed(lambda: db.query_trades(user, limit=50)))
+    _report_latency(f"{label} mid cursor page (50)", timed(lambda: db.query_trades(user, cursor=mid_cursor, limit=50)))
+    _report_latency(f"{label} mid symbol page (50)", timed(lambda: db.query_trades(user, symbol=symbol, cursor=mid_cursor, limit=50)))
+    _report_latency(
+        f"{label} 1% time range (500)",
+        timed(lambda: db.query_trades(user, start_ms=mid_ts - window, end_ms=mid_ts, limit=500)),
+    )
+
+
+def bench_trades(args):
+    db = app.Database(os.path.join(_TMP_DIR, "trades.db"), archive_interval=0)
+    user = "bench-user"
+    symbols = [f"SYM{i}USDT" for i in range(args.symbols)]
+
+    t0 = time.perf_counter()
+    for i in range(args.trades):
+        trade = _sample_trade(i)
+        trade["symbol"] = symbols[i % len(symbols)]
+        if i % 2 == 0:
+            trade["pnl"] = ((i * 7919) % 200 - 100) / 10
+        db.add_trade(user, trade)
+    db.flush()
+    _report("add_trade + stats (durable)", args.trades, time.perf_counter() - t0, "trades")
+
+    stats = db.get_trade_stats(user)
+    first_ts, last_ts = stats["first_ts"], stats["last_ts"]
+    span = last_ts - first_ts
+    mid_ts = first_ts + span // 2
+
+    samples = []
+    for _ in range(args.repeats):
+        t0 = time.perf_counter()
+        db.get_trade_stats(user)
+        samples.append((time.perf_counter() - t0) * 1000)
+    _report_latency("stats (incremental)", samples)
+    samples = []
+    for _ in range(max(args.repeats // 20, 1)):
+        t0 = time.perf_counter()
+        db._reader().execute(
+            "SELECT COUNT(*), TOTAL(quantity * price), TOTAL(pnl), COUNT(pnl), COUNT(CASE WHEN pnl > 0 THEN 1 END) "
+            "FROM trades WHERE user_id = ?",
+            (user,),
+        ).fetchone()
+        samples.append((time.perf_counter() - t0) * 1000)
+    _report_latency("stats (recomputed by scan)", samples)
+
+    _time_queries(db, user, "sqlite", args.repeats, mid_ts, span, symbols[0])
+
+    # نؤرشف أقدم 90%: الاستعلامات في المنتصف تقرأ من الأرشيف
+    sqlite_bytes = os.path.getsize(db.file_path)
+    t0 = time.perf_counter()
+    moved = db.archive_trades(before_ms=first_ts + span * 9 // 10)
+    _report("archive_trades", moved, time.perf_counter() - t0, "trades")
+    archive_bytes = os.path.getsize(db.archive._path(user))
+    print(f"{'size':<32} sqlite={sqlite_bytes / 1e6:.1f}MB ({sqlite_bytes / args.trades:.0f} B/trade)  "
+          f"archive={archive_bytes / 1e6:.1f}MB ({archive_bytes / max(moved, 1):.0f} B/trade)")
+
+    db.query_trades(user, cursor=f"{mid_ts}:{2 ** 62}", limit=1)  # تحميل الأرشيف للذاكرة مرة واحدة
+    _time_queries(db, user, "archive", args.repeats, mid_ts, span, symbols[0])
+
+    # التأكد أن الصفحات تغطي كل التاريخ بدون تكرار عبر حدود SQLite / الأرشيف
+    cursor, seen, t0 = None, 0, time.perf_counter()
+    while True:
+        page = db.query_trades(user, cursor=cursor, limit=500)
+        seen += len(page["trades"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    _report("full walk (pages of 500)", seen, time.perf_counter() - t0, "trades")
+    assert seen == args.trades, (seen, args.trades)
+    db.close()
+
+
+# ==================== MOCK BINANCE ====================
+def start_mock_binance(latency_ms: float, **kwargs) -> MockRestServer:
+    """mock_binance.MockRestServer محلي، وتوجيه app إليه بدل testnet"""
+    mock = MockRestServer(latency_ms=latency_ms, **kwargs).start()
+    app.BINANCE_TESTNET_SPOT = mock.url
+    return mock
+
+
+# ==================== CLOCK ====================
+def bench_clock(args):
+    mock = start_mock_binance(args.latency_ms)
+    base_url = mock.url
+    try:
+        manager = app.BinanceAPIManager("key", "secret", testnet=True)
+        # نقيس زمن الطلب نفسه وليس حد ORDERS/10s للمفتاح
+        manager.limiter = app.RateLimiter(base_url, order_limit=10**6)
+        manager.sync_time()
+
+        legacy, cached = [], []
+        for _ in range(args.orders):
+            # المسار القديم: طلب /time واحد قبل كل طلب موقّع (sync_time الحالي يأخذ CLOCK_SAMPLES عينات)
+            t0 = time.perf_counter()
+            manager.clock.sync(samples=1)
+            manager.place_order("BTCUSDT", "BUY", 0.001)
+            legacy.append((time.perf_counter() - t0) * 1000)
+
+            t0 = time.perf_counter()
+            manager.place_order("BTCUSDT", "BUY", 0.001)
+            cached.append((time.perf_counter() - t0) * 1000)
+
+        _report_latency("place_order (sync per call)", legacy)
+        _report_latency("place_order (cached offset)", cached)
+        print("clock:", manager.clock.status())
+    finally:
+        mock.stop()
+
+
+# ==================== ORDERS ====================
+def bench_orders(args):
+    mock = start_mock_binance(args.latency_ms, start_balance={"USDT": 1e9})
+    base_url = mock.url
+    try:
+        manager = app.BinanceAPIManager("key", "secret", testnet=True)
+        # نقيس زمن الطلب نفسه وليس حد ORDERS/10s للمفتاح
+        manager.limiter = app.RateLimiter(base_url, order_limit=10**6)
+        manager.sync_time()
+        app.exchange_info_for(True).warm(["BTCUSDT"])
+
+        # كميات كما يحسبها position_size (float خام، بعضها أقل من minNotional)
+        price = mock_price("BTCUSDT", int(time.time() * 1000))
+        rng = np.random.default_rng(0)
+        quantities = [float(q) for q in rng.uniform(3, 100, args.orders) / price]
+
+        legacy, legacy_rejected = [], 0
+        for q in quantities:
+            # المسار القديم: float مقرّب لـ 6 منازل ويُرسل مباشرة
+            t0 = time.perf_counter()
+            r = manager._request(
+                "POST", "/api/v3/order", signed=True, priority=app.PRIORITY_ORDER,
+                params={"symbol": "BTCUSDT", "side": "BUY", "type": "MARKET", "quantity": round(q, 6), "recvWindow": 60000},
+            )
+            legacy.append((time.perf_counter() - t0) * 1000)
+            legacy_rejected += r.status_code != 200
+
+        validated, local_rejected, exchange_rejected, acked = [], 0, 0, []
+        prepare_us = []
+        for q in quantities:
+            t0 = time.perf_counter()
+            res = manager.place_order("BTCUSDT", "BUY", q, ref_price=price)
+            elapsed = (time.perf_counter() - t0) * 1000
+            validated.append(elapsed)
+            if res.get("rejected_locally"):
+                local_rejected += 1
+            elif "error" in res:
+                exchange_rejected += 1
+            else:
+                acked.append(elapsed)
+
+            t0 = time.perf_counter()
+            try:
+                manager.prepare_order("BTCUSDT", "BUY", q, ref_price=price)
+            except app.OrderRejected:
+                pass
+            prepare_us.append((time.perf_counter() - t0) * 1e6)
+
+        _report_latency("raw float order (all)", legacy)
+        print(f"{'':<32} rejected by exchange: {legacy_rejected}/{len(quantities)}")
+        _report_latency("validated order (all)", validated)
+        _report_latency("validated order (acked)", acked or [0.0])
+        print(f"{'':<32} rejected locally: {local_rejected}  rejected by exchange: {exchange_rejected}")
+        _report_latency("prepare_order (local, µs→ms)", [u / 1000 for u in prepare_us])
+        print("exchange_info:", app.exchange_info_for(True).stats())
+    finally:
+        mock.stop()
+
+
+# ==================== PAPER ====================
+def bench_paper(args):
+    """
+    محرك التداول الورقي بدون طلبات أوامر:
+    1) شموع 1m مُعادة (ساعة المحرك = زمن الشموع) + أوامر MARKET/LIMIT عشوائية
+    2) نفس المحرك من عدة threads
+    3) عبر PaperBinanceManager.place_order (تجهيز + تحقق exchangeInfo كالحقيقي)
+    """
+    rng = np.random.default_rng(0)
+    step = 60_000
+    start = int(time.time() * 1000) // step * step - args.candles * step
+    klines = [mock_kline("BTCUSDT", start + i * step, step) for i in range(args.candles)]
+    per_candle = max(args.orders // len(klines), 1)
+    n = per_candle * len(klines)
+    qty = rng.uniform(0.0005, 0.05, n)
+    buys = rng.random(n) < 0.5
+    limits = rng.random(n) < args.limit_share
+
+    replay_now = [0.0]
+    exchange = PaperExchange(
+        start_balances={"USDT": 1e12, "BTC": 1e6}, latency=LatencyModel(0.0), clock=lambda: replay_now[0]
+    )
+    statuses = Counter()
+    i = 0
+    t0 = time.perf_counter()
+    for c, kline in enumerate(klines):
+        replay_now[0] = c * step / 1000
+        exchange.replay_kline("BTCUSDT", kline, step)
+        close = float(kline[4])
+        for _ in range(per_candle):
+            replay_now[0] += step / 1000 / per_candle
+            side = "BUY" if buys[i] else "SELL"
+            if limits[i]:
+                # أبعد قليلًا من السعر: تُعلَّق وتُنفَّذ عندما تعبرها شمعة لاحقة
+                price = close * (0.999 if buys[i] else 1.001)
+                res = exchange.place_order("bench", "BTCUSDT", side, float(qty[i]), "LIMIT", price)
+            else:
+                res = exchange.place_order("bench", "BTCUSDT", side, float(qty[i]))
+            statuses[res["status"]] += 1
+            i += 1
+    _report("engine (replayed 1m klines)", n, time.perf_counter() - t0, "orders")
+    stats = exchange.stats()
+    print(f"{'':<32} statuses={dict(statuses)}  fills/order={stats['fills'] / max(stats['orders'], 1):.2f}  resting={stats['resting']}")
+
+    # live-style: سعر ثابت وساعة حقيقية، عدة threads على نفس المحرك
+    exchange = PaperExchange(start_balances={"USDT": 1e12, "BTC": 1e6}, latency=LatencyModel(0.0))
+    exchange.set_market("BTCUSDT", mock_price("BTCUSDT", start), volume_per_s=50.0)
+    per_thread = n // args.threads
+
+    def worker(t: int):
+        for j in range(per_thread):
+            k = (t * per_thread + j) % n
+            exchange.place_order(f"bench-{t}", "BTCUSDT", "BUY" if buys[k] else "SELL", float(qty[k]) / 10)
+
+    for t in range(args.threads):
+        exchange.open_account(f"bench-{t}", [{"asset": "USDT", "free": "1e12"}, {"asset": "BTC", "free": "1e6"}])
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(worker, range(args.threads)))
+    _report(f"engine ({args.threads} threads)", per_thread * args.threads, time.perf_counter() - t0, "orders")
+
+    mock = start_mock_binance(0)
+    try:
+        user_id = app.db.add_user("bench-paper", "", "", True, paper=True)
+        manager = app.binance_pool.for_user(user_id, app.db.get_user(user_id))
+        manager.exchange.open_account(user_id)
+        manager.exchange._account(user_id).free.update({"USDT": 1e12, "BTC": 1e6})
+        # عمق كبير: نقيس تكلفة المسار (تجهيز + مطابقة) وليس اجتياح الدفتر بمستوى لكل fill
+        manager.exchange.depth_quote = 1e12
+        app.exchange_info_for(True).warm(["BTCUSDT"])
+        price = mock_price("BTCUSDT", int(time.time() * 1000))
+        before = dict(mock.counts)
+        m = min(n, args.manager_orders)
+        samples, errors = [], 0
+        t0 = time.perf_counter()
+        for k in range(m):
+            s0 = time.perf_counter()
+            res = manager.place_order("BTCUSDT", "BUY" if buys[k] else "SELL", float(qty[k]), ref_price=price)
+            samples.append((time.perf_counter() - s0) * 1000)
+            errors += "error" in res
+        _report("PaperBinanceManager.place_order", m, time.perf_counter() - t0, "orders")
+        _report_latency("place_order latency", samples)
+        sent = {k: v - before.get(k, 0) for k, v in mock.counts.items() if v != before.get(k, 0)}
+        stats = manager.exchange.stats()
+        print(f"{'':<32} errors={errors}  fills/order={stats['fills'] / max(stats['orders'], 1):.2f}  "
+              f"requests to exchange during orders: {sent or 'none'}")
+    finally:
+        mock.stop()
+
+
+# ==================== LOAD ====================
+class _QuietRequestHandler(WSGIRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive لكل مستخدم محاكى
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def bench_load(args):
+    """
+    N مستخدمين متزامنين عبر HTTP حقيقي:
+    login → setup → dashboard × k → start_bot → bot_status → stop_bot
+    """
+    mock = start_mock_binance(args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate)
+    app.BINANCE_STREAMING = False
+    server = make_server("127.0.0.1", 0, app.app, threaded=True, request_handler=_QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    samples = defaultdict(list)
+    failures = defaultdict(int)
+
+    def call(http, name, method, path, expect=200, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            r = http.request(method, base + path, allow_redirects=False, timeout=60, **kwargs)
+            ok = r.status_code == expect
+            if ok and r.headers.get("Content-Type", "").startswith("application/json"):
+                ok = r.json().get("status") != "error"
+        except requests.RequestException:
+            ok = False
+        samples[name].append((time.perf_counter() - t0) * 1000)
+        if not ok:
+            failures[name] += 1
+
+    def user_flow(i):
+        http = requests.Session()
+        call(http, "login", "POST", "/login", expect=302, data={"password": app.SECRET_PASSWORD})
+        call(
+            http, "setup", "POST", "/setup", expect=302,
+            data={"api_key": f"bench-key-{i}", "api_secret": f"bench-secret-{i}", "testnet": "on", "username": f"bench{i}"},
+        )
+        for _ in range(args.dashboards):
+            call(http, "dashboard", "GET", "/dashboard")
+        call(http, "start_bot", "POST", "/api/start_bot")
+        call(http, "bot_status", "GET", "/api/bot_status")
+        call(http, "stop_bot", "POST", "/api/stop_bot")
+        http.close()
+
+    try:
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            list(pool.map(user_flow, range(args.users)))
+        elapsed = time.perf_counter() - t0
+
+        for name in ("login", "setup", "dashboard", "start_bot", "bot_status", "stop_bot"):
+            _report_latency(name, samples[name])
+        total = sum(len(v) for v in samples.values())
+        _report("all requests", total, elapsed, "req")
+        print(f"failures: {dict(failures) or 0}")
+        print("binance calls:", dict(sorted(mock.counts.items())))
+        print("rate limits:", [limiter.stats() for limiter in app.RateLimiter._instances.values()])
+        print("circuit breakers:", [breaker.stats() for breaker in app.CircuitBreaker._instances.values()])
+    finally:
+        server.shutdown()
+        mock.stop()
+
+
+# ==================== INDICATORS ====================
+def bench_indicators(args):
+    rng = np.random.default_rng(0)
+    for n in args.symbols:
+        symbols = [f"SYM{i}USDT" for i in range(n)]
+        engine = indicators.IndicatorEngine(symbols)
+        close = 100 + np.cumsum(rng.normal(0, 1, (args.ticks, n)), axis=0)
+
+        t0 = time.perf_counter()
+        for t in range(args.ticks):
+            c = close[t]
+            engine.update(c + 1, c - 1, c)
+            engine.signals()
+        elapsed = time.perf_counter() - t0
+        per_tick_us = elapsed / args.ticks * 1e6
+        print(f"incremental  symbols={n:<5} per tick={per_tick_us:9.1f}µs  per symbol={per_tick_us / n:7.2f}µs")
+
+        # مقارنة: إعادة حساب كامل نافذة الشموع في كل tick
+        window = close[-args.window:]
+        fresh = indicators.IndicatorEngine(symbols)
+        t0 = time.perf_counter()
+        for c in window:
+            fresh.update(c + 1, c - 1, c)
+        fresh.signals()
+        full_us = (time.perf_counter() - t0) * 1e6
+        print(f"full window  symbols={n:<5} per tick={full_us:9.1f}µs  (window={len(window)} candles)")
+
+
+# ==================== MAIN ====================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("db", help="trades/sec: users.json القديم مقابل SQLite")
+    p.add_argument("--trades", type=int, default=20000)
+    p.add_argument("--legacy-trades", type=int, default=2000, help="المسار القديم بطيء جدًا، نقيس عينة أصغر")
+    p.add_argument("--users", type=int, default=50)
+    p.set_defaults(func=bench_db)
+
+    p = sub.add_parser("trades", help="تاريخ صفقات مستخدم واحد: صفحات، نطاق زمني، إحصاءات، أرشيف")
+    p.add_argument("--trades", type=int, default=200000)
+    p.add_argument("--symbols", type=int, default=5)
+    p.add_argument("--repeats", type=int, default=200)
+    p.set_defaults(func=bench_trades)
+
+    p = sub.add_parser("clock", help="زمن place_order: sync_time لكل طلب مقابل offset مشترك")
+    p.add_argument("--orders", type=int, default=200)
+    p.add_argument("--latency-ms", type=float, default=20.0, help="تأخير السيرفر المحلي لكل طلب")
+    p.set_defaults(func=bench_clock)
+
+    p = sub.add_parser("orders", help="submit→ack: كمية float خام مقابل أمر مقرّب ومتحقق منه محليًا")
+    p.add_argument("--orders", type=int, default=300)
+    p.add_argument("--latency-ms", type=float, default=20.0, help="تأخير السيرفر المحلي لكل طلب")
+    p.set_defaults(func=bench_orders)
+
+    p = sub.add_parser("paper", help="محرك التداول الورقي: أوامر/ثانية، تنفيذ جزئي، بدون طلبات أوامر")
+    p.add_argument("--orders", type=int, default=200000)
+    p.add_argument("--candles", type=int, default=1000)
+    p.add_argument("--limit-share", type=float, default=0.1, help="نسبة أوامر LIMIT (الباقي MARKET)")
+    p.add_argument("--threads", type=int, default=4)
+    p.add_argument("--manager-orders", type=int, default=50000)
+    p.set_defaults(func=bench_paper)
+
+    p = sub.add_parser("load", help="N مستخدمين عبر Flask + mock Binance: p50/p99 و req/s")
+    p.add_argument("--users", type=int, default=50)
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--dashboards", type=int, default=3, help="عدد مرات فتح الداشبورد لكل مستخدم")
+    p.add_argument("--latency-ms", type=float, default=20.0)
+    p.add_argument("--jitter-ms", type=float, default=10.0)
+    p.add_argument("--error-rate", type=float, default=0.0, help="نسبة ردود 503 من mock Binance")
+    p.set_defaults(func=bench_load)
+
+    p = sub.add_parser("indicators", help="تكلفة tick واحد لمحرك المؤشرات")
+    p.add_argument("--symbols", type=int, nargs="+", default=[3, 300])
+    p.add_argument("--ticks", type=int, default=2000)
+    p.add_argument("--window", type=int, default=500)
+    p.set_defaults(func=bench_indicators)
+
+    args = parser.parse_args(argv)
+    try:
+        args.func(args)
+    finally:
+        app.db.close()
+        shutil.rmtree(_TMP_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
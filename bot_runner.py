@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+🤖 عملية تشغيل البوتات المنفصلة عن الويب
+- كل البوتات تعمل هنا مرة واحدة فقط (قفل ملف يمنع تشغيل runner ثانٍ)
+- عمّال gunicorn يرسلون start / stop عبر Unix socket (سطر JSON لكل أمر)
+- الحالة تُنشر لجدول bot_state في SQLite ويقرؤها الويب مباشرة
+
+الاستخدام:
+    python bot_runner.py &
+    BOT_RUNNER_MODE=remote WEB_THREADS=32 gunicorn -w 4 -k gthread --threads 32 app:app
+
+عامل gthread (أو gevent) مطلوب لـ /api/stream: كل اتصال SSE يحجز thread؛
+مع عامل sync الافتراضي يرد /api/stream بـ 503 والداشبورد يعمل بالـ polling فقط.
+"""
+
+import os
+import sys
+import hmac
+import json
+import signal
+import argparse
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault("BOT_RUNNER_MODE", "runner")
+
+import app  # noqa: E402
+import metrics  # noqa: E402
+
+try:
+    import fcntl
+except ImportError:  # Windows: لا قفل، تشغيل runner واحد مسؤولية المشغّل
+    fcntl = None
+
+
+def handle_command(request: dict) -> dict:
+    if not hmac.compare_digest(str(request.get("token", "")), app.SESSION_SECRET):
+        return {"status": "error", "message": "unauthorized"}
+
+    cmd = request.get("cmd")
+    user_id = request.get("user_id")
+    control = app.bot_control
+    if cmd == "start":
+        return control.start(user_id)
+    if cmd == "stop":
+        return control.stop(user_id)
+    if cmd == "status":
+        return {"status": "success", "data": control.status(user_id)}
+    if cmd == "count":
+        return {"status": "success", "count": control.count()}
+    if cmd == "ping":
+        return {"status": "success", "pid": os.getpid()}
+    return {"status": "error", "message": f"unknown command: {cmd}"}
+
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                reply = handle_command(json.loads(line))
+            except Exception as e:
+                print("BOT RUNNER command error:", e)
+                reply = {"status": "error", "message": str(e)}
+            self.wfile.write(json.dumps(reply, ensure_ascii=False).encode() + b"\n")
+            self.wfile.flush()
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def make_server(address: str):
+    if ":" in address and not address.startswith("/"):
+        host, port = address.rsplit(":", 1)
+        return _TCPServer((host, int(port)), _CommandHandler)
+    if os.path.exists(address):
+        os.unlink(address)  # socket قديم من runner انتهى (القفل يضمن أنه ليس حيًا)
+    old_umask = os.umask(0o077)  # المالك فقط يرسل الأوامر
+    try:
+        return _UnixServer(address, _CommandHandler)
+    finally:
+        os.umask(old_umask)
+
+
+def acquire_lock(address: str):
+    """يرجّع ملف القفل (يجب إبقاؤه مفتوحًا) أو None إذا كان هناك runner آخر"""
+    path = f"{address.replace(':', '_')}.lock"
+    f = open(path, "w")
+    if fcntl is None:
+        return f
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    f.write(str(os.getpid()))
+    f.flush()
+    return f
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", metrics.CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--address", default=app.BOT_RUNNER_ADDRESS, help="مسار Unix socket أو host:port")
+    parser.add_argument("--metrics-port", type=int, default=0, help="منفذ /metrics لعملية البوتات (0 = معطّل)")
+    args = parser.parse_args(argv)
+
+    lock = acquire_lock(args.address)
+    if lock is None:
+        print(f"❌ bot runner يعمل بالفعل على {args.address}")
+        return 1
+
+    server = make_server(args.address)
+    if args.metrics_port:
+        metrics_server = ThreadingHTTPServer(("127.0.0.1", args.metrics_port), _MetricsHandler)
+        threading.Thread(target=metrics_server.serve_forever, name="runner-metrics", daemon=True).start()
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # قبل قبول الأوامر: start لنفس المستخدم لا يسابق الاستئناف
+    app.bot_control.resume_all()
+    print(f"🤖 bot runner pid={os.getpid()} على {args.address}")
+    try:
+        server.serve_forever()
+    finally:
+        app.bot_control.shutdown()
+        server.server_close()
+        if not (":" in args.address and not args.address.startswith("/")):
+            try:
+                os.unlink(args.address)
+            except OSError:
+                pass
+        lock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
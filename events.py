@@ -0,0 +1,121 @@
+"""
+📡 ناقل أحداث داخل العملية + صيغة Server-Sent Events
+- publish(key, event, data): تسلسل JSON مرة واحدة ثم توزيع على مشتركي نفس المستخدم فقط
+- retain: الحالة اللحظية (status / balance) لا تُرسل إذا لم تتغير
+- كل مشترك له طابور محدود: العميل البطيء يفقد الأقدم ويستلم resync بدل نمو الذاكرة
+"""
+
+import json
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+EVENT_QUEUE_MAX = 256  # أحداث معلّقة لكل عميل قبل اعتباره متأخرًا
+
+
+def format_sse(event: str, payload: str) -> str:
+    """payload نص JSON (سطر واحد: json.dumps لا يضيف أسطرًا)"""
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class Subscription:
+    __slots__ = ("key", "_bus", "_queue", "_cond", "_overflow", "closed")
+
+    def __init__(self, bus: "EventBus", key: str, maxlen: int):
+        self.key = key
+        self._bus = bus
+        self._queue: "deque[Tuple[str, str]]" = deque(maxlen=maxlen)
+        self._cond = threading.Condition(threading.Lock())
+        self._overflow = False
+        self.closed = False
+
+    def push(self, event: str, payload: str):
+        with self._cond:
+            if len(self._queue) == self._queue.maxlen:
+                self._overflow = True
+            self._queue.append((event, payload))
+            self._cond.notify()
+
+    def get(self, timeout: float) -> Optional[List[Tuple[str, str]]]:
+        """كل الأحداث المعلّقة دفعة واحدة، أو None بعد timeout (وقت الـ heartbeat)"""
+        with self._cond:
+            if not self._queue and not self.closed:
+                self._cond.wait(timeout)
+            if not self._queue:
+                return None
+            events = list(self._queue)
+            self._queue.clear()
+            if self._overflow:
+                # بعض الأحداث ضاعت: العميل يعيد الجلب من JSON endpoints
+                self._overflow = False
+                events.insert(0, ("resync", "{}"))
+        return events
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+        self._bus._unsubscribe(self)
+
+
+class EventBus:
+    """
+    ✅ أحداث لكل مستخدم (key = user_id):
+    - بدون مشتركين: publish مجرد بحث في dict (مسار البوت لا يتأثر)
+    - آخر قيمة retained تُحفظ فقط ما دام للمستخدم مشترك
+    """
+
+    def __init__(self, queue_max: int = EVENT_QUEUE_MAX):
+        self.queue_max = queue_max
+        self._lock = threading.Lock()
+        self._subs: Dict[str, List[Subscription]] = {}
+        self._retained: Dict[str, Dict[str, str]] = {}
+        self.published = 0
+
+    def subscribe(self, key: str) -> Subscription:
+        sub = Subscription(self, key, self.queue_max)
+        with self._lock:
+            self._subs.setdefault(key, []).append(sub)
+        return sub
+
+    def _unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._subs.get(sub.key)
+            if subs is None or sub not in subs:
+                return
+            subs.remove(sub)
+            if not subs:
+                del self._subs[sub.key]
+                self._retained.pop(sub.key, None)
+
+    def publish(self, key: str, event: str, data, retain: bool = False) -> bool:
+        """يرجّع True إذا وصل الحدث لمشترك واحد على الأقل"""
+        if not self.has(key):
+            return False
+        payload = json.dumps(data, ensure_ascii=False, sort_keys=True, default=str)
+        with self._lock:
+            subs = self._subs.get(key)
+            if not subs:
+                return False
+            if retain:
+                retained = self._retained.setdefault(key, {})
+                if retained.get(event) == payload:
+                    return False
+                retained[event] = payload
+            subs = list(subs)
+            self.published += 1
+        for sub in subs:
+            sub.push(event, payload)
+        return True
+
+    def has(self, key: str) -> bool:
+        """بدون قفل: المنشرون يتخطون تجهيز الحدث إذا لا أحد يستمع"""
+        return key in self._subs
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._subs)
+
+    def count(self) -> int:
+        with self._lock:
+            return sum(len(v) for v in self._subs.values())
@@ -0,0 +1,250 @@
+"""
+📏 فلاتر الرموز من /api/v3/exchangeInfo + تجهيز الأوامر محليًا
+- SymbolFilters: LOT_SIZE / MARKET_LOT_SIZE / PRICE_FILTER / MIN_NOTIONAL / NOTIONAL لرمز واحد
+- تقريب الكمية والسعر بـ Decimal على step/tick بدون أخطاء float
+- ExchangeInfoCache: كاش مشترك لكل الشبكة مع تحديث في الخلفية عند انتهاء TTL
+- الأمر المرفوض محليًا لا يكلّف طلبًا ولا request weight
+"""
+
+import time
+import threading
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+from typing import Callable, Dict, Iterable, List, Optional
+
+EXCHANGE_INFO_TTL = 60 * 60  # الفلاتر نادرًا ما تتغير؛ تحديث كل ساعة في الخلفية
+EXCHANGE_INFO_RETRY = 60  # بعد فشل الجلب لا نعيد المحاولة لنفس الرمز قبل هذه المدة
+
+ZERO = Decimal(0)
+
+
+class OrderRejected(Exception):
+    """أمر لا يطابق فلاتر الرمز (يُرفض قبل الإرسال)"""
+
+
+def to_decimal(value) -> Decimal:
+    # str() أولًا: Decimal(0.1) يحمل كل خطأ الـ float
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def quantize_down(value: Decimal, step: Decimal) -> Decimal:
+    """أكبر مضاعف لـ step لا يتجاوز value"""
+    if step <= 0:
+        return value
+    return (value / step).to_integral_value(rounding=ROUND_DOWN) * step
+
+
+def quantize_nearest(value: Decimal, step: Decimal) -> Decimal:
+    if step <= 0:
+        return value
+    return (value / step).to_integral_value(rounding=ROUND_HALF_UP) * step
+
+
+def format_decimal(value: Decimal) -> str:
+    """بدون exponent وبدون أصفار زائدة (1E-5 → 0.00001)"""
+    text = format(value, "f")
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return text or "0"
+
+
+class SymbolFilters:
+    def __init__(self, info: Dict):
+        self.symbol = info["symbol"]
+        self.status = info.get("status", "TRADING")
+        self.base_asset = info.get("baseAsset")
+        self.quote_asset = info.get("quoteAsset")
+        self.order_types = set(info.get("orderTypes") or [])
+
+        f = {flt["filterType"]: flt for flt in info.get("filters", [])}
+        lot = f.get("LOT_SIZE", {})
+        self.step_size = to_decimal(lot.get("stepSize", "0"))
+        self.min_qty = to_decimal(lot.get("minQty", "0"))
+        self.max_qty = to_decimal(lot.get("maxQty", "0"))
+
+        # أوامر MARKET لها حدودها الخاصة (0 = غير محددة → نستخدم LOT_SIZE)
+        market_lot = f.get("MARKET_LOT_SIZE", {})
+        self.market_step_size = to_decimal(market_lot.get("stepSize", "0")) or self.step_size
+        self.market_min_qty = to_decimal(market_lot.get("minQty", "0")) or self.min_qty
+        self.market_max_qty = to_decimal(market_lot.get("maxQty", "0")) or self.max_qty
+
+        price = f.get("PRICE_FILTER", {})
+        self.tick_size = to_decimal(price.get("tickSize", "0"))
+        self.min_price = to_decimal(price.get("minPrice", "0"))
+        self.max_price = to_decimal(price.get("maxPrice", "0"))
+
+        # MIN_NOTIONAL القديم أو NOTIONAL الأحدث
+        notional = f.get("NOTIONAL") or f.get("MIN_NOTIONAL") or {}
+        self.min_notional = to_decimal(notional.get("minNotional", "0"))
+        self.max_notional = to_decimal(notional.get("maxNotional", "0"))
+        self.notional_applies_to_market = bool(notional.get("applyMinToMarket", notional.get("applyToMarket", True)))
+
+    def round_quantity(self, quantity, market: bool = True) -> Decimal:
+        step = self.market_step_size if market else self.step_size
+        return quantize_down(to_decimal(quantity), step)
+
+    def round_price(self, price) -> Decimal:
+        return quantize_nearest(to_decimal(price), self.tick_size)
+
+    def validate(self, side: str, order_type: str, quantity: Decimal, price: Optional[Decimal], ref_price: Optional[Decimal]):
+        """يرمي OrderRejected بنفس أسماء فلاتر Binance"""
+        if self.status != "TRADING":
+            raise OrderRejected(f"{self.symbol} is not trading ({self.status})")
+        if self.order_types and order_type not in self.order_types:
+            raise OrderRejected(f"{self.symbol} does not support {order_type} orders")
+
+        market = order_type == "MARKET"
+        min_qty = self.market_min_qty if market else self.min_qty
+        max_qty = self.market_max_qty if market else self.max_qty
+        if quantity <= ZERO or quantity < min_qty:
+            raise OrderRejected(f"LOT_SIZE: quantity {format_decimal(quantity)} < minQty {format_decimal(min_qty)}")
+        if max_qty > ZERO and quantity > max_qty:
+            raise OrderRejected(f"LOT_SIZE: quantity {format_decimal(quantity)} > maxQty {format_decimal(max_qty)}")
+
+        if price is not None:
+            if self.min_price > ZERO and price < self.min_price:
+                raise OrderRejected(f"PRICE_FILTER: price {format_decimal(price)} < minPrice {format_decimal(self.min_price)}")
+            if self.max_price > ZERO and price > self.max_price:
+                raise OrderRejected(f"PRICE_FILTER: price {format_decimal(price)} > maxPrice {format_decimal(self.max_price)}")
+
+        # لأوامر MARKET نقدّر القيمة من آخر سعر معروف
+        notional_price = price if price is not None else ref_price
+        if notional_price is not None and (not market or self.notional_applies_to_market):
+            notional = quantity * notional_price
+            if notional < self.min_notional:
+                raise OrderRejected(f"NOTIONAL: {format_decimal(notional)} < minNotional {format_decimal(self.min_notional)}")
+            if self.max_notional > ZERO and notional > self.max_notional:
+                raise OrderRejected(f"NOTIONAL: {format_decimal(notional)} > maxNotional {format_decimal(self.max_notional)}")
+
+
+class PreparedOrder:
+    """أمر جاهز للإرسال: query ثابت، ويُضاف عند الإرسال timestamp و signature فقط"""
+
+    __slots__ = ("symbol", "side", "order_type", "quantity", "price", "query", "validated")
+
+    def __init__(self, symbol: str, side: str, order_type: str, quantity: Decimal, price: Optional[Decimal], query: str, validated: bool):
+        self.symbol = symbol
+        self.side = side
+        self.order_type = order_type
+        self.quantity = quantity
+        self.price = price
+        self.query = query
+        self.validated = validated
+
+
+def prepare_order(
+    filters: Optional[SymbolFilters],
+    symbol: str,
+    side: str,
+    quantity,
+    order_type: str = "MARKET",
+    price=None,
+    ref_price=None,
+    recv_window: int = 60000,
+) -> PreparedOrder:
+    """
+    تقريب + تحقق + بناء query مسبقًا.
+    بدون filters (exchangeInfo غير متاح) نرسل الكمية كما هي ونترك التحقق لـ Binance.
+    """
+    symbol = symbol.upper()
+    side = side.upper()
+    order_type = order_type.upper()
+
+    qty = to_decimal(quantity)
+    px = to_decimal(price) if price is not None else None
+    if filters is not None:
+        qty = filters.round_quantity(qty, market=order_type == "MARKET")
+        if px is not None:
+            px = filters.round_price(px)
+        filters.validate(side, order_type, qty, px, to_decimal(ref_price) if ref_price is not None else None)
+
+    parts = [f"symbol={symbol}", f"side={side}", f"type={order_type}", f"quantity={format_decimal(qty)}"]
+    if px is not None:
+        parts += ["timeInForce=GTC", f"price={format_decimal(px)}"]
+    parts.append(f"recvWindow={recv_window}")
+    return PreparedOrder(symbol, side, order_type, qty, px, "&".join(parts), filters is not None)
+
+
+class ExchangeInfoCache:
+    """
+    ✅ فلاتر الرموز لشبكة واحدة:
+    - fetch(symbols) يرجّع رد exchangeInfo (dict) أو None عند الفشل
+    - get() يجلب الرمز الناقص مرة واحدة، ويحدّث كل الرموز المعروفة في الخلفية بعد TTL
+    """
+
+    def __init__(self, fetch: Callable[[List[str]], Optional[Dict]], ttl: float = EXCHANGE_INFO_TTL):
+        self.fetch = fetch
+        self.ttl = ttl
+        self._filters: Dict[str, SymbolFilters] = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._refreshing = False
+        self._failed_at: Dict[str, float] = {}
+        self.fetches = 0
+
+    def _load(self, symbols: Iterable[str]) -> bool:
+        symbols = sorted({s.upper() for s in symbols})
+        if not symbols:
+            return False
+        info = self.fetch(symbols)
+        self.fetches += 1
+        if not info or "symbols" not in info:
+            now = time.monotonic()
+            for s in symbols:
+                self._failed_at[s] = now
+            return False
+        parsed = {}
+        for entry in info["symbols"]:
+            try:
+                parsed[entry["symbol"]] = SymbolFilters(entry)
+            except Exception as e:
+                print("EXCHANGE INFO parse error:", entry.get("symbol"), e)
+        with self._lock:
+            self._filters = {**self._filters, **parsed}
+            self._loaded_at = time.monotonic()
+        return True
+
+    def warm(self, symbols: Iterable[str]):
+        symbols = [s.upper() for s in symbols]
+        if all(s in self._filters for s in symbols):
+            return
+        # single-flight: بوتات تبدأ معًا ترسل طلب exchangeInfo واحدًا
+        with self._fetch_lock:
+            missing = [s for s in symbols if s not in self._filters]
+            if missing:
+                self._load(missing)
+
+    def get(self, symbol: str) -> Optional[SymbolFilters]:
+        symbol = symbol.upper()
+        filters = self._filters.get(symbol)
+        if filters is None:
+            if time.monotonic() - self._failed_at.get(symbol, -EXCHANGE_INFO_RETRY) < EXCHANGE_INFO_RETRY:
+                return None
+            self.warm([symbol])
+            return self._filters.get(symbol)
+        if time.monotonic() - self._loaded_at > self.ttl:
+            self.refresh_async()
+        return filters
+
+    def refresh_async(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name="exchange-info-refresh", daemon=True).start()
+
+    def _refresh(self):
+        try:
+            self._load(list(self._filters))
+        except Exception as e:
+            print("EXCHANGE INFO refresh ERROR:", e)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def stats(self) -> Dict:
+        return {
+            "symbols": len(self._filters),
+            "age_s": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at else None,
+            "fetches": self.fetches,
+        }
@@ -0,0 +1,300 @@
+"""
+📈 محرك مؤشرات تدريجي (NumPy) لكل الرموز دفعة واحدة
+- EMA / RSI / MACD / ATR / Bollinger
+- كل شمعة جديدة = تحديث O(1) لكل رمز بدل إعادة الحساب على كامل النافذة
+- كل الرموز تُحدَّث في تمريرة واحدة (مصفوفات بطول عدد الرموز)
+- confidence_scores: تحويل المؤشرات إلى ثقة 0..100 واتجاه (+1 شراء / -1 بيع)
+- compute_series: نفس القيم لسلسلة زمنية كاملة دفعة واحدة (للـ backtest)
+"""
+
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+EMA_FAST = 12
+EMA_SLOW = 26
+MACD_SIGNAL = 9
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+BB_PERIOD = 20
+BB_STD = 2.0
+STOP_ATR_MULT = 2.0  # وقف الخسارة المفترض لحساب حجم الصفقة
+
+# أوزان مكوّنات الثقة
+WEIGHTS = {"trend": 0.35, "macd": 0.25, "rsi": 0.2, "bb": 0.2}
+
+
+class IndicatorEngine:
+    """
+    حالة المؤشرات لكل رمز في مصفوفات NumPy.
+    update() يستقبل شمعة واحدة لكل رمز (high/low/close) و mask للرموز التي وصلتها شمعة جديدة.
+    """
+
+    def __init__(self, symbols: Sequence[str]):
+        self.symbols = list(symbols)
+        n = len(self.symbols)
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+
+        self.count = np.zeros(n, dtype=np.int64)
+        self.close = np.zeros(n)
+        self.ema_fast = np.zeros(n)
+        self.ema_slow = np.zeros(n)
+        self.macd_signal = np.zeros(n)
+        self.avg_gain = np.zeros(n)
+        self.avg_loss = np.zeros(n)
+        self.atr = np.zeros(n)
+
+        # نافذة Bollinger الدائرية مع مجموع ومجموع مربعات متحركين
+        self._bb_window = np.zeros((n, BB_PERIOD))
+        self._bb_pos = np.zeros(n, dtype=np.int64)
+        self._bb_sum = np.zeros(n)
+        self._bb_sumsq = np.zeros(n)
+
+        self._rows = np.arange(n)
+
+    def reset(self, mask: Optional[np.ndarray] = None):
+        """تصفير حالة رموز معيّنة (مثلًا بعد إعادة تعبئة الشموع)"""
+        mask = np.ones(len(self.symbols), dtype=bool) if mask is None else mask
+        for arr in (
+            self.count, self.close, self.ema_fast, self.ema_slow, self.macd_signal,
+            self.avg_gain, self.avg_loss, self.atr, self._bb_pos, self._bb_sum, self._bb_sumsq,
+        ):
+            arr[mask] = 0
+        self._bb_window[mask] = 0.0
+
+    @staticmethod
+    def _ema(prev: np.ndarray, value: np.ndarray, period: int, first: np.ndarray) -> np.ndarray:
+        alpha = 2.0 / (period + 1)
+        return np.where(first, value, prev + alpha * (value - prev))
+
+    @staticmethod
+    def _wilder(prev: np.ndarray, value: np.ndarray, period: int, count: np.ndarray) -> np.ndarray:
+        # متوسط بسيط حتى اكتمال الفترة ثم تنعيم Wilder
+        n = np.minimum(count, period).astype(np.float64)
+        n = np.maximum(n, 1.0)
+        return prev + (value - prev) / n
+
+    def update(self, high: np.ndarray, low: np.ndarray, close: np.ndarray, mask: Optional[np.ndarray] = None):
+        n = len(self.symbols)
+        mask = np.ones(n, dtype=bool) if mask is None else mask
+        first = self.count == 0
+        prev_close = np.where(first, close, self.close)
+        count = self.count + 1
+
+        ema_fast = self._ema(self.ema_fast, close, EMA_FAST, first)
+        ema_slow = self._ema(self.ema_slow, close, EMA_SLOW, first)
+        macd = ema_fast - ema_slow
+        macd_signal = self._ema(self.macd_signal, macd, MACD_SIGNAL, first)
+
+        # RSI (Wilder) — التغيير الأول يبدأ من الشمعة الثانية
+        diff = close - prev_close
+        diff_count = np.maximum(count - 1, 1)
+        avg_gain = np.where(first, 0.0, self._wilder(self.avg_gain, np.maximum(diff, 0.0), RSI_PERIOD, diff_count))
+        avg_loss = np.where(first, 0.0, self._wilder(self.avg_loss, np.maximum(-diff, 0.0), RSI_PERIOD, diff_count))
+
+        tr = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+        atr = self._wilder(self.atr, tr, ATR_PERIOD, count)
+
+        # تحديث الحالة للرموز المعنية فقط
+        self.ema_fast = np.where(mask, ema_fast, self.ema_fast)
+        self.ema_slow = np.where(mask, ema_slow, self.ema_slow)
+        self.macd_signal = np.where(mask, macd_signal, self.macd_signal)
+        self.avg_gain = np.where(mask, avg_gain, self.avg_gain)
+        self.avg_loss = np.where(mask, avg_loss, self.avg_loss)
+        self.atr = np.where(mask, atr, self.atr)
+        self.close = np.where(mask, close, self.close)
+        self.count = np.where(mask, count, self.count)
+
+        rows = self._rows[mask]
+        pos = self._bb_pos[rows]
+        outgoing = self._bb_window[rows, pos]
+        incoming = close[rows]
+        self._bb_window[rows, pos] = incoming
+        self._bb_sum[rows] += incoming - outgoing
+        self._bb_sumsq[rows] += incoming * incoming - outgoing * outgoing
+        self._bb_pos[rows] = (pos + 1) % BB_PERIOD
+
+    def warmup(self, symbol: str, ohlcv: np.ndarray):
+        """تغذية تاريخ رمز واحد (شمعة شمعة) — مرة واحدة عند البداية"""
+        mask = np.zeros(len(self.symbols), dtype=bool)
+        mask[self.index[symbol]] = True
+        high = np.zeros(len(self.symbols))
+        low = np.zeros(len(self.symbols))
+        close = np.zeros(len(self.symbols))
+        i = self.index[symbol]
+        for row in ohlcv:
+            high[i], low[i], close[i] = row[1], row[2], row[3]
+            self.update(high, low, close, mask)
+
+    def values(self) -> Dict[str, np.ndarray]:
+        window = np.minimum(self.count, BB_PERIOD).astype(np.float64)
+        safe_window = np.maximum(window, 1.0)
+        bb_mid = self._bb_sum / safe_window
+        bb_var = np.maximum(self._bb_sumsq / safe_window - bb_mid * bb_mid, 0.0)
+        bb_std = np.sqrt(bb_var)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rs = np.where(self.avg_loss > 0, self.avg_gain / self.avg_loss, np.inf)
+        rsi = np.where(self.avg_loss > 0, 100.0 - 100.0 / (1.0 + rs), np.where(self.avg_gain > 0, 100.0, 50.0))
+
+        macd = self.ema_fast - self.ema_slow
+        return {
+            "close": self.close,
+            "ema_fast": self.ema_fast,
+            "ema_slow": self.ema_slow,
+            "macd": macd,
+            "macd_signal": self.macd_signal,
+            "macd_hist": macd - self.macd_signal,
+            "rsi": rsi,
+            "atr": self.atr,
+            "bb_mid": bb_mid,
+            "bb_upper": bb_mid + BB_STD * bb_std,
+            "bb_lower": bb_mid - BB_STD * bb_std,
+            "ready": self.count >= EMA_SLOW,
+        }
+
+    def signals(self):
+        """(confidence 0..100, direction +1/-1/0) لكل رمز"""
+        return confidence_scores(self.values())
+
+
+# ==================== SERIES (OFFLINE) ====================
+SCAN_CHUNK = 128  # طول الكتلة في المسح المتجه (يحافظ على الدقة في قوى التنعيم)
+
+
+def _smooth_scan(x: np.ndarray, alpha: float, init: np.ndarray) -> np.ndarray:
+    """
+    y_t = y_{t-1} + alpha × (x_t - y_{t-1}) على محور الزمن (axis 0) لكل الأعمدة،
+    مسح على كتل: داخل الكتلة cumsum متجه، والحالة تنتقل بين الكتل.
+    """
+    out = np.empty_like(x, dtype=np.float64)
+    decay = 1.0 - alpha
+    j = np.arange(SCAN_CHUNK, dtype=np.float64)
+    pow_j = decay ** j
+    pow_next = decay ** (j + 1)
+    pow_inv = decay ** -j
+    state = np.asarray(init, dtype=np.float64)
+    for s in range(0, len(x), SCAN_CHUNK):
+        xc = x[s:s + SCAN_CHUNK]
+        n = len(xc)
+        acc = np.cumsum(alpha * xc * pow_inv[:n, None], axis=0)
+        out[s:s + n] = pow_j[:n, None] * acc + pow_next[:n, None] * state
+        state = out[s + n - 1]
+    return out
+
+
+def _wilder_series(x: np.ndarray, period: int) -> np.ndarray:
+    """نفس IndicatorEngine._wilder: متوسط تراكمي حتى اكتمال الفترة ثم تنعيم Wilder"""
+    out = np.empty_like(x, dtype=np.float64)
+    head = min(period, len(x))
+    out[:head] = np.cumsum(x[:head], axis=0) / np.arange(1, head + 1)[:, None]
+    if len(x) > head:
+        out[head:] = _smooth_scan(x[head:], 1.0 / period, out[head - 1])
+    return out
+
+
+def _ema_series(x: np.ndarray, period: int) -> np.ndarray:
+    return _smooth_scan(x, 2.0 / (period + 1), x[0])
+
+
+def _rolling_mean(x: np.ndarray, period: int) -> np.ndarray:
+    csum = np.cumsum(x, axis=0)
+    out = csum.copy()
+    out[period:] -= csum[:-period]
+    window = np.minimum(np.arange(1, len(x) + 1), period)[:, None]
+    return out / window
+
+
+def compute_series(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    نفس مخرجات IndicatorEngine.values() لكن لكل الشموع دفعة واحدة.
+    المدخلات مصفوفات (زمن × رموز).
+    """
+    high, low, close = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+    if close.ndim == 1:
+        high, low, close = high[:, None], low[:, None], close[:, None]
+
+    ema_fast = _ema_series(close, EMA_FAST)
+    ema_slow = _ema_series(close, EMA_SLOW)
+    macd = ema_fast - ema_slow
+    macd_signal = _ema_series(macd, MACD_SIGNAL)
+
+    prev_close = np.vstack([close[:1], close[:-1]])
+    diff = close - prev_close
+    avg_gain = np.zeros_like(close)
+    avg_loss = np.zeros_like(close)
+    if len(close) > 1:
+        avg_gain[1:] = _wilder_series(np.maximum(diff[1:], 0.0), RSI_PERIOD)
+        avg_loss[1:] = _wilder_series(np.maximum(-diff[1:], 0.0), RSI_PERIOD)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = np.where(avg_loss > 0, avg_gain / avg_loss, np.inf)
+    rsi = np.where(avg_loss > 0, 100.0 - 100.0 / (1.0 + rs), np.where(avg_gain > 0, 100.0, 50.0))
+
+    tr = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+    atr = _wilder_series(tr, ATR_PERIOD)
+
+    bb_mid = _rolling_mean(close, BB_PERIOD)
+    bb_std = np.sqrt(np.maximum(_rolling_mean(close * close, BB_PERIOD) - bb_mid * bb_mid, 0.0))
+
+    ready = np.broadcast_to((np.arange(len(close)) >= EMA_SLOW - 1)[:, None], close.shape)
+    return {
+        "close": close,
+        "ema_fast": ema_fast,
+        "ema_slow": ema_slow,
+        "macd": macd,
+        "macd_signal": macd_signal,
+        "macd_hist": macd - macd_signal,
+        "rsi": rsi,
+        "atr": atr,
+        "bb_mid": bb_mid,
+        "bb_upper": bb_mid + BB_STD * bb_std,
+        "bb_lower": bb_mid - BB_STD * bb_std,
+        "ready": ready,
+    }
+
+
+def confidence_scores(v: Dict[str, np.ndarray]):
+    """
+    دمج المؤشرات في درجة ثقة واحدة:
+    - trend: EMA السريع مقابل البطيء (مُطبّع بـ ATR)
+    - macd: هيستوغرام MACD (مُطبّع بـ ATR)
+    - rsi: زخم حول 50
+    - bb: موقع السعر داخل نطاق Bollinger
+    """
+    atr = np.where(v["atr"] > 0, v["atr"], np.nan)
+    band = (v["bb_upper"] - v["bb_lower"]) / 2
+    band = np.where(band > 0, band, np.nan)
+
+    trend = np.tanh((v["ema_fast"] - v["ema_slow"]) / atr)
+    macd = np.tanh(v["macd_hist"] / (0.25 * atr))
+    rsi = np.clip((v["rsi"] - 50.0) / 25.0, -1.0, 1.0)
+    bb = np.clip((v["close"] - v["bb_mid"]) / band, -1.0, 1.0)
+
+    raw = WEIGHTS["trend"] * trend + WEIGHTS["macd"] * macd + WEIGHTS["rsi"] * rsi + WEIGHTS["bb"] * bb
+    raw = np.where(v["ready"], np.nan_to_num(raw), 0.0)
+    return np.abs(raw) * 100.0, np.sign(raw).astype(np.int64)
+
+
+def position_size(balance, risk_per_trade, price, atr, stop_atr: float = STOP_ATR_MULT, available=None):
+    """
+    حجم الصفقة: خسارة وقف (stop_atr × ATR) = balance × risk_per_trade
+    ولا تتجاوز قيمة الصفقة الرصيد المتاح. يعمل على أرقام أو مصفوفات.
+    available: رصيد العملة المقابلة القابل للإنفاق إذا كان balance قيمة المحفظة كاملة
+    """
+    if available is None:
+        available = balance
+    price = np.asarray(price, dtype=np.float64)
+    stop = np.asarray(atr, dtype=np.float64) * stop_atr
+    with np.errstate(divide="ignore", invalid="ignore"):
+        qty = np.where(stop > 0, balance * risk_per_trade / stop, 0.0)
+        max_qty = np.where(price > 0, available / price, 0.0)
+    qty = np.minimum(qty, max_qty)
+    return float(qty) if qty.ndim == 0 else qty
+
+
+def entry_size(equity, free_quote, risk_per_trade, price, atr, stop_atr: float = STOP_ATR_MULT):
+    """
+    حجم دخول البوت والـ backtest معًا: المخاطرة من قيمة المحفظة كاملة (لا تقل عن الرصيد الحر)
+    والشراء محدود بالعملة المقابلة الحرة
+    """
+    return position_size(max(equity, free_quote), risk_per_trade, price, atr, stop_atr, available=free_quote)
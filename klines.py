@@ -0,0 +1,192 @@
+"""
+🕯️ مخزن شموع محلي (OHLCV) بذاكرة ثابتة الحجم
+- ring buffer من NumPy لكل (symbol, interval) ومشترك بين كل البوتات
+- جلب تدريجي: فقط الشموع المغلقة الأحدث من آخر شمعة محفوظة
+- تعبئة أولية (backfill) وسد الفجوات عبر صفحات startTime
+"""
+
+import time
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+INTERVAL_MS = {
+    "1m": 60_000,
+    "3m": 3 * 60_000,
+    "5m": 5 * 60_000,
+    "15m": 15 * 60_000,
+    "30m": 30 * 60_000,
+    "1h": 60 * 60_000,
+    "2h": 2 * 60 * 60_000,
+    "4h": 4 * 60 * 60_000,
+    "6h": 6 * 60 * 60_000,
+    "8h": 8 * 60 * 60_000,
+    "12h": 12 * 60 * 60_000,
+    "1d": 24 * 60 * 60_000,
+    "3d": 3 * 24 * 60 * 60_000,
+    "1w": 7 * 24 * 60 * 60_000,
+}
+
+KLINE_BUFFER_SIZE = 500  # عدد الشموع المحفوظة لكل (symbol, interval)
+KLINE_PAGE_LIMIT = 1000  # أقصى limit يقبله Binance في /klines
+
+# أعمدة الـ buffer (open_time منفصل كـ int64)
+OPEN, HIGH, LOW, CLOSE, VOLUME = range(5)
+
+
+class KlineBuffer:
+    """ring buffer ثابت الحجم لشموع مغلقة فقط"""
+
+    def __init__(self, capacity: int = KLINE_BUFFER_SIZE):
+        self.capacity = capacity
+        self.open_time = np.zeros(capacity, dtype=np.int64)
+        self.ohlcv = np.zeros((capacity, 5), dtype=np.float64)
+        self._head = 0  # مكان الكتابة التالي
+        self._size = 0
+        self.version = 0  # عدد الشموع المضافة منذ البداية (للمؤشرات التدريجية)
+        self.gaps = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def last_open_time(self) -> Optional[int]:
+        if not self._size:
+            return None
+        return int(self.open_time[(self._head - 1) % self.capacity])
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
+
+    def append(self, open_time: int, o: float, h: float, l: float, c: float, v: float):
+        i = self._head
+        self.open_time[i] = open_time
+        self.ohlcv[i] = (o, h, l, c, v)
+        self._head = (i + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        self.version += 1
+
+    def extend_raw(self, rows: List[List]) -> int:
+        """إضافة شموع بصيغة Binance الخام (قوائم نصوص) دفعة واحدة"""
+        if not rows:
+            return 0
+        if len(rows) > self.capacity:
+            rows = rows[-self.capacity:]
+        n = len(rows)
+        times = np.fromiter((r[0] for r in rows), dtype=np.int64, count=n)
+        values = np.array([r[1:6] for r in rows], dtype=np.float64)
+
+        idx = (self._head + np.arange(n)) % self.capacity
+        self.open_time[idx] = times
+        self.ohlcv[idx] = values
+        self._head = (self._head + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+        self.version += n
+        return n
+
+    def _order(self) -> np.ndarray:
+        start = (self._head - self._size) % self.capacity
+        return (start + np.arange(self._size)) % self.capacity
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(open_time, ohlcv) مرتبة من الأقدم للأحدث (نسخ)"""
+        idx = self._order()
+        return self.open_time[idx], self.ohlcv[idx]
+
+    def closes(self) -> np.ndarray:
+        return self.ohlcv[self._order(), CLOSE]
+
+    def tail(self, n: int) -> np.ndarray:
+        """آخر n شموع OHLCV (الأقدم أولًا)"""
+        n = min(n, self._size)
+        idx = (self._head - n + np.arange(n)) % self.capacity
+        return self.ohlcv[idx]
+
+
+class KlineStore:
+    """
+    ✅ مخزن مشترك لكل العمليات (process-wide):
+    - نفس الـ buffer لكل البوتات التي تراقب نفس السوق
+    - update() يجلب فقط الجديد، ويعيد التعبئة من الصفر إذا كانت الفجوة أكبر من السعة
+    """
+
+    def __init__(self, capacity: int = KLINE_BUFFER_SIZE):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._buffers: Dict[Tuple[str, str], KlineBuffer] = {}
+
+    def get(self, symbol: str, interval: str) -> KlineBuffer:
+        key = (symbol.upper(), interval)
+        with self._lock:
+            buf = self._buffers.get(key)
+            if buf is None:
+                buf = self._buffers[key] = KlineBuffer(self.capacity)
+            return buf
+
+    def update(self, symbol: str, interval: str, client, now_ms: Optional[Callable[[], int]] = None) -> int:
+        """
+        يجلب الشموع المغلقة الجديدة عبر client.get_klines ويرجّع عددها.
+        client: أي كائن يملك get_klines(symbol, interval, limit, start_time)
+        """
+        step = INTERVAL_MS[interval]
+        now = now_ms() if now_ms else int(time.time() * 1000)
+        buf = self.get(symbol, interval)
+
+        # قفل لكل buffer: بوت واحد يجلب والباقي ينتظر ثم يقرأ النتيجة
+        with buf.lock:
+            last = buf.last_open_time
+            # آخر شمعة مغلقة متوقعة
+            last_closed = (now // step) * step - step
+            if last is not None and last >= last_closed:
+                return 0
+
+            if last is None or (last_closed - last) // step > self.capacity:
+                buf.clear()
+                start = last_closed - (self.capacity - 1) * step
+            else:
+                start = last + step
+
+            added = 0
+            while start <= last_closed:
+                rows = client.get_klines(symbol, interval, limit=KLINE_PAGE_LIMIT, start_time=start)
+                if not rows:
+                    break
+                # نحتفظ بالمغلقة فقط (close_time < now) وبالأحدث من آخر شمعة
+                fresh = [r for r in rows if int(r[0]) >= start and int(r[6]) < now]
+                if not fresh:
+                    break
+                if int(fresh[0][0]) != start and buf.last_open_time is not None:
+                    buf.gaps += 1
+                added += buf.extend_raw(fresh)
+                start = int(fresh[-1][0]) + step
+                if len(rows) < KLINE_PAGE_LIMIT:
+                    break
+            return added
+
+    def apply_closed(self, symbol: str, interval: str, open_time: int, o: float, h: float, l: float, c: float, v: float) -> bool:
+        """
+        إضافة شمعة مغلقة قادمة من الـ stream.
+        يرجّع False عند فجوة (يجب سدها عبر update من REST).
+        """
+        buf = self.get(symbol, interval)
+        with buf.lock:
+            last = buf.last_open_time
+            if last is None:
+                return False  # لم يُعبّأ بعد: التعبئة الأولية من REST
+            if open_time <= last:
+                return True  # مكررة
+            if open_time != last + INTERVAL_MS[interval]:
+                buf.gaps += 1
+                return False
+            buf.append(open_time, o, h, l, c, v)
+            return True
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                f"{s}:{i}": {"candles": len(b), "last_open_time": b.last_open_time, "gaps": b.gaps}
+                for (s, i), b in self._buffers.items()
+            }
@@ -0,0 +1,280 @@
+"""
+📊 مقاييس بصيغة Prometheus النصية بدون مكتبات خارجية
+- Counter / Histogram: عدّادات لكل thread (بدون قفل في المسار الساخن) تُجمع عند القراءة فقط
+- Gauge: قيمة محددة أو دالة تُحسب وقت الـ scrape (active_bots / lag / offset ...)
+- render() يرجّع نص /metrics لكل المقاييس المسجّلة
+"""
+
+import math
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# ثوانٍ: من 1ms (طلبات محلية) حتى 10s (timeouts)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Shards:
+    """
+    قيم مقسّمة لكل thread: كل thread يكتب في قائمته فقط (آمن تحت الـ GIL بدون قفل).
+    قوائم الـ threads المنتهية تُدمج في base عند القراءة وعند تسجيل thread جديد
+    (إذا تجاوز العدد ضعف الـ threads الحية) حتى لا تنمو الذاكرة مع threads الطلبات
+    قصيرة العمر في Flask حتى بدون أي scrape.
+    """
+
+    __slots__ = ("size", "_local", "_shards", "_base", "_lock")
+
+    def __init__(self, size: int):
+        self.size = size
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, List[float]]] = []
+        self._base = [0.0] * size
+        self._lock = threading.Lock()
+
+    def values(self) -> List[float]:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = [0.0] * self.size
+            with self._lock:
+                if len(self._shards) > 2 * threading.active_count() + 16:
+                    self._fold_dead()
+                self._shards.append((threading.current_thread(), values))
+            return values
+
+    def _fold_dead(self):
+        """تحت _lock: thread منتهٍ لن يكتب ثانية، فقيمه تُضاف إلى base وتُحذف قائمته"""
+        alive = []
+        for thread, values in self._shards:
+            if thread.is_alive():
+                alive.append((thread, values))
+            else:
+                for i, v in enumerate(values):
+                    self._base[i] += v
+        self._shards = alive
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            self._fold_dead()
+            totals = list(self._base)
+            for _, values in self._shards:
+                for i, v in enumerate(values):
+                    totals[i] += v
+        return totals
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    if v == int(v) and abs(v) < 1e15:
+        return str(int(v))
+    return repr(float(v))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), registry: Optional["Registry"] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple, object] = {}
+        self._aliases: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+        # مقياس بدون labels يظهر بصفر من البداية
+        self._default = self.labels() if not self.labelnames else None
+        (registry or REGISTRY).register(self)
+
+    def labels(self, *values):
+        # المسار الساخن: قاموس واحد بالقيم كما هي (int مثل status code مسموح)
+        child = self._aliases.get(values)
+        if child is not None:
+            return child
+        key = tuple(str(v) for v in values)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+            self._aliases[values] = child
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += self._samples()
+        return "\n".join(lines)
+
+
+# ==================== COUNTER ====================
+class _CounterChild:
+    __slots__ = ("_shards",)
+
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount: float = 1.0):
+        self._shards.values()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self._shards.totals()[0]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def _samples(self):
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in list(self._children.items())
+        ]
+
+
+# ==================== GAUGE ====================
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = float(value)
+
+
+class Gauge(_Metric):
+    """
+    قيمة لحظية. fn (اختياري) تُستدعى وقت الـ scrape وترجّع رقمًا،
+    أو dict {(label values...): رقم} للمقاييس ذات labels.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), fn: Optional[Callable] = None, registry=None):
+        self.fn = fn
+        super().__init__(name, help, labelnames, registry)
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def _samples(self):
+        if self.fn is None:
+            items = [(key, child.value) for key, child in list(self._children.items())]
+        else:
+            try:
+                result = self.fn()
+            except Exception as e:
+                print(f"METRICS gauge {self.name} ERROR:", e)
+                return []
+            if isinstance(result, dict):
+                items = [(key if isinstance(key, tuple) else (key,), v) for key, v in result.items()]
+            else:
+                items = [((), result)]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(float(v))}"
+            for key, v in items
+            if v is not None
+        ]
+
+
+# ==================== HISTOGRAM ====================
+class _HistogramChild:
+    __slots__ = ("buckets", "_shards")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # [عدّ لكل bucket..., +Inf, sum]
+        self._shards = _Shards(len(buckets) + 2)
+
+    def observe(self, value: float):
+        values = self._shards.values()
+        values[bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def snapshot(self) -> Tuple[List[float], float, float]:
+        totals = self._shards.totals()
+        counts = totals[:-1]
+        cumulative, running = [], 0.0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return cumulative, totals[-1], running
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def _samples(self):
+        lines = []
+        for key, child in list(self._children.items()):
+            cumulative, total, count = child.snapshot()
+            for bound, c in zip(self.buckets + (math.inf,), cumulative):
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(c)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {_format_value(count)}")
+        return lines
+
+
+# ==================== REGISTRY ====================
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._names = set()
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._names:
+                raise ValueError(f"metric already registered: {metric.name}")
+            self._names.add(metric.name)
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,586 @@
+#!/usr/bin/env python3
+"""
+🧪 بديل محلي لـ Binance للتجارب بدون شبكة
+- MockRestServer: نفس REST endpoints التي يستخدمها app.py
+  (time / account / ticker/price / klines / exchangeInfo / order / userDataStream)
+  مع تأخير وأخطاء (5xx / 429) قابلة للضبط
+- MockWebSocketServer: سيرفر WebSocket (combined streams + user data stream)
+  يسجّل الاشتراكات ويبث أحداث kline / bookTicker / outboundAccountPosition
+
+الاستخدام:
+    python mock_binance.py --rest-port 9080 --ws-port 9443 --latency-ms 20 --error-rate 0.01
+    BINANCE_TESTNET_SPOT=http://127.0.0.1:9080 BINANCE_TESTNET_WS=ws://127.0.0.1:9443 python run.py
+"""
+
+import sys
+import hmac
+import json
+import math
+import time
+import random
+import socket
+import struct
+import hashlib
+import argparse
+import threading
+from collections import defaultdict
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+from streams import OP_CLOSE, OP_CONT, OP_PING, OP_PONG, OP_TEXT, WebSocketClosed, accept_key, encode_frame, read_frame
+
+
+# ==================== EVENTS ====================
+def kline_event(symbol: str, interval: str, open_time: int, o, h, l, c, v, interval_ms: int, closed: bool = True) -> Dict:
+    return {
+        "stream": f"{symbol.lower()}@kline_{interval}",
+        "data": {
+            "e": "kline",
+            "E": int(time.time() * 1000),
+            "s": symbol.upper(),
+            "k": {
+                "t": open_time, "T": open_time + interval_ms - 1, "s": symbol.upper(), "i": interval,
+                "o": str(o), "h": str(h), "l": str(l), "c": str(c), "v": str(v), "x": closed,
+            },
+        },
+    }
+
+
+def book_ticker_event(symbol: str, bid: float, ask: float) -> Dict:
+    return {
+        "stream": f"{symbol.lower()}@bookTicker",
+        "data": {"u": int(time.time() * 1000), "s": symbol.upper(), "b": str(bid), "B": "1", "a": str(ask), "A": "1"},
+    }
+
+
+def account_position_event(balances: Dict[str, float]) -> Dict:
+    return {
+        "e": "outboundAccountPosition",
+        "E": int(time.time() * 1000),
+        "u": int(time.time() * 1000),
+        "B": [{"a": asset, "f": str(free), "l": "0.0"} for asset, free in balances.items()],
+    }
+
+
+# ==================== REST ====================
+# سعر أساسي + فلاتر لكل رمز (قريبة من قيم Binance الفعلية)
+MOCK_SYMBOLS = {
+    "BTCUSDT": {"price": 60000.0, "step": "0.00001", "tick": "0.01"},
+    "ETHUSDT": {"price": 3000.0, "step": "0.0001", "tick": "0.01"},
+    "BNBUSDT": {"price": 600.0, "step": "0.001", "tick": "0.1"},
+    "SOLUSDT": {"price": 150.0, "step": "0.001", "tick": "0.01"},
+    "XRPUSDT": {"price": 0.6, "step": "0.1", "tick": "0.0001"},
+}
+MOCK_MIN_NOTIONAL = Decimal("5")
+MOCK_START_BALANCE = {"USDT": 10000.0}
+MOCK_INTERVAL_MS = {"1m": 60_000, "5m": 300_000, "15m": 900_000, "1h": 3_600_000, "4h": 14_400_000, "1d": 86_400_000}
+
+# أوزان تقريبية مطابقة لـ Binance (لهيدر X-MBX-USED-WEIGHT-1M)
+MOCK_WEIGHTS = {"/api/v3/account": 20, "/api/v3/exchangeInfo": 20, "/api/v3/klines": 2, "/api/v3/userDataStream": 2}
+
+
+def mock_price(symbol: str, ms: int) -> float:
+    """مسار سعر حتمي ومتصل (موجتان) حتى تتطابق الشموع والأسعار بين الطلبات"""
+    base = MOCK_SYMBOLS.get(symbol, {"price": 100.0})["price"]
+    phase = (sum(map(ord, symbol)) % 97) / 97 * 2 * math.pi
+    return base * (1 + 0.03 * math.sin(2 * math.pi * ms / 21_600_000 + phase) + 0.005 * math.sin(2 * math.pi * ms / 1_020_000))
+
+
+def mock_kline(symbol: str, open_time: int, step: int) -> List:
+    o = mock_price(symbol, open_time)
+    c = mock_price(symbol, open_time + step)
+    # نفس الضجيج لنفس الشمعة في كل طلب
+    noise = random.Random(f"{symbol}:{open_time}:{step}").uniform(0.0005, 0.003)
+    h, l = max(o, c) * (1 + noise), min(o, c) * (1 - noise)
+    v = random.Random(f"v:{symbol}:{open_time}").uniform(10, 1000)
+    return [open_time, f"{o:.8f}", f"{h:.8f}", f"{l:.8f}", f"{c:.8f}", f"{v:.8f}", open_time + step - 1, "0", 100, "0", "0", "0"]
+
+
+class _RestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive مثل Binance الحقيقي
+    disable_nagle_algorithm = True  # بدونها: headers و body منفصلان = +40ms (delayed ACK)
+    mock: "MockRestServer" = None
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, payload, status: int = 200, headers: Optional[Dict] = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, str(v))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, code: int, msg: str, headers: Optional[Dict] = None):
+        self._reply({"code": code, "msg": msg}, status, headers)
+
+    def _handle(self):
+        mock = self.mock
+        u = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(u.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            body = self.rfile.read(length).decode()
+            params.update({k: v[0] for k, v in parse_qs(body).items()})
+
+        used = mock._count(self.command, u.path)
+        delay = mock.latency_s + random.uniform(0, mock.jitter_s)
+        if delay:
+            time.sleep(delay)
+
+        weight = {"X-MBX-USED-WEIGHT-1M": used}
+        roll = random.random()
+        if roll < mock.error_rate:
+            mock._record("error_5xx")
+            return self._error(503, -1001, "Internal error; unable to process your request. Please try your request again.")
+        if roll < mock.error_rate + mock.throttle_rate:
+            mock._record("error_429")
+            return self._error(429, -1003, "Too many requests.", {"Retry-After": 1, **weight})
+
+        route = mock.routes.get((self.command, u.path))
+        if route is None:
+            return self._error(404, -1000, f"unknown endpoint {self.command} {u.path}", weight)
+        try:
+            status, payload = route(params, self.headers.get("X-MBX-APIKEY", ""), self.path)
+        except Exception as e:
+            status, payload = 500, {"code": -1000, "msg": f"mock error: {e}"}
+        self._reply(payload, status, weight)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+
+class MockRestServer:
+    """
+    ✅ Binance REST محلي:
+    - latency_ms + jitter_ms لكل طلب، error_rate (503) و throttle_rate (429 + Retry-After)
+    - حسابات لكل API key بالذاكرة، أوامر MARKET تُنفّذ فورًا بسعر mock_price
+    - secrets (اختياري): {api_key: secret} للتحقق من التوقيع؛ بدونها يُقبل أي توقيع
+    - clock_skew_ms لاختبار مسار -1021
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        clock_skew_ms: int = 0,
+        secrets: Optional[Dict[str, str]] = None,
+        start_balance: Optional[Dict[str, float]] = None,
+    ):
+        self.latency_s = latency_ms / 1000
+        self.jitter_s = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.clock_skew_ms = clock_skew_ms
+        self.secrets = secrets or {}
+        self.start_balance = start_balance or MOCK_START_BALANCE
+
+        self.accounts: Dict[str, Dict[str, float]] = {}
+        self.orders: List[Dict] = []
+        self.counts: Dict[str, int] = defaultdict(int)
+        self._weight_window = (0, 0)  # (الدقيقة, الوزن المستخدم)
+        self._lock = threading.Lock()
+        self._order_id = 0
+
+        self.routes = {
+            ("GET", "/api/v3/ping"): lambda p, k, raw: (200, {}),
+            ("GET", "/api/v3/time"): lambda p, k, raw: (200, {"serverTime": self.server_time()}),
+            ("GET", "/api/v3/account"): self._account,
+            ("GET", "/api/v3/ticker/price"): self._ticker_price,
+            ("GET", "/api/v3/klines"): self._klines,
+            ("GET", "/api/v3/exchangeInfo"): self._exchange_info,
+            ("POST", "/api/v3/order"): self._order,
+            ("POST", "/api/v3/userDataStream"): lambda p, k, raw: (200, {"listenKey": f"mock-{hashlib.sha1(k.encode()).hexdigest()[:16]}"}),
+            ("PUT", "/api/v3/userDataStream"): lambda p, k, raw: (200, {}),
+            ("DELETE", "/api/v3/userDataStream"): lambda p, k, raw: (200, {}),
+        }
+
+        handler = type("Handler", (_RestHandler,), {"mock": self})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address[:2]
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "MockRestServer":
+        threading.Thread(target=self._server.serve_forever, name="mock-rest", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def server_time(self) -> int:
+        return int(time.time() * 1000) + self.clock_skew_ms
+
+    def _record(self, key: str):
+        with self._lock:
+            self.counts[key] += 1
+
+    def _count(self, method: str, path: str) -> int:
+        weight = MOCK_WEIGHTS.get(path, 1)
+        minute = int(time.time() // 60)
+        with self._lock:
+            self.counts[f"{method} {path}"] += 1
+            window, used = self._weight_window
+            used = used + weight if window == minute else weight
+            self._weight_window = (minute, used)
+            return used
+
+    # ---------- signed ----------
+    def _check_signed(self, params: Dict, api_key: str, raw_path: str):
+        """يرجّع (status, payload) عند الفشل أو None"""
+        if not api_key:
+            return 401, {"code": -2014, "msg": "API-key format invalid."}
+        if "timestamp" not in params or "signature" not in params:
+            return 400, {"code": -1102, "msg": "Mandatory parameter 'timestamp' or 'signature' was not sent."}
+        recv_window = int(params.get("recvWindow", 5000))
+        ts = int(params["timestamp"])
+        now = self.server_time()
+        if ts > now + 1000 or now - ts > recv_window:
+            return 400, {"code": -1021, "msg": "Timestamp for this request is outside of the recvWindow."}
+        secret = self.secrets.get(api_key)
+        if secret is not None:
+            payload = urlparse(raw_path).query.rsplit("&signature=", 1)[0]
+            expected = hmac.new(secret.encode(), payload.encode(), hashlib.sha256).hexdigest()
+            if not hmac.compare_digest(expected, params["signature"]):
+                return 400, {"code": -1022, "msg": "Signature for this request is not valid."}
+        return None
+
+    def _balances(self, api_key: str) -> Dict[str, float]:
+        with self._lock:
+            if api_key not in self.accounts:
+                self.accounts[api_key] = dict(self.start_balance)
+            return self.accounts[api_key]
+
+    def _account(self, params, api_key, raw_path):
+        failed = self._check_signed(params, api_key, raw_path)
+        if failed:
+            return failed
+        balances = self._balances(api_key)
+        with self._lock:
+            rows = [{"asset": a, "free": f"{v:.8f}", "locked": "0.00000000"} for a, v in balances.items()]
+        return 200, {"canTrade": True, "canWithdraw": True, "canDeposit": True, "accountType": "SPOT", "balances": rows}
+
+    # ---------- market data ----------
+    def _ticker_price(self, params, api_key, raw_path):
+        now = self.server_time()
+        if "symbol" in params:
+            symbol = params["symbol"]
+            if symbol not in MOCK_SYMBOLS:
+                return 400, {"code": -1121, "msg": "Invalid symbol."}
+            return 200, {"symbol": symbol, "price": f"{mock_price(symbol, now):.8f}"}
+        symbols = json.loads(params["symbols"]) if "symbols" in params else list(MOCK_SYMBOLS)
+        if any(s not in MOCK_SYMBOLS for s in symbols):
+            return 400, {"code": -1121, "msg": "Invalid symbol."}
+        return 200, [{"symbol": s, "price": f"{mock_price(s, now):.8f}"} for s in symbols]
+
+    def _klines(self, params, api_key, raw_path):
+        symbol = params.get("symbol", "")
+        step = MOCK_INTERVAL_MS.get(params.get("interval", ""))
+        if symbol not in MOCK_SYMBOLS or step is None:
+            return 400, {"code": -1121, "msg": "Invalid symbol or interval."}
+        limit = min(int(params.get("limit", 500)), 1000)
+        now = self.server_time()
+        current = (now // step) * step  # الشمعة الحالية (غير مغلقة) مشمولة كما في Binance
+        if "startTime" in params:
+            start = -(-int(params["startTime"]) // step) * step
+        else:
+            start = current - (limit - 1) * step
+        times = range(start, min(current, start + (limit - 1) * step) + 1, step)
+        return 200, [mock_kline(symbol, t, step) for t in times]
+
+    def _exchange_info(self, params, api_key, raw_path):
+        symbols = json.loads(params["symbols"]) if "symbols" in params else list(MOCK_SYMBOLS)
+        if any(s not in MOCK_SYMBOLS for s in symbols):
+            return 400, {"code": -1121, "msg": "Invalid symbol."}
+        return 200, {"timezone": "UTC", "serverTime": self.server_time(), "symbols": [self._symbol_info(s) for s in symbols]}
+
+    @staticmethod
+    def _symbol_info(symbol: str) -> Dict:
+        spec = MOCK_SYMBOLS[symbol]
+        return {
+            "symbol": symbol,
+            "status": "TRADING",
+            "baseAsset": symbol[:-4],
+            "quoteAsset": "USDT",
+            "orderTypes": ["LIMIT", "MARKET"],
+            "filters": [
+                {"filterType": "PRICE_FILTER", "minPrice": spec["tick"], "maxPrice": "1000000.00", "tickSize": spec["tick"]},
+                {"filterType": "LOT_SIZE", "minQty": spec["step"], "maxQty": "9000.0", "stepSize": spec["step"]},
+                {"filterType": "NOTIONAL", "minNotional": str(MOCK_MIN_NOTIONAL), "applyMinToMarket": True, "maxNotional": "9000000.0"},
+            ],
+        }
+
+    # ---------- trading ----------
+    def _order(self, params, api_key, raw_path):
+        failed = self._check_signed(params, api_key, raw_path)
+        if failed:
+            return failed
+        symbol, side = params.get("symbol", ""), params.get("side", "")
+        if symbol not in MOCK_SYMBOLS:
+            return 400, {"code": -1121, "msg": "Invalid symbol."}
+        if params.get("type") != "MARKET" or side not in ("BUY", "SELL"):
+            return 400, {"code": -1116, "msg": "Invalid orderType."}
+
+        qty = Decimal(params.get("quantity", "0"))
+        step = Decimal(MOCK_SYMBOLS[symbol]["step"])
+        price = mock_price(symbol, self.server_time())
+        if qty <= 0 or qty % step:
+            return 400, {"code": -1013, "msg": "Filter failure: LOT_SIZE"}
+        if qty * Decimal(str(price)) < MOCK_MIN_NOTIONAL:
+            return 400, {"code": -1013, "msg": "Filter failure: NOTIONAL"}
+
+        base, quote = symbol[:-4], float(qty) * price
+        balances = self._balances(api_key)
+        with self._lock:
+            if side == "BUY" and balances.get("USDT", 0.0) < quote:
+                return 400, {"code": -2010, "msg": "Account has insufficient balance for requested action."}
+            if side == "SELL" and balances.get(base, 0.0) < float(qty):
+                return 400, {"code": -2010, "msg": "Account has insufficient balance for requested action."}
+            sign = 1 if side == "BUY" else -1
+            balances[base] = balances.get(base, 0.0) + sign * float(qty)
+            balances["USDT"] = balances.get("USDT", 0.0) - sign * quote
+            self._order_id += 1
+            order = {
+                "symbol": symbol,
+                "orderId": self._order_id,
+                "transactTime": self.server_time(),
+                "origQty": params["quantity"],
+                "executedQty": params["quantity"],
+                "cummulativeQuoteQty": f"{quote:.8f}",
+                "status": "FILLED",
+                "type": "MARKET",
+                "side": side,
+            }
+            self.orders.append(order)
+        return 200, order
+
+
+# ==================== WEBSOCKET ====================
+class _WSClient:
+    def __init__(self, sock, path: str):
+        self.sock = sock
+        self.path = path
+        self.streams = set(parse_qs(urlparse(path).query).get("streams", [""])[0].split("/")) - {""}
+        self.lock = threading.Lock()
+
+    def send_json(self, obj):
+        with self.lock:
+            self.sock.sendall(encode_frame(OP_TEXT, json.dumps(obj).encode(), mask=False))
+
+    def send(self, opcode: int, payload: bytes = b""):
+        with self.lock:
+            self.sock.sendall(encode_frame(opcode, payload, mask=False))
+
+    def send_fragmented(self, obj, parts: int, ping_between: bool = False):
+        """رسالة نصية واحدة على عدة frames (TEXT ثم CONT) مع ping اختياري بينها"""
+        data = json.dumps(obj).encode()
+        size = max(1, -(-len(data) // parts))
+        chunks = [data[i:i + size] for i in range(0, len(data), size)]
+        with self.lock:
+            for i, chunk in enumerate(chunks):
+                opcode = OP_TEXT if i == 0 else OP_CONT
+                self.sock.sendall(encode_frame(opcode, chunk, mask=False, fin=i == len(chunks) - 1))
+                if ping_between and i < len(chunks) - 1:
+                    self.sock.sendall(encode_frame(OP_PING, b"mid", mask=False))
+
+
+class MockWebSocketServer:
+    """
+    سيرفر WebSocket محلي يكفي لـ streams.StreamClient:
+    - /stream?streams=a/b و /ws/<listenKey>
+    - يطبّق SUBSCRIBE / UNSUBSCRIBE ويرد {"result": null, "id": ...}
+    - broadcast() للأحداث، drop_all() لمحاكاة انقطاع، ping() لاختبار pong
+    - close_all() إغلاق من السيرفر بـ close frame، send_fragmented() رسالة مقسمة على frames
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = socket.create_server((host, port))
+        self.host, self.port = self._server.getsockname()[:2]
+        self.clients: List[_WSClient] = []
+        self.received: List[Dict] = []
+        self.pongs = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._running = False
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    def start(self) -> "MockWebSocketServer":
+        self._running = True
+        threading.Thread(target=self._accept_loop, name="mock-ws", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self.drop_all()
+        self._server.close()
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                sock, _ = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(sock,), daemon=True).start()
+
+    def _handshake(self, sock) -> Optional[str]:
+        data = b""
+        while b"\r\n\r\n" not in data:
+            chunk = sock.recv(4096)
+            if not chunk:
+                return None
+            data += chunk
+        lines = data.split(b"\r\n\r\n", 1)[0].decode("latin-1").split("\r\n")
+        path = lines[0].split(" ")[1]
+        headers = {k.strip().lower(): v.strip() for k, v in (l.split(":", 1) for l in lines[1:] if ":" in l)}
+        sock.sendall(
+            (
+                "HTTP/1.1 101 Switching Protocols\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {accept_key(headers['sec-websocket-key'])}\r\n\r\n"
+            ).encode()
+        )
+        return path
+
+    def _serve(self, sock):
+        path = self._handshake(sock)
+        if path is None:
+            sock.close()
+            return
+        client = _WSClient(sock, path)
+        with self._lock:
+            self.clients.append(client)
+            self.connections += 1
+        try:
+            while True:
+                _, opcode, payload = read_frame(sock)
+                if opcode == OP_CLOSE:
+                    break
+                if opcode == OP_PONG:
+                    self.pongs += 1
+                    continue
+                if opcode != OP_TEXT:
+                    continue
+                msg = json.loads(payload)
+                self.received.append(msg)
+                if msg.get("method") == "SUBSCRIBE":
+                    client.streams.update(msg.get("params", []))
+                elif msg.get("method") == "UNSUBSCRIBE":
+                    client.streams.difference_update(msg.get("params", []))
+                client.send_json({"result": None, "id": msg.get("id")})
+        except (OSError, WebSocketClosed, ValueError):
+            pass
+        finally:
+            with self._lock:
+                if client in self.clients:
+                    self.clients.remove(client)
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def broadcast(self, event: Dict, path_prefix: Optional[str] = None):
+        """يرسل الحدث لكل عميل مشترك في الـ stream (أو يطابق path_prefix للـ user stream)"""
+        stream = event.get("stream")
+        with self._lock:
+            clients = list(self.clients)
+        for c in clients:
+            if path_prefix is not None and not c.path.startswith(path_prefix):
+                continue
+            if stream and path_prefix is None and stream not in c.streams:
+                continue
+            try:
+                c.send_json(event)
+            except OSError:
+                pass
+
+    def ping(self, payload: bytes = b"hb"):
+        with self._lock:
+            clients = list(self.clients)
+        for c in clients:
+            try:
+                c.send(OP_PING, payload)
+            except OSError:
+                pass
+
+    def send_fragmented(self, event: Dict, parts: int = 3, ping_between: bool = False):
+        with self._lock:
+            clients = list(self.clients)
+        for c in clients:
+            try:
+                c.send_fragmented(event, parts, ping_between)
+            except OSError:
+                pass
+
+    def close_all(self, code: int = 1001):
+        """close frame من السيرفر (1001 = going away كما في صيانة Binance)"""
+        with self._lock:
+            clients = list(self.clients)
+        for c in clients:
+            try:
+                c.send(OP_CLOSE, struct.pack("!H", code))
+            except OSError:
+                pass
+
+    def drop_all(self):
+        with self._lock:
+            clients, self.clients = self.clients, []
+        for c in clients:
+            try:
+                c.sock.shutdown(socket.SHUT_RDWR)
+                c.sock.close()
+            except OSError:
+                pass
+
+    def wait_for_clients(self, n: int = 1, timeout: float = 5.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if len(self.clients) >= n:
+                return True
+            time.sleep(0.01)
+        return False
+
+
+# ==================== MAIN ====================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--rest-port", type=int, default=9080)
+    parser.add_argument("--ws-port", type=int, default=9443)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="نسبة ردود 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="نسبة ردود 429")
+    args = parser.parse_args(argv)
+
+    rest = MockRestServer(
+        args.host, args.rest_port, args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate
+    ).start()
+    ws = MockWebSocketServer(args.host, args.ws_port).start()
+    print(f"mock rest:      {rest.url}")
+    print(f"mock websocket: {ws.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        ws.stop()
+        rest.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,502 @@
+"""
+🧪 محرك مطابقة محلي للتداول الورقي (لا يصل أي أمر إلى Binance)
+- دفتر أوامر مُصنّع حول السعر المرجعي: مستويات بفارق ثابت، وعمق من حجم الشموع
+- السيولة المستهلكة تتجدد تدريجيًا: الأوامر الكبيرة أو المتتالية تُنفَّذ جزئيًا وبانزلاق
+- رسوم maker/taker بعملة الاستلام (مثل Binance) + نموذج تأخير الإرسال
+- أرصدة افتراضية لكل حساب بصيغة /account؛ أوامر LIMIT المتبقية تُطابق مع كل تحديث سعر
+- السعر حي (price_source) أو مُعاد من شموع تاريخية (replay_kline)
+"""
+
+import time
+import random
+import itertools
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+PAPER_FEE_RATE = 0.001  # taker: 0.1% (المستوى الأساسي في Binance)
+PAPER_MAKER_FEE_RATE = 0.001
+PAPER_SPREAD_BPS = 2.0  # الفارق بين أفضل bid وأفضل ask
+PAPER_LEVEL_STEP_BPS = 1.0  # المسافة بين مستويات الدفتر
+PAPER_BOOK_LEVELS = 20
+PAPER_BOOK_SECONDS = 60.0  # عمق كل جانب = حجم تداول هذه المدة (من الشموع)
+PAPER_DEPTH_QUOTE = 250_000.0  # عمق كل جانب بالعملة المقابلة عندما لا يتوفر حجم
+PAPER_REFILL_SECONDS = 5.0  # مستوى مستهلك بالكامل يعود ممتلئًا بعد هذه المدة
+PAPER_MARK_TTL = 1.0  # عمر السعر المرجعي قبل سؤال price_source من جديد (ثانية)
+PAPER_START_BALANCES = {"USDT": 10_000.0}
+
+# لتقسيم الرمز إلى base/quote بدون exchangeInfo (الأطول أولًا: FDUSD قبل USD...)
+QUOTE_ASSETS = ("FDUSD", "USDT", "USDC", "TUSD", "BUSD", "BTC", "ETH", "BNB")
+
+# نفس أكواد Binance حتى يعامل المستدعي الرفض كما يعامله من البورصة
+INVALID_SYMBOL = -1121
+INSUFFICIENT_BALANCE = -2010
+INVALID_ORDER = -1013
+UNKNOWN_ORDER = -2011
+
+_EPS = 1e-12
+
+
+class PaperRejected(Exception):
+    """رفض من المحرك بكود Binance المقابل"""
+
+    def __init__(self, code: int, msg: str):
+        super().__init__(msg)
+        self.code = code
+
+
+def split_symbol(symbol: str) -> Tuple[str, str]:
+    for quote in QUOTE_ASSETS:
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[: -len(quote)], quote
+    raise PaperRejected(INVALID_SYMBOL, "Invalid symbol.")
+
+
+def _fmt(value: float) -> str:
+    return "%.8f" % value
+
+
+class LatencyModel:
+    """تأخير الإرسال→التنفيذ: mean ± jitter (توزيع طبيعي مقصوص عند 0)؛ mean=0 يعطّل التأخير كليًا"""
+
+    __slots__ = ("mean_ms", "jitter_ms", "sleep", "_rng")
+
+    def __init__(self, mean_ms: float = 0.0, jitter_ms: float = 0.0, sleep: bool = True, seed: Optional[int] = None):
+        self.mean_ms = mean_ms
+        self.jitter_ms = jitter_ms
+        self.sleep = sleep
+        self._rng = random.Random(seed)
+
+    def sample(self) -> float:
+        if not self.jitter_ms or not self.mean_ms:
+            return self.mean_ms
+        return max(0.0, self._rng.gauss(self.mean_ms, self.jitter_ms))
+
+
+class Book:
+    """
+    دفتر مُصنّع لرمز واحد:
+    - asks / bids: أسعار المستويات حول mid
+    - ask_left / bid_left: الكمية المتبقية في كل مستوى عند آخر استهلاك (ask_at / bid_at)
+    - التجدد كسول: يُحسب للمستويات التي يمر بها الأمر فقط (بدون مسح الدفتر مع كل أمر)
+    """
+
+    __slots__ = (
+        "levels", "spread_bps", "step_bps", "refill_seconds", "mid", "capacity", "marked_at",
+        "asks", "bids", "ask_left", "bid_left", "ask_at", "bid_at",
+    )
+
+    def __init__(self, levels: int, spread_bps: float, step_bps: float, refill_seconds: float = PAPER_REFILL_SECONDS):
+        self.levels = levels
+        self.spread_bps = spread_bps
+        self.step_bps = step_bps
+        self.refill_seconds = refill_seconds
+        self.mid = 0.0
+        self.capacity = 0.0
+        self.marked_at = 0.0
+        self.asks: List[float] = []
+        self.bids: List[float] = []
+        self.ask_left = [0.0] * levels
+        self.bid_left = [0.0] * levels
+        self.ask_at = [0.0] * levels
+        self.bid_at = [0.0] * levels
+
+    def mark(self, mid: float, depth_qty: float, now: float):
+        """سعر مرجعي جديد؛ السيولة المستهلكة تبقى مستهلكة (بنفس النسبة إذا تغير العمق)"""
+        offsets = [(self.spread_bps / 2 + k * self.step_bps) / 1e4 for k in range(self.levels)]
+        self.asks = [mid * (1 + o) for o in offsets]
+        self.bids = [mid * (1 - o) for o in offsets]
+        capacity = depth_qty / self.levels
+        if self.capacity <= 0:
+            self.ask_left = [capacity] * self.levels
+            self.bid_left = [capacity] * self.levels
+        elif capacity != self.capacity:
+            scale = capacity / self.capacity
+            self.ask_left = [q * scale for q in self.ask_left]
+            self.bid_left = [q * scale for q in self.bid_left]
+        self.mid = mid
+        self.capacity = capacity
+        self.marked_at = now
+
+    def walk(self, buy: bool, qty: float, now: float, limit: Optional[float] = None) -> Tuple[List[Tuple[int, float, float, float]], float, float]:
+        """
+        (fills, الكمية المنفذة, القيمة) بدون استهلاك؛ fills = [(مستوى, سعر, كمية, المتاح), ...]
+        limit يوقف المشي عند أول سعر أسوأ منه
+        """
+        prices = self.asks if buy else self.bids
+        left = self.ask_left if buy else self.bid_left
+        at = self.ask_at if buy else self.bid_at
+        cap = self.capacity
+        rate = cap / self.refill_seconds
+        fills = []
+        remaining, cost = qty, 0.0
+        for k, price in enumerate(prices):
+            if limit is not None and (price > limit if buy else price < limit):
+                break
+            available = left[k]
+            if available < cap:
+                available = min(cap, available + (now - at[k]) * rate)
+            if available <= _EPS:
+                continue
+            q = available if available < remaining else remaining
+            fills.append((k, price, q, available))
+            cost += price * q
+            remaining -= q
+            if remaining <= _EPS:
+                break
+        return fills, qty - remaining, cost
+
+    def consume(self, buy: bool, fills: Iterable[Tuple[int, float, float, float]], now: float):
+        left = self.ask_left if buy else self.bid_left
+        at = self.ask_at if buy else self.bid_at
+        for k, _, q, available in fills:
+            left[k] = available - q
+            at[k] = now
+
+
+class PaperAccount:
+    __slots__ = ("free", "locked", "version", "updated_at")
+
+    def __init__(self, balances: Dict[str, Tuple[float, float]]):
+        self.free = {a: f for a, (f, _) in balances.items()}
+        self.locked = {a: l for a, (_, l) in balances.items()}
+        self.version = 0
+        self.updated_at = int(time.time() * 1000)
+
+    def balances(self) -> List[Dict]:
+        assets = sorted(set(self.free) | set(self.locked))
+        return [
+            {"asset": a, "free": _fmt(self.free.get(a, 0.0)), "locked": _fmt(self.locked.get(a, 0.0))}
+            for a in assets
+            if self.free.get(a, 0.0) > _EPS or self.locked.get(a, 0.0) > _EPS
+        ]
+
+    def touch(self, now_ms: int):
+        self.version += 1
+        self.updated_at = now_ms
+
+
+class PaperExchange:
+    """
+    ✅ بورصة محلية لكل شبكة بيانات:
+    - place_order(): MARKET يمشي على الدفتر حتى الكمية أو نفاد السيولة (EXPIRED مع تنفيذ جزئي)،
+      LIMIT ينفَّذ الجزء القابل فورًا (taker) ويبقى الباقي محجوز الرصيد حتى يعبره السعر (maker)
+    - set_market() / replay_kline(): تحديث السعر والعمق ومطابقة أوامر LIMIT المعلّقة
+    - cancel_order() / open_orders() / resting_symbols(): الأوامر المعلّقة (إلغاء يعيد الرصيد المحجوز)
+    - price_source(symbol) → (price, volume_per_s | None): السعر الحي عند الحاجة فقط (PAPER_MARK_TTL)
+    - قفل واحد قصير لكل العمليات؛ price_source والتأخير خارج القفل
+    """
+
+    def __init__(
+        self,
+        price_source: Optional[Callable[[str], Optional[Tuple[float, Optional[float]]]]] = None,
+        fee_rate: float = PAPER_FEE_RATE,
+        maker_fee_rate: float = PAPER_MAKER_FEE_RATE,
+        latency: Optional[LatencyModel] = None,
+        levels: int = PAPER_BOOK_LEVELS,
+        spread_bps: float = PAPER_SPREAD_BPS,
+        step_bps: float = PAPER_LEVEL_STEP_BPS,
+        book_seconds: float = PAPER_BOOK_SECONDS,
+        depth_quote: float = PAPER_DEPTH_QUOTE,
+        refill_seconds: float = PAPER_REFILL_SECONDS,
+        mark_ttl: float = PAPER_MARK_TTL,
+        start_balances: Optional[Dict[str, float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.price_source = price_source
+        self.fee_rate = fee_rate
+        self.maker_fee_rate = maker_fee_rate
+        self.latency = latency or LatencyModel()
+        self.levels = levels
+        self.spread_bps = spread_bps
+        self.step_bps = step_bps
+        self.book_seconds = book_seconds
+        self.depth_quote = depth_quote
+        self.refill_seconds = refill_seconds
+        self.mark_ttl = mark_ttl
+        self.start_balances = dict(PAPER_START_BALANCES if start_balances is None else start_balances)
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._books: Dict[str, Book] = {}
+        self._accounts: Dict[str, PaperAccount] = {}
+        self._resting: Dict[str, List[Dict]] = {}
+        self._order_ids = itertools.count(1)
+        self._trade_ids = itertools.count(1)
+        self.orders = 0
+        self.fills = 0
+        self.rejected = 0
+
+    # ---------- accounts ----------
+    def open_account(self, account_id: str, balances: Optional[List[Dict]] = None) -> None:
+        """balances بصيغة /account (محفوظة سابقًا)؛ بدونها يبدأ الحساب بـ start_balances"""
+        with self._lock:
+            if account_id in self._accounts:
+                return
+            if balances is None:
+                initial = {a: (float(v), 0.0) for a, v in self.start_balances.items()}
+            else:
+                # الأوامر المعلّقة لا تُحفظ: المحجوز لها يعود free بدل أن يبقى عالقًا بلا أمر يُلغى
+                initial = {b["asset"]: (float(b.get("free") or 0) + float(b.get("locked") or 0), 0.0) for b in balances}
+            self._accounts[account_id] = PaperAccount(initial)
+
+    def _account(self, account_id: str) -> PaperAccount:
+        account = self._accounts.get(account_id)
+        if account is None:
+            account = self._accounts[account_id] = PaperAccount({a: (float(v), 0.0) for a, v in self.start_balances.items()})
+        return account
+
+    def account_info(self, account_id: str) -> Dict:
+        with self._lock:
+            account = self._account(account_id)
+            return {
+                "makerCommission": int(round(self.maker_fee_rate * 1e4)),
+                "takerCommission": int(round(self.fee_rate * 1e4)),
+                "canTrade": True,
+                "canWithdraw": False,
+                "canDeposit": False,
+                "accountType": "SPOT",
+                "balances": account.balances(),
+                "updateTime": account.updated_at,
+                "permissions": ["SPOT"],
+            }
+
+    def account_version(self, account_id: str) -> int:
+        account = self._accounts.get(account_id)
+        return account.version if account is not None else 0
+
+    # ---------- market data ----------
+    def _book(self, symbol: str) -> Book:
+        book = self._books.get(symbol)
+        if book is None:
+            book = self._books[symbol] = Book(self.levels, self.spread_bps, self.step_bps, self.refill_seconds)
+        return book
+
+    def set_market(self, symbol: str, price: float, volume_per_s: Optional[float] = None):
+        """سعر مرجعي (+ معدل الحجم بوحدة الأصل/ثانية إن توفر) ثم مطابقة أوامر LIMIT المعلّقة"""
+        if not price or price <= 0:
+            return
+        depth = volume_per_s * self.book_seconds if volume_per_s else self.depth_quote / price
+        now = self.clock()
+        with self._lock:
+            book = self._book(symbol)
+            book.mark(price, depth, now)
+            if self._resting.get(symbol):
+                self._match_resting(symbol, book, now)
+
+    def replay_kline(self, symbol: str, kline: List, interval_ms: int):
+        """
+        شمعة بصيغة /klines: السعر يمر بـ open → low → high → close (أو high قبل low للشمعة الهابطة)
+        حتى تُطابق أوامر LIMIT داخل مدى الشمعة، والعمق من حجمها
+        """
+        o, h, l, c, v = (float(x) for x in kline[1:6])
+        rate = v / (interval_ms / 1000) if interval_ms else None
+        for price in ((o, l, h, c) if c >= o else (o, h, l, c)):
+            self.set_market(symbol, price, rate)
+
+    def _ensure_mark(self, symbol: str):
+        if self.price_source is None:
+            return
+        book = self._books.get(symbol)
+        if book is not None and book.capacity > 0 and self.clock() - book.marked_at < self.mark_ttl:
+            return
+        quote = self.price_source(symbol)
+        if quote and quote[0]:
+            self.set_market(symbol, quote[0], quote[1])
+
+    # ---------- orders ----------
+    def place_order(
+        self, account_id: str, symbol: str, side: str, quantity: float, order_type: str = "MARKET", price: Optional[float] = None
+    ) -> Dict:
+        """رد بصيغة Binance (newOrderRespType=FULL) أو PaperRejected"""
+        latency_ms = self.latency.sample()
+        if latency_ms and self.latency.sleep:
+            time.sleep(latency_ms / 1000)
+        base, quote = split_symbol(symbol)
+        buy = side == "BUY"
+        if not buy and side != "SELL":
+            raise PaperRejected(INVALID_ORDER, f"Invalid side: {side}")
+        if quantity <= 0:
+            raise PaperRejected(INVALID_ORDER, "Invalid quantity.")
+        limit = order_type == "LIMIT"
+        if limit and (price is None or price <= 0):
+            raise PaperRejected(INVALID_ORDER, "LIMIT order requires price.")
+        if not limit and order_type != "MARKET":
+            raise PaperRejected(INVALID_ORDER, f"Unsupported order type: {order_type}")
+
+        self._ensure_mark(symbol)
+        with self._lock:
+            book = self._books.get(symbol)
+            if book is None or book.capacity <= 0:
+                self.rejected += 1
+                raise PaperRejected(INVALID_SYMBOL, f"No market data for {symbol}.")
+            now = self.clock()
+            account = self._account(account_id)
+            free = account.free
+
+            fills, filled, cost = book.walk(buy, quantity, now, price if limit else None)
+            rest = quantity - filled if limit else 0.0
+            if rest <= _EPS:
+                rest = 0.0
+
+            # التحقق من الرصيد للأمر كاملًا قبل أي تنفيذ (Binance يرفض الأمر كله)
+            if buy:
+                need = cost + rest * price if limit else cost
+                if need > free.get(quote, 0.0) + _EPS:
+                    self.rejected += 1
+                    raise PaperRejected(INSUFFICIENT_BALANCE, "Account has insufficient balance for requested action.")
+            elif quantity > free.get(base, 0.0) + _EPS:
+                self.rejected += 1
+                raise PaperRejected(INSUFFICIENT_BALANCE, "Account has insufficient balance for requested action.")
+
+            book.consume(buy, fills, now)
+            now_ms = int(time.time() * 1000 + latency_ms)
+            fee = self.fee_rate
+            fill_rows = []
+            if buy:
+                free[quote] = free.get(quote, 0.0) - cost
+                free[base] = free.get(base, 0.0) + filled * (1 - fee)
+                commission_asset = base
+            else:
+                free[base] = free.get(base, 0.0) - filled
+                free[quote] = free.get(quote, 0.0) + cost * (1 - fee)
+                commission_asset = quote
+            for _, p, q, _ in fills:
+                fill_rows.append({
+                    "price": _fmt(p),
+                    "qty": _fmt(q),
+                    "commission": _fmt(q * fee if buy else p * q * fee),
+                    "commissionAsset": commission_asset,
+                    "tradeId": next(self._trade_ids),
+                })
+
+            order_id = next(self._order_ids)
+            if rest:
+                # الباقي يُعلَّق ويُحجز رصيده
+                locked_asset, locked_amount = (quote, rest * price) if buy else (base, rest)
+                free[locked_asset] = free.get(locked_asset, 0.0) - locked_amount
+                account.locked[locked_asset] = account.locked.get(locked_asset, 0.0) + locked_amount
+                self._resting.setdefault(symbol, []).append({
+                    "orderId": order_id, "account": account_id, "buy": buy, "price": price,
+                    "base": base, "quote": quote, "remaining": rest,
+                    "origQty": quantity, "executed": filled, "cost": cost, "time": now_ms,
+                })
+                status = "PARTIALLY_FILLED" if filled > _EPS else "NEW"
+            elif limit or quantity - filled <= _EPS:
+                status = "FILLED"
+            else:
+                # MARKET بدون سيولة كافية: الباقي يُلغى كما في Binance
+                status = "EXPIRED"
+            account.touch(now_ms)
+            self.orders += 1
+            self.fills += len(fills)
+
+        return {
+            "symbol": symbol,
+            "orderId": order_id,
+            "orderListId": -1,
+            "clientOrderId": f"paper-{order_id}",
+            "transactTime": now_ms,
+            "price": _fmt(price if limit else 0.0),
+            "origQty": _fmt(quantity),
+            "executedQty": _fmt(filled),
+            "cummulativeQuoteQty": _fmt(cost),
+            "status": status,
+            "timeInForce": "GTC",
+            "type": order_type,
+            "side": side,
+            "workingTime": now_ms,
+            "fills": fill_rows,
+        }
+
+    def _match_resting(self, symbol: str, book: Book, now: float):
+        """أوامر LIMIT المعلّقة التي عبرها السعر تُنفَّذ بسعرها (maker) من سيولة المستويات العابرة"""
+        fee = self.maker_fee_rate
+        now_ms = int(time.time() * 1000)
+        pending = []
+        for order in self._resting[symbol]:
+            buy, price = order["buy"], order["price"]
+            fills, filled, _ = book.walk(buy, order["remaining"], now, price)
+            if not fills:
+                pending.append(order)
+                continue
+            book.consume(buy, fills, now)
+            account = self._account(order["account"])
+            base, quote = order["base"], order["quote"]
+            if buy:
+                account.locked[quote] -= filled * price
+                account.free[base] = account.free.get(base, 0.0) + filled * (1 - fee)
+            else:
+                account.locked[base] -= filled
+                account.free[quote] = account.free.get(quote, 0.0) + filled * price * (1 - fee)
+            account.touch(now_ms)
+            self.fills += len(fills)
+            order["remaining"] -= filled
+            order["executed"] += filled
+            order["cost"] += filled * price
+            if order["remaining"] > _EPS:
+                pending.append(order)
+        self._resting[symbol] = pending
+
+    @staticmethod
+    def _order_view(symbol: str, order: Dict, status: str) -> Dict:
+        return {
+            "symbol": symbol,
+            "orderId": order["orderId"],
+            "orderListId": -1,
+            "clientOrderId": f"paper-{order['orderId']}",
+            "price": _fmt(order["price"]),
+            "origQty": _fmt(order["origQty"]),
+            "executedQty": _fmt(order["executed"]),
+            "cummulativeQuoteQty": _fmt(order["cost"]),
+            "status": status,
+            "timeInForce": "GTC",
+            "type": "LIMIT",
+            "side": "BUY" if order["buy"] else "SELL",
+            "time": order["time"],
+        }
+
+    def cancel_order(self, account_id: str, symbol: str, order_id: int) -> Dict:
+        """إلغاء أمر LIMIT معلّق: الباقي المحجوز يعود free (رد بصيغة DELETE /order أو PaperRejected)"""
+        with self._lock:
+            orders = self._resting.get(symbol) or []
+            order = next((o for o in orders if o["orderId"] == order_id and o["account"] == account_id), None)
+            if order is None:
+                raise PaperRejected(UNKNOWN_ORDER, "Unknown order sent.")
+            orders.remove(order)
+            account = self._account(account_id)
+            rest = order["remaining"]
+            locked_asset, locked_amount = (order["quote"], rest * order["price"]) if order["buy"] else (order["base"], rest)
+            account.locked[locked_asset] = account.locked.get(locked_asset, 0.0) - locked_amount
+            account.free[locked_asset] = account.free.get(locked_asset, 0.0) + locked_amount
+            now_ms = int(time.time() * 1000)
+            account.touch(now_ms)
+            res = self._order_view(symbol, order, "CANCELED")
+        res["transactTime"] = now_ms
+        return res
+
+    def open_orders(self, account_id: str, symbol: Optional[str] = None) -> List[Dict]:
+        """بصيغة /openOrders"""
+        with self._lock:
+            return [
+                self._order_view(s, o, "PARTIALLY_FILLED" if o["executed"] > _EPS else "NEW")
+                for s, orders in self._resting.items()
+                if symbol is None or s == symbol
+                for o in orders
+                if o["account"] == account_id
+            ]
+
+    def resting_symbols(self) -> List[str]:
+        """الرموز التي عليها أوامر معلّقة: يجب أن يصلها كل سعر جديد"""
+        with self._lock:
+            return [s for s, orders in self._resting.items() if orders]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "orders": self.orders,
+                "fills": self.fills,
+                "rejected": self.rejected,
+                "resting": sum(len(v) for v in self._resting.values()),
+                "books": len(self._books),
+                "accounts": len(self._accounts),
+            }
@@ -0,0 +1,131 @@
+"""
+💼 محفظة متعددة الأصول من أرصدة /account
+- الأصول غير الصفرية فقط في مصفوفات NumPy (free / locked) مع فهرس asset → صف
+- تحديثات outboundAccountPosition تعدّل الصفوف المتغيرة فقط بدل إعادة مسح قائمة balances
+- التقييم: الكميات × الأسعار في عملية متجهة واحدة، ويُحفظ حتى تتغير الأرصدة أو الأسعار
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+QUOTE_ASSET = "USDT"
+# عملات مستقرة تُقيَّم 1:1 بدون طلب سعر (الفرق عن USDT أقل من دقة التحجيم)
+STABLE_ASSETS = frozenset({"USDT", "USDC", "FDUSD", "TUSD", "BUSD", "DAI"})
+
+
+def _amount(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class Portfolio:
+    """
+    ✅ لقطة أرصدة لحساب واحد:
+    - from_balances() مرة واحدة لكل /account
+    - apply() للتحديثات الجزئية (تُرجع نسخة جديدة: القرّاء لا يرون نصف تحديث)
+    - valuation(prices, prices_version) بالعملة المقابلة QUOTE_ASSET
+    """
+
+    __slots__ = ("quote", "assets", "free", "locked", "version", "_index", "_valued")
+
+    def __init__(self, assets: List[str], free: np.ndarray, locked: np.ndarray, quote: str = QUOTE_ASSET, version: int = 0):
+        self.quote = quote
+        self.assets = assets
+        self.free = free
+        self.locked = locked
+        self.version = version
+        self._index = {a: i for i, a in enumerate(assets)}
+        self._valued: Optional[Tuple[Tuple[int, int], Dict]] = None
+
+    @classmethod
+    def from_balances(cls, balances: Iterable[Dict], quote: str = QUOTE_ASSET) -> "Portfolio":
+        """balances بصيغة /account: [{"asset", "free", "locked"}, ...] (الصفرية تُتجاهل)"""
+        assets, free, locked = [], [], []
+        for b in balances:
+            f, l = _amount(b.get("free")), _amount(b.get("locked"))
+            if f or l:
+                assets.append(b["asset"])
+                free.append(f)
+                locked.append(l)
+        return cls(assets, np.array(free, dtype=np.float64), np.array(locked, dtype=np.float64), quote)
+
+    def apply(self, deltas: Iterable[Tuple[str, float, float]]) -> "Portfolio":
+        """(asset, free, locked) بالقيم الجديدة الكاملة كما يرسلها الـ user stream"""
+        assets, free, locked = list(self.assets), self.free.copy(), self.locked.copy()
+        index = dict(self._index)
+        new_assets, new_free, new_locked = [], [], []
+        for asset, f, l in deltas:
+            f, l = _amount(f), _amount(l)
+            i = index.get(asset)
+            if i is not None:
+                free[i], locked[i] = f, l
+            elif f or l:
+                index[asset] = len(assets) + len(new_assets)
+                new_assets.append(asset)
+                new_free.append(f)
+                new_locked.append(l)
+        if new_assets:
+            assets += new_assets
+            free = np.concatenate([free, new_free])
+            locked = np.concatenate([locked, new_locked])
+        return Portfolio(assets, free, locked, self.quote, self.version + 1)
+
+    def free_of(self, asset: str) -> float:
+        i = self._index.get(asset)
+        return float(self.free[i]) if i is not None else 0.0
+
+    def pricing_symbols(self) -> List[str]:
+        """رموز ticker المطلوبة لتقييم الأصول غير المستقرة (طلب واحد لكلها)"""
+        held = (self.free + self.locked) > 0
+        return [f"{a}{self.quote}" for a, h in zip(self.assets, held) if h and a not in STABLE_ASSETS]
+
+    def balances(self) -> List[Dict]:
+        """بصيغة /account (غير الصفرية فقط) لحفظها في checkpoint"""
+        return [
+            {"asset": a, "free": repr(float(f)), "locked": repr(float(l))}
+            for a, f, l in zip(self.assets, self.free, self.locked)
+            if f or l
+        ]
+
+    def valuation(self, prices: Dict[str, float], prices_version: int = 0) -> Dict:
+        key = (self.version, prices_version)
+        valued = self._valued
+        if valued is not None and valued[0] == key:
+            return valued[1]
+
+        quote = self.quote
+        price = np.array(
+            [1.0 if a in STABLE_ASSETS else prices.get(f"{a}{quote}", np.nan) for a in self.assets],
+            dtype=np.float64,
+        )
+        amount = self.free + self.locked
+        value = amount * price
+        priced = ~np.isnan(value)
+        total = float(value[priced].sum())
+        weight = np.divide(value, total, out=np.zeros_like(value), where=priced & (total > 0))
+
+        rows = [
+            {
+                "asset": a,
+                "free": float(self.free[i]),
+                "locked": float(self.locked[i]),
+                "price": float(price[i]) if priced[i] else None,
+                "value": round(float(value[i]), 8) if priced[i] else None,
+                "weight": round(float(weight[i]) * 100, 2),
+            }
+            for i, a in enumerate(self.assets)
+            if amount[i] > 0
+        ]
+        rows.sort(key=lambda r: -(r["value"] or 0.0))
+        result = {
+            "quote": quote,
+            "total_value": round(total, 8),
+            "free_quote": self.free_of(quote),
+            "assets": rows,
+            "unpriced": [r["asset"] for r in rows if r["value"] is None],
+        }
+        self._valued = (key, result)
+        return result
@@ -0,0 +1,290 @@
+"""
+🔬 تتبع اختياري للمسارات الساخنة (spans) + sampling profiler
+- span(name): توقيت متداخل لكل thread؛ معطّل = كائن no-op واحد بدون توقيت ولا أقفال
+- لكل مسار (root;child;...) يُجمع: العدد، الوقت الكلي، الوقت الذاتي (بدون الأبناء)
+- أبطأ N عملية جذرية (طلب HTTP / tick) تُحفظ مع شجرة أبنائها
+- sampler: كل 1/hz ثانية يأخذ Python stack للـ threads التي داخل span فقط
+- collapsed(): صيغة flamegraph.pl / speedscope ("a;b;c 123" لكل سطر)
+"""
+
+import heapq
+import itertools
+import os
+import sys
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+PROFILE_SLOWEST = 50  # أبطأ العمليات الجذرية المحفوظة
+PROFILE_MAX_CHILDREN = 64  # أبناء محفوظون لكل span في شجرة أبطأ العمليات (الباقي يُعدّ فقط)
+
+
+class _Noop:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _Noop()
+
+
+class _Frame:
+    __slots__ = ("name", "detail", "start", "child_ns", "children", "dropped")
+
+    def __init__(self, name: str, detail: Optional[str], start: int):
+        self.name = name
+        self.detail = detail
+        self.start = start
+        self.child_ns = 0
+        self.children: Optional[List[Dict]] = None
+        self.dropped = 0
+
+
+class _Span:
+    __slots__ = ("_profiler", "_name", "_detail", "_frame")
+
+    def __init__(self, profiler: "Profiler", name: str, detail: Optional[str]):
+        self._profiler = profiler
+        self._name = name
+        self._detail = detail
+
+    def __enter__(self):
+        self._frame = self._profiler.push(self._name, self._detail)
+        return self._frame
+
+    def __exit__(self, *exc):
+        self._profiler.pop(self._frame)
+        return False
+
+
+def _code_name(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class Profiler:
+    """
+    ✅ اختياري بالكامل:
+    - enable() / disable() في أي وقت (ENV عند التشغيل أو endpoint إداري)
+    - enable(duration): يتعطّل تلقائيًا بعد المدة (تفعيل منسي لا يبقي الـ sampler يعمل للأبد)
+    - push / pop للخطافات التي لا تناسب with (بداية ونهاية طلب Flask)
+    - pop(frame) يغلق أي أبناء بقوا مفتوحين (استثناء بين before و after)
+    """
+
+    def __init__(self, enabled: bool = False, slowest: int = PROFILE_SLOWEST, sample_hz: float = 0.0,
+                 max_children: int = PROFILE_MAX_CHILDREN):
+        self.enabled = False
+        self.slowest_max = slowest
+        self.sample_hz = sample_hz
+        self.max_children = max_children
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._active: Dict[int, List[_Frame]] = {}  # thread ident → stack (يقرؤه الـ sampler)
+        self._seq = itertools.count()
+        self._sampler_gen = 0
+        self.expires_at: Optional[float] = None
+        self.reset()
+        if enabled:
+            self.enable()
+
+    # ---------- control ----------
+    def enable(self, duration: Optional[float] = None):
+        """duration بالثواني (None = حتى disable)؛ إعادة التفعيل أثناء العمل تحدّث المهلة فقط"""
+        with self._lock:
+            self.expires_at = time.time() + duration if duration else None
+            started = not self.enabled
+            if started:
+                self.enabled = True
+                self.enabled_at = time.time()
+                self._sampler_gen += 1
+            gen = self._sampler_gen
+        if duration:
+            timer = threading.Timer(duration, self._expire, args=(gen,))
+            timer.daemon = True
+            timer.start()
+        if started and self.sample_hz > 0:
+            threading.Thread(target=self._sample_loop, args=(gen,), name="profiler-sampler", daemon=True).start()
+
+    def _expire(self, gen: int):
+        with self._lock:
+            # مهلة قديمة: disable / enable بعدها أو تمديد المدة (هامش لفرق الساعة بين Timer و time.time)
+            if self._sampler_gen != gen or self.expires_at is None or time.time() + 0.5 < self.expires_at:
+                return
+        self.disable()
+
+    def disable(self):
+        with self._lock:
+            self.enabled = False
+            self.expires_at = None
+            self._sampler_gen += 1
+
+    def reset(self):
+        with self._lock:
+            self._stacks: Dict[Tuple[str, ...], List[int]] = {}  # path → [count, total_ns, self_ns]
+            self._slowest: List[Tuple[int, int, Dict]] = []  # min-heap بالمدة
+            self._samples: Dict[Tuple[str, ...], int] = {}
+            self.sample_count = 0
+            self.enabled_at = time.time() if self.enabled else None
+
+    # ---------- spans ----------
+    def span(self, name: str, detail: Optional[str] = None):
+        if not self.enabled:
+            return _NOOP
+        return _Span(self, name, detail)
+
+    def wrap(self, name: Union[str, Callable[..., str]], detail: Optional[Callable[..., str]] = None):
+        """
+        decorator: name نص ثابت أو دالة من نفس معاملات الدالة (تُستدعى فقط عند التفعيل).
+        معطّل = فحص enabled واحد قبل الاستدعاء الأصلي.
+        """
+
+        def decorate(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                frame = self.push(
+                    name(*args, **kwargs) if callable(name) else name,
+                    detail(*args, **kwargs) if detail is not None else None,
+                )
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.pop(frame)
+
+            return wrapper
+
+        return decorate
+
+    def _stack(self) -> List[_Frame]:
+        try:
+            return self._local.stack
+        except AttributeError:
+            stack = self._local.stack = []
+            ident = threading.get_ident()
+            with self._lock:
+                if len(self._active) > 2 * threading.active_count() + 16:
+                    # threads الطلبات قصيرة العمر: نحذف المنتهية حتى لا ينمو القاموس
+                    alive = {t.ident for t in threading.enumerate()}
+                    self._active = {k: v for k, v in self._active.items() if k in alive}
+                self._active[ident] = stack
+            return stack
+
+    def push(self, name: str, detail: Optional[str] = None) -> _Frame:
+        frame = _Frame(name.replace(";", ":"), detail, time.perf_counter_ns())
+        self._stack().append(frame)
+        return frame
+
+    def pop(self, frame: Optional[_Frame]):
+        if frame is None:
+            return
+        stack = self._stack()
+        if not any(f is frame for f in stack):
+            return  # reset أو تفعيل في منتصف العملية
+        end = time.perf_counter_ns()
+        while stack:
+            top = stack.pop()
+            self._close(top, stack, end)
+            if top is frame:
+                break
+
+    def _close(self, frame: _Frame, stack: List[_Frame], end: int):
+        duration = end - frame.start
+        node = {"name": frame.name, "ms": round(duration / 1e6, 3)}
+        if frame.detail is not None:
+            node["detail"] = frame.detail
+        if frame.children:
+            node["children"] = frame.children
+        if frame.dropped:
+            node["dropped_children"] = frame.dropped
+        if stack:
+            parent = stack[-1]
+            parent.child_ns += duration
+            if parent.children is None:
+                parent.children = []
+            if len(parent.children) < self.max_children:
+                parent.children.append(node)
+            else:
+                parent.dropped += 1
+
+        path = tuple(f.name for f in stack) + (frame.name,)
+        with self._lock:
+            agg = self._stacks.get(path)
+            if agg is None:
+                agg = self._stacks[path] = [0, 0, 0]
+            agg[0] += 1
+            agg[1] += duration
+            agg[2] += max(duration - frame.child_ns, 0)
+            if not stack and self.slowest_max > 0:
+                node["at"] = time.time()
+                item = (duration, next(self._seq), node)
+                if len(self._slowest) < self.slowest_max:
+                    heapq.heappush(self._slowest, item)
+                elif duration > self._slowest[0][0]:
+                    heapq.heapreplace(self._slowest, item)
+
+    # ---------- sampler ----------
+    def _sample_loop(self, gen: int):
+        interval = 1.0 / self.sample_hz
+        me = threading.get_ident()
+        while self._sampler_gen == gen:
+            time.sleep(interval)
+            frames = sys._current_frames()
+            with self._lock:
+                active = [(ident, list(stack)) for ident, stack in self._active.items() if stack and ident != me]
+            samples = []
+            for ident, spans in active:
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                code = []
+                while frame is not None:
+                    code.append(_code_name(frame.f_code))
+                    frame = frame.f_back
+                samples.append(tuple(f.name for f in spans) + tuple(reversed(code)))
+            with self._lock:
+                for path in samples:
+                    self._samples[path] = self._samples.get(path, 0) + 1
+                self.sample_count += len(samples)
+
+    # ---------- output ----------
+    def collapsed(self, kind: str = "spans") -> str:
+        """
+        spans: الوقت الذاتي لكل مسار بالميكروثانية | samples: عدد العينات لكل Python stack
+        (flamegraph.pl أو speedscope يقرآن الصيغتين)
+        """
+        with self._lock:
+            if kind == "samples":
+                items = [(path, count) for path, count in self._samples.items()]
+            else:
+                items = [(path, agg[2] // 1000) for path, agg in self._stacks.items()]
+        return "".join(f"{';'.join(path)} {value}\n" for path, value in sorted(items) if value > 0)
+
+    def stats(self, top: int = 50) -> Dict:
+        with self._lock:
+            spans = [
+                {
+                    "path": ";".join(path),
+                    "count": count,
+                    "total_ms": round(total / 1e6, 3),
+                    "self_ms": round(self_ns / 1e6, 3),
+                    "avg_ms": round(total / count / 1e6, 3),
+                }
+                for path, (count, total, self_ns) in self._stacks.items()
+            ]
+            slowest = [node for _, _, node in sorted(self._slowest, reverse=True)]
+            sample_count = self.sample_count
+        spans.sort(key=lambda s: -s["total_ms"])
+        return {
+            "enabled": self.enabled,
+            "enabled_at": self.enabled_at,
+            "expires_at": self.expires_at,
+            "sample_hz": self.sample_hz,
+            "samples": sample_count,
+            "spans": spans[:top],
+            "slowest": slowest,
+        }
@@ -67,7 +67,9 @@ def main():
     Timer(3, open_browser).start()
     
     # تشغيل Flask app
-    from app import app
+    from app import app, bot_control
+    # البوتات التي كانت تعمل قبل آخر إيقاف تُستأنف من checkpoint
+    bot_control.resume_all()
     port = int(os.environ.get('PORT', 5000))
     
     app.run(
@@ -0,0 +1,306 @@
+"""
+📡 عميل WebSocket خفيف (RFC 6455) بدون مكتبات خارجية + إعادة اتصال تلقائية
+- WebSocketConnection: اتصال واحد (handshake + frames + ping/pong)
+- StreamClient: thread لكل stream مع backoff أُسّي و jitter واستدعاء resync بعد أي انقطاع
+"""
+
+import os
+import ssl
+import json
+import time
+import base64
+import random
+import select
+import socket
+import struct
+import hashlib
+import threading
+from typing import Callable, Optional, Tuple
+from urllib.parse import urlparse
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONT, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+STREAM_CONNECT_TIMEOUT = 10
+STREAM_IDLE_TIMEOUT = 90  # لا رسائل ولا ping خلال هذه المدة = اتصال ميت
+STREAM_BACKOFF_MIN = 1.0
+STREAM_BACKOFF_MAX = 60.0
+STREAM_POLL_INTERVAL = 5  # مهلة انتظار بداية رسالة قبل فحص idle/heartbeat
+
+
+class WebSocketClosed(Exception):
+    pass
+
+
+# ==================== FRAMES ====================
+def accept_key(key: str) -> str:
+    return base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+
+
+def apply_mask(payload: bytes, mask: bytes) -> bytes:
+    n = len(payload)
+    if not n:
+        return payload
+    repeated = (mask * (n // 4 + 1))[:n]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")).to_bytes(n, "big")
+
+
+def encode_frame(opcode: int, payload: bytes, mask: bool, fin: bool = True) -> bytes:
+    header = bytearray([(0x80 if fin else 0) | opcode])
+    n = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if n < 126:
+        header.append(mask_bit | n)
+    elif n < 1 << 16:
+        header.append(mask_bit | 126)
+        header += struct.pack("!H", n)
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack("!Q", n)
+    if mask:
+        key = os.urandom(4)
+        return bytes(header) + key + apply_mask(payload, key)
+    return bytes(header) + payload
+
+
+def _recv_exact(sock, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise WebSocketClosed("connection closed by peer")
+        buf += chunk
+    return bytes(buf)
+
+
+def read_frame(sock) -> Tuple[bool, int, bytes]:
+    """(fin, opcode, payload) — يفك الـ mask إن وُجد"""
+    b1, b2 = _recv_exact(sock, 2)
+    fin = bool(b1 & 0x80)
+    opcode = b1 & 0x0F
+    n = b2 & 0x7F
+    if n == 126:
+        n = struct.unpack("!H", _recv_exact(sock, 2))[0]
+    elif n == 127:
+        n = struct.unpack("!Q", _recv_exact(sock, 8))[0]
+    mask = _recv_exact(sock, 4) if b2 & 0x80 else None
+    payload = _recv_exact(sock, n) if n else b""
+    if mask:
+        payload = apply_mask(payload, mask)
+    return fin, opcode, payload
+
+
+# ==================== CONNECTION ====================
+class WebSocketConnection:
+    def __init__(self, sock):
+        self.sock = sock
+        self._send_lock = threading.Lock()
+
+    @classmethod
+    def connect(cls, url: str, timeout: float = STREAM_CONNECT_TIMEOUT) -> "WebSocketConnection":
+        u = urlparse(url)
+        secure = u.scheme == "wss"
+        port = u.port or (443 if secure else 80)
+        sock = socket.create_connection((u.hostname, port), timeout=timeout)
+        if secure:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=u.hostname)
+
+        key = base64.b64encode(os.urandom(16)).decode()
+        path = (u.path or "/") + (f"?{u.query}" if u.query else "")
+        request = (
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {u.hostname}:{port}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        )
+        sock.sendall(request.encode())
+
+        response = b""
+        while b"\r\n\r\n" not in response:
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise WebSocketClosed("handshake failed: connection closed")
+            response += chunk
+        head = response.split(b"\r\n\r\n", 1)[0].decode("latin-1")
+        status_line, *header_lines = head.split("\r\n")
+        if " 101 " not in f"{status_line} ":
+            raise WebSocketClosed(f"handshake failed: {status_line}")
+        headers = {k.strip().lower(): v.strip() for k, v in (h.split(":", 1) for h in header_lines if ":" in h)}
+        if headers.get("sec-websocket-accept") != accept_key(key):
+            raise WebSocketClosed("handshake failed: bad Sec-WebSocket-Accept")
+        return cls(sock)
+
+    def settimeout(self, timeout: Optional[float]):
+        self.sock.settimeout(timeout)
+
+    def wait_readable(self, timeout: float) -> bool:
+        # SSL قد يحتفظ ببيانات مفكوكة في الذاكرة لا يراها select
+        if isinstance(self.sock, ssl.SSLSocket) and self.sock.pending():
+            return True
+        readable, _, _ = select.select([self.sock], [], [], timeout)
+        return bool(readable)
+
+    def send(self, opcode: int, payload: bytes = b""):
+        with self._send_lock:
+            self.sock.sendall(encode_frame(opcode, payload, mask=True))
+
+    def send_json(self, obj):
+        self.send(OP_TEXT, json.dumps(obj, separators=(",", ":")).encode())
+
+    def recv(self) -> str:
+        """رسالة نصية كاملة؛ يرد على ping تلقائيًا"""
+        parts = []
+        while True:
+            fin, opcode, payload = read_frame(self.sock)
+            if opcode == OP_PING:
+                self.send(OP_PONG, payload)
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                try:
+                    self.send(OP_CLOSE, payload[:2])
+                except OSError:
+                    pass
+                raise WebSocketClosed("close frame received")
+            parts.append(payload)
+            if fin:
+                return b"".join(parts).decode("utf-8")
+
+    def close(self):
+        try:
+            self.send(OP_CLOSE, struct.pack("!H", 1000))
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+# ==================== STREAM CLIENT ====================
+class StreamClient:
+    """
+    ✅ stream دائم:
+    - url_factory تُستدعى عند كل اتصال (listenKey جديد / قائمة streams محدّثة)
+    - إعادة اتصال بـ backoff أُسّي + jitter
+    - on_connect مع كل اتصال، و on_reconnect بعد كل انقطاع (لسد الفجوة من REST)
+    - heartbeat اختياري (interval, fn) مثل keepalive لـ listenKey
+    """
+
+    def __init__(
+        self,
+        url_factory: Callable[[], Optional[str]],
+        on_message: Callable[[dict], None],
+        on_reconnect: Optional[Callable[[], None]] = None,
+        on_connect: Optional[Callable[[], None]] = None,
+        heartbeat: Optional[Tuple[float, Callable[[], None]]] = None,
+        name: str = "stream",
+        idle_timeout: float = STREAM_IDLE_TIMEOUT,
+    ):
+        self.url_factory = url_factory
+        self.on_message = on_message
+        self.on_reconnect = on_reconnect
+        self.on_connect = on_connect
+        self.heartbeat = heartbeat
+        self.name = name
+        self.idle_timeout = idle_timeout
+
+        self.connected = threading.Event()
+        self.connects = 0
+        self.messages = 0
+        self.last_error: Optional[str] = None
+
+        self._running = False
+        self._conn: Optional[WebSocketConnection] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"ws-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._stop.set()
+        self._drop()
+
+    def reconnect(self):
+        """قطع الاتصال الحالي ليعاد بناؤه من url_factory"""
+        self._drop()
+
+    def send_json(self, obj) -> bool:
+        conn = self._conn
+        if conn is None:
+            return False
+        try:
+            conn.send_json(obj)
+            return True
+        except OSError:
+            return False
+
+    def _drop(self):
+        conn, self._conn = self._conn, None
+        self.connected.clear()
+        if conn is not None:
+            conn.close()
+
+    def _run(self):
+        backoff = STREAM_BACKOFF_MIN
+        while self._running:
+            url = None
+            try:
+                url = self.url_factory()
+                if not url:
+                    self._stop.wait(STREAM_POLL_INTERVAL)
+                    continue
+                conn = WebSocketConnection.connect(url)
+                conn.settimeout(self.idle_timeout)
+                self._conn = conn
+                self.connected.set()
+                self.connects += 1
+                backoff = STREAM_BACKOFF_MIN
+                if self.on_connect:
+                    self.on_connect()
+                if self.connects > 1 and self.on_reconnect:
+                    self.on_reconnect()
+                self._read_loop(conn)
+            except Exception as e:
+                if self._running:
+                    self.last_error = str(e)
+                    print(f"STREAM {self.name} ERROR:", e)
+            finally:
+                self._drop()
+            if self._running and url:
+                self._stop.wait(backoff * random.uniform(0.5, 1.0))
+                backoff = min(backoff * 2, STREAM_BACKOFF_MAX)
+
+    def _read_loop(self, conn: WebSocketConnection):
+        last_rx = time.monotonic()
+        last_beat = time.monotonic()
+        while self._running and self._conn is conn:
+            # ننتظر بداية frame بمهلة قصيرة، ثم نقرأ الـ frame كاملًا (لا نقطعه في المنتصف)
+            if conn.wait_readable(STREAM_POLL_INTERVAL):
+                raw = conn.recv()
+                last_rx = time.monotonic()
+                self.messages += 1
+                try:
+                    self.on_message(json.loads(raw))
+                except Exception as e:
+                    print(f"STREAM {self.name} handler error:", e)
+            elif time.monotonic() - last_rx > self.idle_timeout:
+                raise WebSocketClosed("idle timeout")
+
+            if self.heartbeat and time.monotonic() - last_beat >= self.heartbeat[0]:
+                last_beat = time.monotonic()
+                try:
+                    self.heartbeat[1]()
+                except Exception as e:
+                    print(f"STREAM {self.name} heartbeat error:", e)
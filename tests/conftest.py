@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# الوحدات في جذر المستودع (بدون package)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.py ينشئ Database عند الاستيراد: ملف مؤقت بدل users.db في المستودع
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="tests-"), "users.db"))
@@ -0,0 +1,50 @@
+"""
+اختبارات حالة البوت المشتركة (bot_state) كما يقرؤها عمّال الويب في وضع remote
+"""
+
+import time
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def shared_db(tmp_path, monkeypatch):
+    db = app.Database(str(tmp_path / "shared.db"), flush_interval=60, shared=True, archive_interval=0)
+    monkeypatch.setattr(app, "db", db)
+    monkeypatch.setattr(app, "BOT_STATE_HEARTBEAT", 0.05)
+    monkeypatch.setattr(app, "BOT_STATE_STALE_AFTER", 0.3)
+    yield db
+    db.close()
+
+
+STATE = {"running": True, "symbols": ["BTCUSDT"], "trades": 0, "started_at": 1.0}
+
+
+def test_unchanged_state_is_not_stale(shared_db):
+    control = app.RemoteBotControl()
+    deadline = time.monotonic() + 0.8
+    while time.monotonic() < deadline:
+        # كل tick ينشر نفس الحالة بالضبط (بوت خامل)
+        shared_db.put_bot_state("u1", dict(STATE))
+        shared_db.flush()
+        time.sleep(0.05)
+    status = control.status("u1")
+    assert status is not None and status["stale"] is False
+
+
+def test_silent_runner_is_stale(shared_db):
+    shared_db.put_bot_state("u1", dict(STATE))
+    shared_db.flush()
+    time.sleep(0.4)
+    assert app.RemoteBotControl().status("u1")["stale"] is True
+
+
+def test_unchanged_state_rewrites_only_heartbeat(shared_db):
+    shared_db.put_bot_state("u1", dict(STATE))
+    shared_db.put_bot_state("u1", dict(STATE))
+    assert len(shared_db._pending) == 1  # داخل مهلة النبضة: لا كتابة ثانية
+    time.sleep(0.06)
+    shared_db.put_bot_state("u1", dict(STATE))
+    assert shared_db._pending[-1][0].startswith("UPDATE bot_state SET updated_at")
@@ -0,0 +1,127 @@
+"""
+اختبارات exchange_info: تقريب الكمية/السعر على step/tick والرفض المحلي بأسماء فلاتر Binance
+"""
+
+from decimal import Decimal
+
+import pytest
+
+from exchange_info import ExchangeInfoCache, OrderRejected, SymbolFilters, prepare_order
+
+
+def symbol_info(*extra_filters, **lot):
+    return {
+        "symbol": "BTCUSDT",
+        "status": "TRADING",
+        "baseAsset": "BTC",
+        "quoteAsset": "USDT",
+        "orderTypes": ["LIMIT", "MARKET"],
+        "filters": [
+            {"filterType": "PRICE_FILTER", "minPrice": "0.01", "maxPrice": "1000000.00", "tickSize": "0.01"},
+            {
+                "filterType": "LOT_SIZE",
+                "minQty": lot.get("minQty", "0.00001"),
+                "maxQty": lot.get("maxQty", "9000.00000"),
+                "stepSize": lot.get("stepSize", "0.00001"),
+            },
+            *extra_filters,
+        ],
+    }
+
+
+def notional(min_notional="10", apply_to_market=True):
+    return {"filterType": "NOTIONAL", "minNotional": min_notional, "applyMinToMarket": apply_to_market,
+            "maxNotional": "9000000", "applyMaxToMarket": False, "avgPriceMins": 5}
+
+
+def min_notional(value="10", apply_to_market=True):
+    return {"filterType": "MIN_NOTIONAL", "minNotional": value, "applyToMarket": apply_to_market, "avgPriceMins": 5}
+
+
+def test_quantity_rounds_down_to_step_without_float_error():
+    filters = SymbolFilters(symbol_info(notional()))
+    order = prepare_order(filters, "btcusdt", "buy", 0.0012399999, ref_price=60000)
+    assert order.quantity == Decimal("0.00123")
+    # 0.1 + 0.2 كـ float = 0.30000000000000004: لا يتحول إلى 0.30001
+    assert filters.round_quantity(0.1 + 0.2) == Decimal("0.30000")
+    assert "quantity=0.00123&" in order.query
+    assert order.query.startswith("symbol=BTCUSDT&side=BUY&type=MARKET&")
+
+
+def test_price_rounds_to_tick_and_query_has_gtc():
+    filters = SymbolFilters(symbol_info(notional()))
+    order = prepare_order(filters, "BTCUSDT", "SELL", 0.001, "LIMIT", price=60000.126)
+    assert order.price == Decimal("60000.13")
+    assert "timeInForce=GTC&price=60000.13&" in order.query
+
+    # بدون exponent: Decimal("0.00001") يُطبع 1E-5 افتراضيًا
+    assert "quantity=0.00001&" in prepare_order(SymbolFilters(symbol_info()), "BTCUSDT", "BUY", 0.00001).query
+
+
+def test_market_lot_size_overrides_lot_size_for_market_orders():
+    market_lot = {"filterType": "MARKET_LOT_SIZE", "minQty": "0.001", "maxQty": "100", "stepSize": "0.001"}
+    filters = SymbolFilters(symbol_info(market_lot))
+    assert prepare_order(filters, "BTCUSDT", "BUY", 0.00567).quantity == Decimal("0.005")
+    assert prepare_order(filters, "BTCUSDT", "BUY", 0.00567, "LIMIT", price=100).quantity == Decimal("0.00567")
+    with pytest.raises(OrderRejected, match="maxQty 100"):
+        prepare_order(filters, "BTCUSDT", "BUY", 150)
+
+
+@pytest.mark.parametrize("quantity, message", [
+    (0.0004, "LOT_SIZE: quantity 0 < minQty 0.003"),  # يُقرَّب إلى صفر قبل التحقق
+    (0.0025, "LOT_SIZE: quantity 0.002 < minQty 0.003"),
+    (12.5, "LOT_SIZE: quantity 12.5 > maxQty 10"),
+])
+def test_lot_size_rejects(quantity, message):
+    filters = SymbolFilters(symbol_info(minQty="0.003", maxQty="10", stepSize="0.002"))
+    with pytest.raises(OrderRejected) as err:
+        prepare_order(filters, "BTCUSDT", "BUY", quantity)
+    assert str(err.value) == message
+
+
+def test_notional_applies_to_market_with_ref_price():
+    filters = SymbolFilters(symbol_info(notional("10", apply_to_market=True)))
+    with pytest.raises(OrderRejected, match="NOTIONAL: 6 < minNotional 10"):
+        prepare_order(filters, "BTCUSDT", "BUY", 0.0001, ref_price=60000)
+    assert prepare_order(filters, "BTCUSDT", "BUY", 0.0002, ref_price=60000).validated
+
+
+def test_notional_not_applied_to_market_when_disabled():
+    filters = SymbolFilters(symbol_info(notional("10", apply_to_market=False)))
+    prepare_order(filters, "BTCUSDT", "BUY", 0.0001, ref_price=60000)
+    with pytest.raises(OrderRejected, match="NOTIONAL"):
+        prepare_order(filters, "BTCUSDT", "BUY", 0.0001, "LIMIT", price=60000)
+
+
+@pytest.mark.parametrize("apply_to_market, rejected", [(True, True), (False, False)])
+def test_legacy_min_notional_uses_apply_to_market(apply_to_market, rejected):
+    filters = SymbolFilters(symbol_info(min_notional("10", apply_to_market)))
+    if rejected:
+        with pytest.raises(OrderRejected, match="minNotional 10"):
+            prepare_order(filters, "BTCUSDT", "BUY", 0.0001, ref_price=60000)
+    else:
+        prepare_order(filters, "BTCUSDT", "BUY", 0.0001, ref_price=60000)
+
+
+def test_market_without_ref_price_skips_notional():
+    filters = SymbolFilters(symbol_info(notional("10")))
+    assert prepare_order(filters, "BTCUSDT", "BUY", 0.0001).validated
+
+
+def test_without_filters_sends_quantity_as_is():
+    order = prepare_order(None, "BTCUSDT", "BUY", 0.0012399999)
+    assert not order.validated
+    assert "quantity=0.0012399999&" in order.query
+
+
+def test_cache_fetches_missing_symbol_once():
+    calls = []
+
+    def fetch(symbols):
+        calls.append(symbols)
+        return {"symbols": [symbol_info()]}
+
+    cache = ExchangeInfoCache(fetch)
+    assert cache.get("btcusdt").symbol == "BTCUSDT"
+    cache.get("BTCUSDT")
+    assert calls == [["BTCUSDT"]]
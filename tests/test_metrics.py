@@ -0,0 +1,28 @@
+"""
+اختبارات metrics: عدّادات لكل thread لا تنمو مع threads الطلبات قصيرة العمر
+"""
+
+import threading
+
+from metrics import Counter, Histogram, Registry
+
+
+def run_threads(fn, n: int):
+    for _ in range(n):
+        t = threading.Thread(target=fn)
+        t.start()
+        t.join()
+
+
+def test_counter_folds_dead_threads_without_scrape():
+    child = Counter("requests_total", "test", ("route",), registry=Registry()).labels("/x")
+    run_threads(child.inc, 500)
+    # بدون أي قراءة (لا /metrics): القوائم المنتهية تُدمج عند تسجيل threads جديدة
+    assert len(child._shards._shards) <= 2 * threading.active_count() + 17
+    assert child.value == 500
+
+
+def test_histogram_totals_survive_folding():
+    hist = Histogram("latency_seconds", "test", registry=Registry())
+    run_threads(lambda: hist.observe(0.01), 300)
+    assert "latency_seconds_count 300" in hist.render()
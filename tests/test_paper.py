@@ -0,0 +1,113 @@
+"""
+اختبارات paper.PaperExchange: التنفيذ الجزئي، أوامر LIMIT المعلّقة، الإلغاء، والرسوم بعملة الاستلام
+دفتر صغير ومحدد: مستويان بعمق 1 لكل مستوى، asks = mid × (1.001, 1.002)، وساعة ثابتة (بدون تجدد السيولة)
+"""
+
+import pytest
+
+from paper import INSUFFICIENT_BALANCE, UNKNOWN_ORDER, PaperExchange, PaperRejected
+
+FEE = 0.001
+
+
+@pytest.fixture
+def exchange():
+    ex = PaperExchange(
+        fee_rate=FEE, maker_fee_rate=FEE, levels=2, spread_bps=20.0, step_bps=10.0,
+        book_seconds=1.0, start_balances={"USDT": 1000.0}, clock=lambda: 0.0,
+    )
+    ex.set_market("BTCUSDT", 100.0, volume_per_s=2.0)  # عمق 2 = 1 لكل مستوى
+    return ex
+
+
+def balances(ex, account="a"):
+    return {b["asset"]: (float(b["free"]), float(b["locked"])) for b in ex.account_info(account)["balances"]}
+
+
+def test_market_walks_book_then_expires_remainder(exchange):
+    res = exchange.place_order("a", "BTCUSDT", "BUY", 3.0)
+    assert res["status"] == "EXPIRED"
+    assert [(f["price"], f["qty"]) for f in res["fills"]] == [("100.10000000", "1.00000000"), ("100.20000000", "1.00000000")]
+    assert float(res["executedQty"]) == pytest.approx(2.0)
+    assert float(res["cummulativeQuoteQty"]) == pytest.approx(200.3)
+    usdt, btc = balances(exchange)["USDT"], balances(exchange)["BTC"]
+    assert usdt == pytest.approx((1000.0 - 200.3, 0.0))
+    # الرسوم بعملة الاستلام: BUY يستلم BTC صافيًا بعد العمولة
+    assert btc == pytest.approx((2.0 * (1 - FEE), 0.0))
+    assert all(f["commissionAsset"] == "BTC" for f in res["fills"])
+
+
+def test_sell_fee_is_taken_in_quote(exchange):
+    exchange.place_order("a", "BTCUSDT", "BUY", 1.0)
+    exchange.set_market("BTCUSDT", 100.0, volume_per_s=2.0)
+    res = exchange.place_order("a", "BTCUSDT", "SELL", 0.5)
+    assert res["status"] == "FILLED"
+    assert res["fills"][0]["commissionAsset"] == "USDT"
+    assert balances(exchange)["USDT"][0] == pytest.approx(1000.0 - 100.1 + 0.5 * 99.9 * (1 - FEE))
+    assert balances(exchange)["BTC"][0] == pytest.approx(1.0 * (1 - FEE) - 0.5)
+
+
+def test_limit_rests_locked_then_fills_as_maker_on_cross(exchange):
+    res = exchange.place_order("a", "BTCUSDT", "BUY", 3.0, "LIMIT", 100.15)
+    assert res["status"] == "PARTIALLY_FILLED"
+    assert float(res["executedQty"]) == pytest.approx(1.0)  # المستوى الأول فقط ≤ 100.15
+    assert balances(exchange)["USDT"] == pytest.approx((1000.0 - 100.1 - 2 * 100.15, 2 * 100.15))
+    [order] = exchange.open_orders("a", "BTCUSDT")
+    assert order["status"] == "PARTIALLY_FILLED" and float(order["executedQty"]) == pytest.approx(1.0)
+    assert exchange.resting_symbols() == ["BTCUSDT"]
+
+    # السعر ينزل تحت الحد: الباقي يُنفَّذ بسعر الأمر (maker) ويُفك الحجز
+    exchange.set_market("BTCUSDT", 99.0, volume_per_s=10.0)
+    assert exchange.open_orders("a") == []
+    assert exchange.resting_symbols() == []
+    usdt, btc = balances(exchange)["USDT"], balances(exchange)["BTC"]
+    assert usdt == pytest.approx((1000.0 - 100.1 - 2 * 100.15, 0.0))
+    assert btc == pytest.approx((3.0 * (1 - FEE), 0.0))
+
+
+def test_limit_does_not_fill_until_price_crosses(exchange):
+    exchange.place_order("a", "BTCUSDT", "BUY", 1.0, "LIMIT", 95.0)
+    exchange.set_market("BTCUSDT", 96.0, volume_per_s=10.0)  # asks ≥ 96.09
+    assert len(exchange.open_orders("a")) == 1
+    exchange.set_market("BTCUSDT", 94.0, volume_per_s=10.0)
+    assert exchange.open_orders("a") == []
+
+
+def test_cancel_returns_locked_funds(exchange):
+    buy = exchange.place_order("a", "BTCUSDT", "BUY", 2.0, "LIMIT", 90.0)
+    assert buy["status"] == "NEW"
+    assert balances(exchange)["USDT"] == pytest.approx((820.0, 180.0))
+
+    res = exchange.cancel_order("a", "BTCUSDT", buy["orderId"])
+    assert res["status"] == "CANCELED" and res["side"] == "BUY"
+    assert balances(exchange)["USDT"] == pytest.approx((1000.0, 0.0))
+    assert exchange.open_orders("a") == []
+
+    with pytest.raises(PaperRejected) as err:
+        exchange.cancel_order("a", "BTCUSDT", buy["orderId"])
+    assert err.value.code == UNKNOWN_ORDER
+
+
+def test_cancel_sell_returns_base_and_checks_owner(exchange):
+    exchange.place_order("a", "BTCUSDT", "BUY", 1.0)
+    held = balances(exchange)["BTC"][0]
+    sell = exchange.place_order("a", "BTCUSDT", "SELL", 0.5, "LIMIT", 120.0)
+    assert balances(exchange)["BTC"] == pytest.approx((held - 0.5, 0.5))
+    with pytest.raises(PaperRejected):
+        exchange.cancel_order("b", "BTCUSDT", sell["orderId"])  # حساب آخر لا يلغي أمرًا ليس له
+    exchange.cancel_order("a", "BTCUSDT", sell["orderId"])
+    assert balances(exchange)["BTC"] == pytest.approx((held, 0.0))
+
+
+def test_insufficient_balance_rejects_whole_order(exchange):
+    with pytest.raises(PaperRejected) as err:
+        exchange.place_order("a", "BTCUSDT", "BUY", 20.0, "LIMIT", 100.15)
+    assert err.value.code == INSUFFICIENT_BALANCE
+    assert balances(exchange) == {"USDT": (1000.0, 0.0)}
+    assert exchange.open_orders("a") == []
+
+
+def test_restored_locked_balance_returns_to_free():
+    ex = PaperExchange(start_balances={"USDT": 1000.0})
+    ex.open_account("a", [{"asset": "USDT", "free": "820", "locked": "180"}])
+    assert balances(ex) == {"USDT": (1000.0, 0.0)}
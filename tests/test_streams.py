@@ -0,0 +1,173 @@
+"""
+اختبارات streams.StreamClient / WebSocketConnection أمام mock_binance.MockWebSocketServer
+(سيرفر محلي حقيقي على 127.0.0.1 بدون شبكة خارجية)
+"""
+
+import socket
+import threading
+import time
+
+import pytest
+
+import streams
+from mock_binance import MockRestServer, MockWebSocketServer
+from streams import StreamClient, WebSocketClosed, WebSocketConnection
+
+
+def wait_until(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def dead_url() -> str:
+    """منفذ لا يستمع عليه أحد (الاتصال يُرفض فورًا)"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    return f"ws://127.0.0.1:{port}/stream"
+
+
+@pytest.fixture
+def server():
+    srv = MockWebSocketServer().start()
+    yield srv
+    srv.stop()
+
+
+@pytest.fixture
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(streams, "STREAM_BACKOFF_MIN", 0.05)
+    monkeypatch.setattr(streams, "STREAM_BACKOFF_MAX", 0.4)
+    monkeypatch.setattr(streams, "STREAM_POLL_INTERVAL", 0.05)
+
+
+def start_client(url_factory, **kwargs):
+    received = []
+    client = StreamClient(url_factory, received.append, name="test", **kwargs)
+    client.start()
+    return client, received
+
+
+# ==================== HANDSHAKE ====================
+def test_handshake_and_subscribe(server):
+    conn = WebSocketConnection.connect(f"{server.url}/stream?streams=btcusdt@kline_1m")
+    try:
+        assert server.wait_for_clients(1)
+        assert server.clients[0].streams == {"btcusdt@kline_1m"}
+        conn.send_json({"method": "SUBSCRIBE", "params": ["ethusdt@bookTicker"], "id": 7})
+        conn.settimeout(5)
+        assert conn.recv() == '{"result": null, "id": 7}'
+        assert "ethusdt@bookTicker" in server.clients[0].streams
+    finally:
+        conn.close()
+
+
+def test_handshake_rejected_by_plain_http_server():
+    rest = MockRestServer().start()
+    try:
+        with pytest.raises(WebSocketClosed, match="handshake failed"):
+            WebSocketConnection.connect(rest.url.replace("http://", "ws://") + "/stream")
+    finally:
+        rest.stop()
+
+
+# ==================== PING / PONG ====================
+def test_ping_is_answered_with_pong(server):
+    client, received = start_client(lambda: f"{server.url}/stream?streams=a")
+    try:
+        assert client.connected.wait(5)
+        assert server.wait_for_clients(1)
+        server.ping(b"hb")
+        assert wait_until(lambda: server.pongs == 1)
+        # ping لا يُسلَّم كرسالة
+        server.broadcast({"stream": "a", "data": {"x": 1}})
+        assert wait_until(lambda: received == [{"stream": "a", "data": {"x": 1}}])
+    finally:
+        client.stop()
+
+
+# ==================== FRAGMENTATION ====================
+def test_fragmented_message_is_reassembled(server):
+    client, received = start_client(lambda: f"{server.url}/stream?streams=a")
+    event = {"stream": "a", "data": {"payload": "x" * 5000}}
+    try:
+        assert client.connected.wait(5) and server.wait_for_clients(1)
+        server.send_fragmented(event, parts=4)
+        assert wait_until(lambda: received == [event])
+    finally:
+        client.stop()
+
+
+def test_ping_between_fragments(server):
+    client, received = start_client(lambda: f"{server.url}/stream?streams=a")
+    event = {"stream": "a", "data": {"k": list(range(200))}}
+    try:
+        assert client.connected.wait(5) and server.wait_for_clients(1)
+        server.send_fragmented(event, parts=3, ping_between=True)
+        assert wait_until(lambda: received == [event])
+        assert wait_until(lambda: server.pongs == 2)
+    finally:
+        client.stop()
+
+
+# ==================== CLOSE / RECONNECT ====================
+def test_server_close_triggers_reconnect_and_resync(server, fast_backoff):
+    resyncs = []
+    client, received = start_client(lambda: f"{server.url}/stream?streams=a", on_reconnect=lambda: resyncs.append(1))
+    try:
+        assert client.connected.wait(5) and server.wait_for_clients(1)
+        server.close_all(1001)
+        assert wait_until(lambda: client.connects == 2)
+        assert resyncs == [1]
+        assert server.wait_for_clients(1)
+        assert server.connections == 2
+        server.broadcast({"stream": "a", "data": {"after": True}})
+        assert wait_until(lambda: {"stream": "a", "data": {"after": True}} in received)
+    finally:
+        client.stop()
+
+
+def test_dropped_connection_reconnects(server, fast_backoff):
+    client, _ = start_client(lambda: f"{server.url}/stream?streams=a")
+    try:
+        assert client.connected.wait(5) and server.wait_for_clients(1)
+        server.drop_all()
+        assert wait_until(lambda: client.connects == 2)
+        assert client.last_error
+    finally:
+        client.stop()
+
+
+def test_backoff_grows_until_connected(server, fast_backoff):
+    attempts = []
+    lock = threading.Lock()
+
+    def url_factory():
+        with lock:
+            attempts.append(time.monotonic())
+            n = len(attempts)
+        return dead_url() if n <= 4 else f"{server.url}/stream?streams=a"
+
+    client, _ = start_client(url_factory)
+    try:
+        assert client.connected.wait(10)
+        gaps = [b - a for a, b in zip(attempts, attempts[1:5])]
+        # backoff × uniform(0.5, 1.0) مع مضاعفة بعد كل فشل: 0.05 → 0.1 → 0.2 → 0.4
+        for gap, backoff in zip(gaps, (0.05, 0.1, 0.2, 0.4)):
+            assert gap >= backoff * 0.5 - 0.005
+        assert gaps[-1] >= gaps[0]
+    finally:
+        client.stop()
+
+
+def test_stop_does_not_reconnect(server, fast_backoff):
+    client, _ = start_client(lambda: f"{server.url}/stream?streams=a")
+    assert client.connected.wait(5) and server.wait_for_clients(1)
+    client.stop()
+    time.sleep(0.3)
+    assert client.connects == 1
+    assert not client.connected.is_set()
@@ -0,0 +1,139 @@
+"""
+اختبارات تاريخ الصفقات: cursor عبر SQLite والأرشيف العمودي، والإحصاءات التراكمية (trade_stats)
+"""
+
+import time
+
+import pytest
+
+import app
+
+BASE_MS = 1_700_000_000_000
+SYMBOLS = ("BTCUSDT", "ETHUSDT", "BNBUSDT")
+
+
+class FrozenTime:
+    """app.time بديل: time() قابل للضبط (صفقات بنفس ts)، والباقي من time الحقيقي"""
+
+    def __init__(self):
+        self.now = BASE_MS / 1000
+
+    def time(self):
+        return self.now
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+@pytest.fixture(params=[False, True], ids=["local", "shared"])
+def db(request, tmp_path, monkeypatch):
+    clock = FrozenTime()
+    monkeypatch.setattr(app, "time", clock)
+    db = app.Database(
+        str(tmp_path / "trades.db"), flush_interval=60, shared=request.param,
+        archive_dir=str(tmp_path / "archive"), archive_interval=0,
+    )
+    db.clock = clock
+    yield db
+    db.close()
+
+
+def insert_trades(db, user_id, n=90):
+    """ثلاث صفقات لكل ts (نفس المللي ثانية) لاختبار ترتيب (ts, seq) عند حدود الصفحات"""
+    trades = []
+    for i in range(n):
+        ts = BASE_MS + (i // 3) * 1000
+        db.clock.now = ts / 1000
+        trade = {
+            "symbol": SYMBOLS[i % len(SYMBOLS)],
+            "side": "BUY" if i % 2 == 0 else "SELL",
+            "quantity": 0.1 + i / 100,
+            "price": 100.0 + i,
+            "status": "FILLED",
+        }
+        if trade["side"] == "SELL":
+            trade["pnl"] = (i % 7) - 3.0
+        db.add_trade(user_id, trade)
+        trades.append({**trade, "ts": ts})
+    db.flush()
+    return trades
+
+
+def walk(db, user_id, page_size=7, **filters):
+    ids, cursor, pages = [], None, 0
+    while True:
+        page = db.query_trades(user_id, cursor=cursor, limit=page_size, **filters)
+        ids += [t["id"] for t in page["trades"]]
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids, pages
+
+
+def expected_ids(trades, symbol=None, start_ms=None, end_ms=None):
+    # الأحدث أولًا: (ts, seq) تنازليًا = عكس ترتيب الإدخال
+    return [
+        t["id"] for t in reversed(trades)
+        if (symbol is None or t["symbol"] == symbol)
+        and (start_ms is None or t["ts"] >= start_ms)
+        and (end_ms is None or t["ts"] < end_ms)
+    ]
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"symbol": "ETHUSDT"},
+    {"start_ms": BASE_MS + 5_000, "end_ms": BASE_MS + 25_000},
+    {"symbol": "BTCUSDT", "start_ms": BASE_MS + 4_000, "end_ms": BASE_MS + 21_000},
+])
+def test_cursor_walk_spans_sqlite_and_archive_exactly_once(db, filters):
+    trades = insert_trades(db, "u1")
+    insert_trades(db, "u2", n=12)  # مستخدم آخر بنفس الأوقات لا يظهر في الصفحات
+    moved = db.archive_trades(before_ms=BASE_MS + 15_000)
+    assert moved == 45 + 12
+
+    ids, pages = walk(db, "u1", **filters)
+    want = expected_ids(trades, **filters)
+    assert ids == want
+    assert len(set(ids)) == len(ids)
+    assert pages == max(1, -(-len(want) // 7))
+
+
+def test_archived_rows_keep_trade_fields(db):
+    trades = insert_trades(db, "u1", n=6)
+    db.archive_trades(before_ms=BASE_MS + 1_000)
+    page = db.query_trades("u1", limit=50)["trades"]
+    assert [t.get("archived", False) for t in page] == [False] * 3 + [True] * 3
+    oldest = page[-1]
+    assert (oldest["symbol"], oldest["side"], oldest["ts"]) == (trades[0]["symbol"], "BUY", BASE_MS)
+    assert oldest["quantity"] == pytest.approx(trades[0]["quantity"])
+    assert page[-2]["pnl"] == trades[1]["pnl"]
+
+
+def test_invalid_cursor_is_value_error(db):
+    with pytest.raises(ValueError):
+        db.query_trades("u1", cursor="not-a-cursor")
+
+
+def test_stats_match_a_scan_after_archiving(db):
+    trades = insert_trades(db, "u1")
+    db.archive_trades(before_ms=BASE_MS + 15_000)
+    stats = db.get_trade_stats("u1")
+
+    def scan(rows):
+        closed = [t["pnl"] for t in rows if "pnl" in t]
+        return {
+            "trades": len(rows),
+            "volume": pytest.approx(sum(t["quantity"] * t["price"] for t in rows)),
+            "realized_pnl": pytest.approx(sum(closed)),
+            "closed_trades": len(closed),
+            "wins": sum(1 for p in closed if p > 0),
+            "first_ts": min(t["ts"] for t in rows),
+            "last_ts": max(t["ts"] for t in rows),
+        }
+
+    assert {k: stats[k] for k in scan(trades)} == scan(trades)
+    for symbol in SYMBOLS:
+        rows = [t for t in trades if t["symbol"] == symbol]
+        got = stats["by_symbol"][symbol]
+        assert {k: got[k] for k in scan(rows)} == scan(rows)
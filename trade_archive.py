@@ -0,0 +1,194 @@
+"""
+🗄️ أرشيف الصفقات القديمة بصيغة عمودية مضغوطة (NumPy .npz)
+- ملف واحد لكل مستخدم: عمود لكل حقل بدل JSON لكل صفقة (أصغر بكثير من SQLite)
+- مرتّب بـ (ts, seq): نطاق زمني و cursor عبر searchsorted بدون مسح كامل
+- يحفظ حقول الصفقة التي يكتبها البوت فقط (symbol / side / quantity / price / pnl ...)
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+ARCHIVE_CACHE_USERS = 8  # أرشيفات محمّلة في الذاكرة (LRU)
+
+SIDES = {"BUY": 1, "SELL": -1}
+SIDE_NAMES = {1: "BUY", -1: "SELL", 0: None}
+
+
+def _load(path: str) -> Optional[Dict[str, np.ndarray]]:
+    try:
+        with np.load(path, allow_pickle=False) as f:
+            return {k: f[k] for k in f.files}
+    except FileNotFoundError:
+        return None
+
+
+def _float(value, default=np.nan) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class TradeArchive:
+    """
+    ✅ أرشيف لكل مستخدم:
+    - append() يضيف صفقات (أقدم من الموجود في SQLite) ويعيد كتابة الملف ذريًا
+    - query() بنفس ترتيب وفلاتر Database.query_trades (الأحدث أولًا)
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, np.ndarray]]]" = OrderedDict()
+
+    def _path(self, user_id: str) -> str:
+        return os.path.join(self.directory, f"{user_id}.npz")
+
+    def _columns(self, user_id: str) -> Optional[Dict[str, np.ndarray]]:
+        path = self._path(user_id)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached is not None and cached[0] == mtime:
+                self._cache.move_to_end(user_id)
+                return cached[1]
+        cols = _load(path)
+        if cols is None:
+            return None
+        with self._lock:
+            self._cache[user_id] = (mtime, cols)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > ARCHIVE_CACHE_USERS:
+                self._cache.popitem(last=False)
+        return cols
+
+    @staticmethod
+    def _encode(rows: List[Tuple[int, int, Dict]], symbols: List[str], statuses: List[str]) -> Dict[str, np.ndarray]:
+        """rows: [(seq, ts, trade dict), ...] → أعمدة؛ symbols / statuses قواميس نصوص تُمدَّد"""
+        sym_idx = {s: i for i, s in enumerate(symbols)}
+        status_idx = {s: i for i, s in enumerate(statuses)}
+
+        def code(table: Dict[str, int], names: List[str], value) -> int:
+            value = value or ""
+            i = table.get(value)
+            if i is None:
+                i = table[value] = len(names)
+                names.append(value)
+            return i
+
+        n = len(rows)
+        order_ids = np.full(n, -1, dtype=np.int64)
+        for i, (_, _, t) in enumerate(rows):
+            if t.get("order_id") is not None:
+                order_ids[i] = int(t["order_id"])
+        return {
+            "seq": np.fromiter((r[0] for r in rows), dtype=np.int64, count=n),
+            "ts": np.fromiter((r[1] for r in rows), dtype=np.int64, count=n),
+            "symbol": np.fromiter((code(sym_idx, symbols, r[2].get("symbol")) for r in rows), dtype=np.int32, count=n),
+            "side": np.fromiter((SIDES.get(r[2].get("side"), 0) for r in rows), dtype=np.int8, count=n),
+            "quantity": np.fromiter((_float(r[2].get("quantity"), 0.0) for r in rows), dtype=np.float64, count=n),
+            "price": np.fromiter((_float(r[2].get("price"), 0.0) for r in rows), dtype=np.float64, count=n),
+            "pnl": np.fromiter((_float(r[2].get("pnl")) for r in rows), dtype=np.float64, count=n),
+            "confidence": np.fromiter((_float(r[2].get("confidence")) for r in rows), dtype=np.float32, count=n),
+            "status": np.fromiter((code(status_idx, statuses, r[2].get("status")) for r in rows), dtype=np.int16, count=n),
+            "order_id": order_ids,
+            "trade_id": np.array([r[2].get("id", "") for r in rows], dtype="S16"),
+        }
+
+    def append(self, user_id: str, rows: List[Tuple[int, int, Dict]]) -> int:
+        if not rows:
+            return 0
+        os.makedirs(self.directory, exist_ok=True)
+        old = self._columns(user_id)
+        symbols = [str(s) for s in old["symbols"]] if old is not None else []
+        statuses = [str(s) for s in old["statuses"]] if old is not None else []
+        new = self._encode(rows, symbols, statuses)
+
+        if old is not None:
+            cols = {k: np.concatenate([old[k], new[k].astype(old[k].dtype)]) for k in new}
+        else:
+            cols = new
+        order = np.lexsort((cols["seq"], cols["ts"]))
+        cols = {k: v[order] for k, v in cols.items()}
+        # الأرشيف قد يُكتب مرتين لنفس الصفقة إذا توقفت العملية قبل الحذف من SQLite
+        keep = np.ones(len(order), dtype=bool)
+        keep[1:] = cols["seq"][1:] != cols["seq"][:-1]
+        cols = {k: v[keep] for k, v in cols.items()}
+        cols["symbols"] = np.array(symbols, dtype="U32")
+        cols["statuses"] = np.array(statuses, dtype="U32")
+
+        path = self._path(user_id)
+        tmp = f"{path}.tmp.npz"
+        np.savez_compressed(tmp, **cols)
+        os.replace(tmp, path)
+        with self._lock:
+            self._cache.pop(user_id, None)
+        return len(rows)
+
+    def query(
+        self,
+        user_id: str,
+        symbol: Optional[str] = None,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+        before: Optional[Tuple[int, int]] = None,
+        limit: int = 50,
+    ) -> List[Dict]:
+        """الأحدث أولًا؛ before = (ts, seq) حصريًا (cursor)، end_ms حصري"""
+        cols = self._columns(user_id)
+        if cols is None or limit <= 0:
+            return []
+        ts, seq = cols["ts"], cols["seq"]
+
+        lo = int(np.searchsorted(ts, start_ms, "left")) if start_ms is not None else 0
+        hi = int(np.searchsorted(ts, end_ms, "left")) if end_ms is not None else len(ts)
+        if before is not None:
+            b_ts, b_seq = before
+            # أول صف بنفس ts ثم نتقدّم حتى seq >= b_seq (الصفوف مرتبة بـ seq داخل نفس ts)
+            cut = int(np.searchsorted(ts, b_ts, "left"))
+            same_end = int(np.searchsorted(ts, b_ts, "right"))
+            cut += int(np.searchsorted(seq[cut:same_end], b_seq, "left"))
+            hi = min(hi, cut)
+        if hi <= lo:
+            return []
+
+        if symbol is None:
+            idx = np.arange(hi - 1, max(lo, hi - limit) - 1, -1)
+        else:
+            symbols = [str(s) for s in cols["symbols"]]
+            if symbol not in symbols:
+                return []
+            matches = np.flatnonzero(cols["symbol"][lo:hi] == symbols.index(symbol)) + lo
+            idx = matches[::-1][:limit]
+        return [self._row(cols, int(i)) for i in idx]
+
+    @staticmethod
+    def _row(cols: Dict[str, np.ndarray], i: int) -> Dict:
+        ts = int(cols["ts"][i])
+        trade = {
+            "id": cols["trade_id"][i].decode(),
+            "timestamp": datetime.fromtimestamp(ts / 1000).isoformat(),
+            "ts": ts,
+            "seq": int(cols["seq"][i]),
+            "symbol": str(cols["symbols"][cols["symbol"][i]]) or None,
+            "side": SIDE_NAMES.get(int(cols["side"][i])),
+            "quantity": float(cols["quantity"][i]),
+            "price": float(cols["price"][i]),
+            "status": str(cols["statuses"][cols["status"][i]]) or None,
+            "archived": True,
+        }
+        if not np.isnan(cols["confidence"][i]):
+            trade["confidence"] = round(float(cols["confidence"][i]), 1)
+        if cols["order_id"][i] >= 0:
+            trade["order_id"] = int(cols["order_id"][i])
+        if not np.isnan(cols["pnl"][i]):
+            trade["pnl"] = float(cols["pnl"][i])
+        return trade